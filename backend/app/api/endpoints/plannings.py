@@ -5,19 +5,29 @@ from ...schemas import (
     AdvancedPlanningRequest,
     AdvancedPlanningResponse,
     PlanningEfficiencyAnalysis,
+    PlanningFeasibilityDiagnosis,
+    PlanningJob,
+    PlanningRepairResult,
+    PlanningSimulationRequest,
+    PlanningSimulationResponse,
     PlanningValidationResult,
     RotationUpdate,
+    RotationUpdateResult,
     MessageResponse,
     Promotion
 )
-from ...crud import planning, etudiant, service as service_crud, get_advanced_planning_algorithm, rotation
+from ...crud import planning, etudiant, service as service_crud, get_advanced_planning_algorithm, rotation, planning_cache, planning_validation
 from ...database import get_db
+from ...jobs import planning_jobs
+from ...scheduling import GREEDY_SOLVER, MULTISTART_BUDGET_SECONDS
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import pandas as pd
 import io
+import json
 import logging
 from datetime import datetime
 
@@ -26,6 +36,16 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Upper limit of randomized runs per generation
+MAX_STARTS = 64
+# Upper limit of the local search budget, in seconds
+MAX_OPTIMIZE_SECONDS = 300
+
+# Where GET /{planning_id}/validate runs its checks
+VALIDATION_PYTHON = "python"  # Rotations loaded once, interval analysis in memory
+VALIDATION_SQL = "sql"        # Window functions in PostgreSQL, violations only
+VALIDATION_MODES = (VALIDATION_PYTHON, VALIDATION_SQL)
+
 
 @router.post("/generer/{promo_id}", response_model=PlanningResponse)
 def generate_planning(
@@ -35,9 +55,118 @@ def generate_planning(
     promotion_year_ids: List[str] = Query(None),
     date_debut: str = None,  # Made optional - will get from database if not provided
     all_years_mode: bool = False,  # NEW: allow frontend to pass this as a query param
+    # "exact" refines the greedy planning with the makespan MILP (time-limited)
+    solver: str = GREEDY_SOLVER,
+    # Randomized runs per year in parallel processes, the best one is kept
+    starts: int = Query(1, ge=1, le=MAX_STARTS),
+    starts_budget: float = Query(MULTISTART_BUDGET_SECONDS, gt=0),
+    # Seconds of local search compressing each year after generation (0 = off)
+    optimize_seconds: float = Query(0, ge=0, le=MAX_OPTIMIZE_SECONDS),
+    # False forces a new run even when the inputs did not change
+    use_cache: bool = True,
+    # Wall-clock budget of the whole generation; the best planning found is
+    # returned when it runs out, possibly partial
+    time_budget_ms: int = Query(None, gt=0),
     db: Session = Depends(get_db)
 ):
     """Generate planning for a promotion"""
+    return _generate_planning_payload(
+        db, promo_id, promotion_year_id, promotion_year_ids, date_debut, all_years_mode, solver,
+        starts=starts, starts_budget=starts_budget, optimize_seconds=optimize_seconds,
+        use_cache=use_cache, time_budget_ms=time_budget_ms)
+
+
+@router.post("/jobs/generer/{promo_id}", response_model=PlanningJob, status_code=202)
+def submit_planning_job(
+    promo_id: str,
+    promotion_year_id: str = None,
+    promotion_year_ids: List[str] = Query(None),
+    date_debut: str = None,
+    all_years_mode: bool = False,
+    solver: str = GREEDY_SOLVER,
+    starts: int = Query(1, ge=1, le=MAX_STARTS),
+    starts_budget: float = Query(MULTISTART_BUDGET_SECONDS, gt=0),
+    optimize_seconds: float = Query(0, ge=0, le=MAX_OPTIMIZE_SECONDS),
+    use_cache: bool = True,
+    time_budget_ms: int = Query(None, gt=0),
+):
+    """Queue the same generation as /generer in the background; poll /jobs/{job_id}"""
+    return planning_jobs.submit(
+        "generation",
+        lambda db, progress: _generate_planning_payload(
+            db, promo_id, promotion_year_id, promotion_year_ids, date_debut, all_years_mode, solver,
+            progress=progress, starts=starts, starts_budget=starts_budget,
+            optimize_seconds=optimize_seconds, use_cache=use_cache,
+            time_budget_ms=time_budget_ms))
+
+
+@router.post("/stream/generer/{promo_id}")
+def stream_planning_generation(
+    promo_id: str,
+    promotion_year_id: str = None,
+    promotion_year_ids: List[str] = Query(None),
+    date_debut: str = None,
+    all_years_mode: bool = False,
+    solver: str = GREEDY_SOLVER,
+    starts: int = Query(1, ge=1, le=MAX_STARTS),
+    starts_budget: float = Query(MULTISTART_BUDGET_SECONDS, gt=0),
+    optimize_seconds: float = Query(0, ge=0, le=MAX_OPTIMIZE_SECONDS),
+    use_cache: bool = True,
+    time_budget_ms: int = Query(None, gt=0),
+):
+    """
+    Run the same generation as /generer in the background and stream its
+    progress as server-sent events until the result (or the error) is sent
+    """
+    job = planning_jobs.submit(
+        "generation",
+        lambda db, progress: _generate_planning_payload(
+            db, promo_id, promotion_year_id, promotion_year_ids, date_debut, all_years_mode, solver,
+            progress=progress, starts=starts, starts_budget=starts_budget,
+            optimize_seconds=optimize_seconds, use_cache=use_cache,
+            time_budget_ms=time_budget_ms))
+
+    def events():
+        for event, state in planning_jobs.events(job["id"]):
+            if event not in ("termine", "echoue"):
+                # The result is only sent with the last event
+                state = {key: value for key, value in state.items()
+                         if key not in ("resultat", "erreur", "code_erreur")}
+            yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(state))}\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.delete("/cache", response_model=MessageResponse)
+def invalidate_planning_cache(
+    promo_id: str = None,
+    promotion_year_id: str = None,
+    db: Session = Depends(get_db)
+):
+    """Forget stored scheduler outputs (all, of a promotion or of a year)"""
+    deleted = planning_cache.invalidate(
+        db, promo_id=promo_id, promotion_year_id=promotion_year_id)
+    return {"message": f"{deleted} résultat(s) de planification supprimé(s) du cache"}
+
+
+@router.get("/jobs/{job_id}", response_model=PlanningJob)
+def get_planning_job(job_id: str):
+    """Status, progress and, once done, result of a background generation"""
+    job = planning_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche non trouvée")
+    return job
+
+
+def _generate_planning_payload(
+    db: Session, promo_id: str, promotion_year_id: str, promotion_year_ids: List[str],
+    date_debut: str, all_years_mode: bool, solver: str, progress=None,
+    starts: int = 1, starts_budget: float = MULTISTART_BUDGET_SECONDS, optimize_seconds: float = 0,
+    use_cache: bool = True, time_budget_ms: int = None
+) -> dict:
+    """Run a planning generation and build its PlanningResponse payload"""
 
     # Get planning settings for default date_debut
     from ...crud.planning_settings import planning_settings
@@ -123,8 +252,11 @@ def generate_planning(
             db=db,
             promo_id=promo_id,
             date_debut=date_debut,
-            promotion_years=promotion_years
+            promotion_years=promotion_years,
+            progress=progress,
+            time_budget_ms=time_budget_ms
         )
+        unscheduled = getattr(db_planning, 'paires_non_planifiees', [])
 
         # Return the single big planning
         planning_dict = {
@@ -155,13 +287,20 @@ def generate_planning(
             "message": "Planning généré avec succès pour toutes les années combinées",
             "planning": planning_dict,
             "number_of_services": number_of_services,
-            "number_of_students": number_of_students
+            "number_of_students": number_of_students,
+            "optimalites": planning.get_optimality_reports(db, db_planning=db_planning),
+            "partiel": bool(unscheduled),
+            "paires_non_planifiees": unscheduled
         }
 
     # Original logic for single year or all years mode
     db_planning, number_of_services, number_of_students = planning.generate_planning(
-        db=db, promo_id=promo_id, date_debut=date_debut, all_years_mode=all_years_mode, promotion_year_id=promotion_year_id
+        db=db, promo_id=promo_id, date_debut=date_debut, all_years_mode=all_years_mode, promotion_year_id=promotion_year_id,
+        solver=solver, progress=progress, starts=starts, starts_budget=starts_budget,
+        optimize_budget=optimize_seconds, use_cache=use_cache, time_budget_ms=time_budget_ms
     )
+    unscheduled = [pair for plan in (db_planning if all_years_mode else [db_planning])
+                   for pair in getattr(plan, 'paires_non_planifiees', [])]
 
     if all_years_mode:
         # db_planning is a list of plannings, one per year
@@ -195,7 +334,11 @@ def generate_planning(
             "message": "Planning généré avec succès",
             "plannings": plannings_list,
             "number_of_services": number_of_services,
-            "number_of_students": number_of_students
+            "number_of_students": number_of_students,
+            "optimalites": [report for plan in db_planning
+                            for report in planning.get_optimality_reports(db, db_planning=plan)],
+            "partiel": bool(unscheduled),
+            "paires_non_planifiees": unscheduled
         }
     else:
         # Single planning (default behavior)
@@ -222,14 +365,106 @@ def generate_planning(
                 "service_nom": rotation.service.nom
             }
             planning_dict["rotations"].append(rotation_dict)
+        optimality_reports = planning.get_optimality_reports(
+            db, db_planning=db_planning)
         return {
             "message": "Planning généré avec succès",
             "planning": planning_dict,
             "number_of_services": number_of_services,
-            "number_of_students": number_of_students
+            "number_of_students": number_of_students,
+            "optimalite": optimality_reports[0] if optimality_reports else None,
+            "partiel": bool(unscheduled),
+            "paires_non_planifiees": unscheduled
         }
 
 
+@router.post("/generer-specialite/{speciality_id}", response_model=PlanningResponse)
+def generate_speciality_plannings(
+    speciality_id: str,
+    date_debut: str = None,  # Defaults to each year's start date, then the settings
+    db: Session = Depends(get_db)
+):
+    """Generate every promotion and year of a speciality with shared service capacity"""
+    db_plannings, number_of_services, number_of_students = planning.generate_speciality_plannings(
+        db, speciality_id=speciality_id, date_debut=date_debut)
+
+    plannings_list = []
+    for plan in db_plannings:
+        plannings_list.append({
+            "id": plan.id,
+            "promo_id": plan.promo_id,
+            "promotion_year_id": plan.promotion_year_id,
+            "annee_niveau": plan.annee_niveau,
+            "date_creation": plan.date_creation,
+            "promo_nom": plan.promotion.nom,
+            "rotations": [
+                {
+                    "id": rotation.id,
+                    "etudiant_id": rotation.etudiant_id,
+                    "service_id": rotation.service_id,
+                    "date_debut": rotation.date_debut,
+                    "date_fin": rotation.date_fin,
+                    "ordre": rotation.ordre,
+                    "planning_id": rotation.planning_id,
+                    "promotion_year_id": rotation.promotion_year_id,
+                    "etudiant_nom": f"{rotation.etudiant.prenom} {rotation.etudiant.nom}",
+                    "service_nom": rotation.service.nom
+                }
+                for rotation in plan.rotations
+            ]
+        })
+    return {
+        "message": f"{len(plannings_list)} planning(s) générés avec capacité partagée",
+        "plannings": plannings_list,
+        "number_of_services": number_of_services,
+        "number_of_students": number_of_students,
+        "optimalites": [report for plan in db_plannings
+                        for report in planning.get_optimality_reports(db, db_planning=plan)]
+    }
+
+
+@router.get("/faisabilite/{promo_id}", response_model=PlanningFeasibilityDiagnosis)
+def check_planning_feasibility(
+    promo_id: str,
+    promotion_year_id: str = None,  # Defaults to the active year
+    # Optional deadline: also report services and workloads that do not fit in it
+    horizon_days: int = Query(None, gt=0),
+    db: Session = Depends(get_db)
+):
+    """Check in milliseconds whether a planning can be generated, and why not"""
+    return planning.diagnose_feasibility(
+        db, promo_id=promo_id, promotion_year_id=promotion_year_id, horizon_days=horizon_days)
+
+
+@router.post("/simulate", response_model=PlanningSimulationResponse)
+def simulate_planning(
+    request: PlanningSimulationRequest,
+    db: Session = Depends(get_db)
+):
+    """Run what-if scenarios in memory, without touching the stored plannings"""
+    return planning.simulate(
+        db, promo_id=request.promo_id, scenarios=request.scenarios,
+        promotion_year_id=request.promotion_year_id, date_debut=request.date_debut)
+
+
+@router.post("/{planning_id}/reparer", response_model=PlanningRepairResult)
+def repair_planning(
+    planning_id: str,
+    # Rotations started on or before this date are kept as they are (default: today)
+    date_reference: str = None,
+    db: Session = Depends(get_db)
+):
+    """Re-plan only the students affected by roster or capacity changes"""
+    from ...models import Planning as PlanningModel
+
+    db_planning = db.query(PlanningModel).filter(
+        PlanningModel.id == planning_id).first()
+    if not db_planning:
+        raise HTTPException(status_code=404, detail="Planning non trouvé")
+    return planning.repair_planning(
+        db, db_planning=db_planning, date_reference=date_reference)
+
+
 @router.get("/{promo_id}", response_model=Planning)
 def get_planning(
     promo_id: str,
@@ -300,13 +535,17 @@ def get_student_planning(
     }
 
 
-@router.put("/rotation/{rotation_id}", response_model=MessageResponse)
+@router.put("/rotation/{rotation_id}", response_model=RotationUpdateResult)
 def update_rotation(
     rotation_id: str,
     rotation_update: RotationUpdate,
     db: Session = Depends(get_db)
 ):
-    """Update a specific rotation"""
+    """
+    Update a specific rotation. The edit is checked against the planning's
+    interval index: overlaps and capacity overruns are refused, new gaps in the
+    student's timeline are returned as warnings.
+    """
     try:
         # Get the existing rotation
         db_rotation = rotation.get(db, id=rotation_id)
@@ -314,6 +553,7 @@ def update_rotation(
             raise HTTPException(status_code=404, detail="Rotation non trouvée")
 
         # Validate the service exists if provided
+        service = db_rotation.service
         if rotation_update.service_id:
             service = service_crud.get(db, id=rotation_update.service_id)
             if not service:
@@ -328,13 +568,13 @@ def update_rotation(
                     status_code=404, detail="Étudiant non trouvé")
 
         # Only update fields that are provided (not None)
-        update_data = rotation_update.dict(exclude_unset=True)
+        update_data = rotation_update.dict(exclude_unset=True, exclude_none=True)
 
         # Update the rotation
-        updated_rotation = rotation.update(
-            db, db_obj=db_rotation, obj_in=update_data)
+        warnings = rotation.update_with_incremental_check(
+            db, db_obj=db_rotation, obj_in=update_data, service=service)
 
-        return {"message": "Rotation mise à jour avec succès"}
+        return {"message": "Rotation mise à jour avec succès", "warnings": warnings}
 
     except HTTPException:
         raise
@@ -570,14 +810,51 @@ def get_planning_details(
 @router.get("/{planning_id}/validate", response_model=PlanningValidationResult)
 def validate_planning(
     planning_id: str,
+    request: Request,
+    response: Response,
+    # "sql" runs the checks in PostgreSQL and only fetches the violations
+    mode: str = VALIDATION_PYTHON,
     db: Session = Depends(get_db)
 ):
-    """Validate a planning and return warnings/conflicts"""
-    result = rotation.validate_all_assignments(db, planning_id=planning_id)
+    """
+    Validate a planning and return warnings/conflicts. The result of each mode
+    is kept until the planning's version changes; the version and the mode make
+    the ETag, so clients can revalidate with If-None-Match.
+    """
+    if mode not in VALIDATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Mode de validation inconnu: {mode} (valeurs possibles: {', '.join(VALIDATION_MODES)})"
+        )
+    if mode == VALIDATION_SQL:
+        # Before the cache, so that the answer does not depend on earlier requests
+        rotation.require_database_validation(db)
+    db_planning = planning.get(db, id=planning_id)
+    result = None
+    if db_planning:
+        etag = planning_validation.etag(db_planning, mode)
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        result = planning_validation.cached(db_planning, mode)
+        if result is not None:
+            logger.debug(f"🗃️  {mode} validation of planning {planning_id} served from version {db_planning.version}")
+
+    if result is None:
+        if mode == VALIDATION_SQL:
+            result = rotation.validate_all_assignments_in_database(db, planning_id=planning_id)
+        else:
+            result = rotation.validate_all_assignments(db, planning_id=planning_id)
+        # A failed validation (no rotations yet errors) is not kept
+        if db_planning and (result["is_valid"] or result["total_rotations"]):
+            planning_validation.store(
+                db, planning=db_planning, version=db_planning.version, mode=mode, result=result)
+
     # The result dict may have keys 'is_valid', 'erreurs', 'warnings', etc.
     # Map 'erreurs' to 'errors' and ensure 'warnings' is present
     return {
         "is_valid": result.get("is_valid", False),
         "erreurs": result.get("erreurs", []),
         "warnings": result.get("warnings", []),
+        "depassements_capacite": result.get("depassements_capacite", []),
     }
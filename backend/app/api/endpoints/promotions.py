@@ -1,11 +1,12 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from ...database import get_db
-from ...crud import promotion, service
+from ...crud import promotion, service, planning, planning_validation
 from ...schemas import Promotion, PromotionCreate, IdResponse, MessageResponse, Service
-from ...models import Etudiant
+from ...models import Etudiant, Planning, Rotation
 
 router = APIRouter()
 
@@ -75,6 +76,8 @@ def delete_promotion(
 def toggle_student_status(
     promotion_id: str,
     student_id: str,
+    # Repair the promotion's plannings instead of waiting for a full regeneration
+    replanifier: bool = False,
     db: Session = Depends(get_db)
 ):
     """Toggle student active status (enable/disable for planning)"""
@@ -94,10 +97,35 @@ def toggle_student_status(
 
     # Toggle the status
     db_student.is_active = not db_student.is_active
-    db.commit()
+    # Validations warn about active students without rotations
+    planning_validation.bump_all(db, promo_id=promotion_id)
 
     status_text = "activé" if db_student.is_active else "désactivé"
-    return {"message": f"Étudiant {db_student.prenom} {db_student.nom} {status_text} avec succès"}
+    message = f"Étudiant {db_student.prenom} {db_student.nom} {status_text} avec succès"
+    if not replanifier:
+        db.commit()
+        return {"message": message}
+
+    db.flush()
+    # Only the plannings holding the student or covering the student's year
+    plannings = db.query(Planning).filter(
+        Planning.promo_id == promotion_id,
+        or_(
+            Planning.annee_niveau == db_student.annee_courante,
+            Planning.id.in_(db.query(Rotation.planning_id).filter(
+                Rotation.etudiant_id == student_id))
+        )
+    ).all()
+    # The toggle and the repairs succeed or fail together
+    try:
+        for db_planning in plannings:
+            planning.repair_planning(db, db_planning=db_planning, commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    message += f" ({len(plannings)} planning(s) réparé(s))"
+    return {"message": message}
 
 
 # Promotion-Service assignment endpoints
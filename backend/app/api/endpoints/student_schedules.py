@@ -403,53 +403,47 @@ def generate_student_schedules_from_rotations(
         planning_start_date = min(all_start_dates).strftime("%Y-%m-%d")
         planning_end_date = max(all_end_dates).strftime("%Y-%m-%d")
 
-        created_schedules = 0
-
-        for etudiant_id, student_rotations in rotations_by_student.items():
-            # Check if student schedule already exists for this planning
-            existing_schedule = db.query(StudentScheduleModel).filter(
-                StudentScheduleModel.etudiant_id == etudiant_id,
+        # Students that already have an active schedule for this planning
+        existing_students = {
+            etudiant_id for (etudiant_id,) in db.query(StudentScheduleModel.etudiant_id).filter(
                 StudentScheduleModel.planning_id == planning.id,
                 StudentScheduleModel.is_active == True
-            ).first()
+            )
+        }
+
+        # Service names, loaded once instead of per rotation
+        service_names = dict(db.query(Service.id, Service.nom).filter(
+            Service.id.in_({r.service_id for r in rotations})))
 
-            if existing_schedule:
+        new_rotations_by_student = {}
+        for etudiant_id, student_rotations in rotations_by_student.items():
+            if etudiant_id in existing_students:
                 continue  # Skip if already exists
 
             # Sort rotations by order
             sorted_rotations = sorted(student_rotations, key=lambda r: r.ordre)
 
-            # Convert rotations to the format expected by create_from_planning
-            rotations_dict = []
-            for rotation in sorted_rotations:
-                # Get service name from the service table
-                service_name = "Service"
-                if rotation.service_id:
-                    service = db.query(Service).filter(
-                        Service.id == rotation.service_id).first()
-                    if service:
-                        service_name = service.nom
-
-                rotations_dict.append({
+            # Convert rotations to the format expected by create_many_from_planning
+            new_rotations_by_student[etudiant_id] = [
+                {
                     'id': rotation.id,
                     'service_id': rotation.service_id,
-                    'service_nom': service_name,
+                    'service_nom': service_names.get(rotation.service_id, "Service"),
                     'ordre': rotation.ordre,
                     'date_debut': rotation.date_debut,
                     'date_fin': rotation.date_fin
-                })
-
-            # Use the existing create_from_planning method
-            student_schedule.create_from_planning(
-                db=db,
-                planning_id=planning.id,
-                etudiant_id=etudiant_id,
-                rotations=rotations_dict,
-                date_debut_planning=planning_start_date,
-                date_fin_planning=planning_end_date
-            )
-
-            created_schedules += 1
+                }
+                for rotation in sorted_rotations
+            ]
+
+        # Bulk-create every missing schedule in one transaction
+        created_schedules = student_schedule.create_many_from_planning(
+            db=db,
+            planning_id=planning.id,
+            rotations_by_student=new_rotations_by_student,
+            date_debut_planning=planning_start_date,
+            date_fin_planning=planning_end_date
+        )
 
         return {"message": f"Plannings individuels créés pour {created_schedules} étudiant(s)"}
 
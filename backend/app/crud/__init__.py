@@ -7,7 +7,10 @@ from .advanced_planning import get_advanced_planning_algorithm
 from .student_schedule import student_schedule
 from .speciality import speciality
 from .promotion_year import promotion_year
+from .planning_cache import planning_cache
+from .planning_validation import planning_validation
 
 # Export all CRUD objects
 __all__ = ["promotion", "service", "planning", "etudiant", "rotation",
-           "get_advanced_planning_algorithm", "student_schedule", "speciality", "promotion_year"]
+           "get_advanced_planning_algorithm", "student_schedule", "speciality", "promotion_year",
+           "planning_cache", "planning_validation"]
@@ -1,4 +1,4 @@
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 import uuid
@@ -7,6 +7,9 @@ from dataclasses import dataclass
 from collections import defaultdict
 
 from ..models import Planning, Promotion, Service, Rotation, Etudiant
+from .bulk import bulk_insert
+from ..scheduling import LOAD_STRATEGY, PlanningAnalysis, SchedulingProblem, ServiceLoad, analyze, schedule
+from ..scheduling.intervals import to_date, to_day
 from ..schemas import (
     PlanningEfficiencyAnalysis,
     PlanningValidationResult,
@@ -29,7 +32,6 @@ class AdvancedPlanningAlgorithm:
 
     def __init__(self, db: Session):
         self.db = db
-        self.service_occupation = defaultdict(lambda: defaultdict(int))
         self.student_completed_services = defaultdict(set)
         self.student_next_available_date = {}
 
@@ -59,11 +61,11 @@ class AdvancedPlanningAlgorithm:
             promotion_dict, services_list, date_debut_str
         )
 
-        # Save to database
+        # Save planning, rotations and student schedules in one transaction
         db_planning = self._save_planning_to_db(planning_result)
-
-        # Create student schedules
         self._create_student_schedules(db_planning, planning_result)
+        self.db.commit()
+        self.db.refresh(db_planning)
 
         # Analyze efficiency and validate
         efficiency_analysis = self._analyze_planning_efficiency(
@@ -139,9 +141,9 @@ class AdvancedPlanningAlgorithm:
                 StudentSchedule.planning_id == planning.id).all()
 
             # Delete student schedule details first
-            for schedule in student_schedules:
+            for student_schedule in student_schedules:
                 self.db.query(StudentScheduleDetail).filter(
-                    StudentScheduleDetail.schedule_id == schedule.id).delete()
+                    StudentScheduleDetail.schedule_id == student_schedule.id).delete()
 
             # Delete student schedules
             self.db.query(StudentSchedule).filter(
@@ -159,7 +161,6 @@ class AdvancedPlanningAlgorithm:
 
     def _reset_algorithm_state(self, etudiants: List[Dict], date_debut_str: str):
         """Reset algorithm internal state"""
-        self.service_occupation.clear()
         self.student_completed_services.clear()
         self.student_next_available_date.clear()
 
@@ -175,7 +176,6 @@ class AdvancedPlanningAlgorithm:
         Generate optimized planning with improved algorithm
         """
         etudiants = promotion['etudiants']
-        nb_etudiants = len(etudiants)
         nb_services = len(services)
 
         # Validation
@@ -184,39 +184,31 @@ class AdvancedPlanningAlgorithm:
         # Sort services by name for consistent ordering
         services_sorted = sorted(services, key=lambda x: x['nom'])
 
-        rotations = []
-        max_iterations = nb_etudiants * nb_services * 2  # Increased safety margin
-        iteration = 0
-
-        while iteration < max_iterations:
-            iteration += 1
-
-            # Check if all students completed all services
-            if self._all_students_completed(etudiants, nb_services):
-                break
-
-            progress_made = False
-
-            # Process each student
-            for etudiant in etudiants:
-                if self._student_completed_all_services(etudiant['id'], nb_services):
-                    continue
-
-                # Find best service assignment
-                best_assignment = self._find_best_service_assignment(
-                    etudiant['id'], services_sorted
-                )
-
-                if best_assignment:
-                    rotation = self._create_rotation(etudiant, best_assignment)
-                    rotations.append(rotation)
-                    self._update_algorithm_state(
-                        etudiant['id'], best_assignment)
-                    progress_made = True
+        # The shared kernel serves students from a heap of availability events;
+        # when no slot is free within 90 days the search window moves forward
+        problem = SchedulingProblem(
+            student_ids=tuple(e['id'] for e in etudiants),
+            service_ids=tuple(s['id'] for s in services_sorted),
+            durations=tuple(s['duree_stage_jours'] for s in services_sorted),
+            capacities=tuple(s['places_disponibles'] for s in services_sorted),
+            start_date=date_debut_str,
+            rest_days=1,
+            max_delay=89,
+            strategy=LOAD_STRATEGY,
+        )
+        result = schedule(problem)
 
-            if not progress_made:
-                # Advance all student dates by one day to break deadlock
-                self._advance_all_student_dates()
+        rotations = []
+        for student_index, service_index, start_day, end_day in result.rotations:
+            etudiant = etudiants[student_index]
+            best_assignment = {
+                'service': services_sorted[service_index],
+                'start_date': problem.to_date(start_day),
+                'end_date': problem.to_date(end_day),
+                'order': len(self.student_completed_services[etudiant['id']]) + 1
+            }
+            rotations.append(self._create_rotation(etudiant, best_assignment))
+            self._update_algorithm_state(etudiant['id'], best_assignment)
 
         # Final validation
         self._validate_final_assignment(etudiants, nb_services)
@@ -248,128 +240,6 @@ class AdvancedPlanningAlgorithm:
                     detail=f"Service '{service['nom']}' n'a pas de places disponibles"
                 )
 
-    def _all_students_completed(self, etudiants: List[Dict], nb_services: int) -> bool:
-        """Check if all students completed all services"""
-        return all(
-            len(self.student_completed_services[etudiant['id']]) == nb_services
-            for etudiant in etudiants
-        )
-
-    def _student_completed_all_services(self, etudiant_id: str, nb_services: int) -> bool:
-        """Check if a student completed all services"""
-        return len(self.student_completed_services[etudiant_id]) == nb_services
-
-    def _find_best_service_assignment(
-        self, etudiant_id: str, services: List[Dict]
-    ) -> Optional[Dict]:
-        """Find the best service assignment for a student"""
-        available_services = [
-            s for s in services
-            if s['id'] not in self.student_completed_services[etudiant_id]
-        ]
-
-        if not available_services:
-            return None
-
-        best_assignment = None
-        best_score = -1
-
-        for service in available_services:
-            assignment = self._evaluate_service_assignment(
-                service, self.student_next_available_date[etudiant_id]
-            )
-
-            if assignment and assignment['score'] > best_score:
-                best_score = assignment['score']
-                best_assignment = assignment
-
-        return best_assignment
-
-    def _evaluate_service_assignment(
-        self, service: Dict, preferred_date: datetime
-    ) -> Optional[Dict]:
-        """Evaluate a service assignment and return best option"""
-        service_id = service['id']
-        duration = service['duree_stage_jours']
-        capacity = service['places_disponibles']
-
-        # Look for available slot within 90 days
-        for day_offset in range(90):
-            candidate_date = preferred_date + timedelta(days=day_offset)
-
-            if self._is_service_available(service_id, candidate_date, duration, capacity):
-                score = self._calculate_service_score(
-                    service, candidate_date, day_offset)
-                return {
-                    'service': service,
-                    'start_date': candidate_date,
-                    'end_date': candidate_date + timedelta(days=duration - 1),
-                    'score': score,
-                    'order': 1  # Will be set properly by the caller
-                }
-
-        return None
-
-    def _is_service_available(
-        self, service_id: str, start_date: datetime, duration: int, capacity: int
-    ) -> bool:
-        """Check if service is available for the entire duration"""
-        for day in range(duration):
-            check_date = start_date + timedelta(days=day)
-            date_str = check_date.strftime("%Y-%m-%d")
-
-            if self.service_occupation[service_id][date_str] >= capacity:
-                return False
-
-        return True
-
-    def _calculate_service_score(
-        self, service: Dict, candidate_date: datetime, day_offset: int
-    ) -> float:
-        """Calculate score for service assignment"""
-        service_id = service['id']
-        capacity = service['places_disponibles']
-        duration = service['duree_stage_jours']
-
-        # 1. Availability score (higher for less occupied services)
-        current_occupation = self.service_occupation[service_id][candidate_date.strftime(
-            "%Y-%m-%d")]
-        availability_score = (capacity - current_occupation) / capacity
-
-        # 2. Capacity score (favor services with more total capacity)
-        max_capacity = max(s['places_disponibles']
-                           for s in self._get_all_services())
-        capacity_score = capacity / max_capacity
-
-        # 3. Urgency score (favor bottleneck services)
-        urgency_score = (max_capacity - capacity + 1) / max_capacity
-
-        # 4. Duration score (favor longer internships)
-        max_duration = max(s['duree_stage_jours']
-                           for s in self._get_all_services())
-        duration_score = duration / max_duration
-
-        # 5. Date penalty (prefer earlier dates)
-        date_penalty = max(0, 1 - (day_offset / 30.0))
-
-        # Weighted final score
-        final_score = (
-            availability_score * 0.35 +
-            capacity_score * 0.20 +
-            urgency_score * 0.20 +
-            duration_score * 0.10 +
-            date_penalty * 0.15
-        )
-
-        return final_score
-
-    def _get_all_services(self) -> List[Dict]:
-        """Get all services (cached for scoring)"""
-        if not hasattr(self, '_cached_services'):
-            self._cached_services = self._convert_services_to_list(
-                self._get_services())
-        return self._cached_services
-
     def _create_rotation(self, etudiant: Dict, assignment: Dict) -> RotationSchema:
         """Create rotation from assignment"""
         return RotationSchema(
@@ -385,18 +255,10 @@ class AdvancedPlanningAlgorithm:
         )
 
     def _update_algorithm_state(self, etudiant_id: str, assignment: Dict):
-        """Update algorithm state after assignment"""
+        """Update algorithm state after assignment (occupancy is kept by the kernel)"""
         service_id = assignment['service']['id']
-        start_date = assignment['start_date']
         end_date = assignment['end_date']
 
-        # Update service occupation
-        current_date = start_date
-        while current_date <= end_date:
-            date_str = current_date.strftime("%Y-%m-%d")
-            self.service_occupation[service_id][date_str] += 1
-            current_date += timedelta(days=1)
-
         # Update student completed services
         self.student_completed_services[etudiant_id].add(service_id)
 
@@ -404,11 +266,6 @@ class AdvancedPlanningAlgorithm:
         self.student_next_available_date[etudiant_id] = end_date + \
             timedelta(days=1)
 
-    def _advance_all_student_dates(self):
-        """Advance all student dates by one day to break deadlocks"""
-        for etudiant_id in self.student_next_available_date:
-            self.student_next_available_date[etudiant_id] += timedelta(days=1)
-
     def _validate_final_assignment(self, etudiants: List[Dict], nb_services: int):
         """Validate that all students have been assigned to all services"""
         for etudiant in etudiants:
@@ -419,7 +276,7 @@ class AdvancedPlanningAlgorithm:
                 )
 
     def _save_planning_to_db(self, planning_result: PlanningSchema) -> Planning:
-        """Save planning result to database"""
+        """Save planning result to database (committed by the caller)"""
         # Create the main planning record
         db_planning = Planning(
             id=planning_result.id,
@@ -431,22 +288,20 @@ class AdvancedPlanningAlgorithm:
         self.db.add(db_planning)
         self.db.flush()  # Get the ID
 
-        # Create rotation records
-        for rotation in planning_result.rotations:
-            db_rotation = Rotation(
-                id=rotation.id,
-                etudiant_id=rotation.etudiant_id,
-                service_id=rotation.service_id,
-                date_debut=rotation.date_debut,
-                date_fin=rotation.date_fin,
-                ordre=rotation.ordre,
-                planning_id=db_planning.id,
-                promotion_year_id=db_planning.promotion_year_id  # <-- Ensure this is set
-            )
-            self.db.add(db_rotation)
-
-        self.db.commit()
-        self.db.refresh(db_planning)
+        # Create rotation records in executemany batches
+        bulk_insert(self.db, Rotation, [
+            {
+                'id': rotation.id,
+                'etudiant_id': rotation.etudiant_id,
+                'service_id': rotation.service_id,
+                'date_debut': rotation.date_debut,
+                'date_fin': rotation.date_fin,
+                'ordre': rotation.ordre,
+                'planning_id': db_planning.id,
+                'promotion_year_id': db_planning.promotion_year_id  # <-- Ensure this is set
+            }
+            for rotation in planning_result.rotations
+        ])
         return db_planning
 
     def _create_student_schedules(self, db_planning: Planning, planning_result: PlanningSchema):
@@ -467,82 +322,52 @@ class AdvancedPlanningAlgorithm:
         planning_start_date = min(all_start_dates).strftime("%Y-%m-%d")
         planning_end_date = max(all_end_dates).strftime("%Y-%m-%d")
 
-        # Create schedule for each student
-        for etudiant_id, rotations in rotations_by_student.items():
-            rotations_dict = [
-                {
-                    'id': rotation.id,
-                    'service_id': rotation.service_id,
-                    'service_nom': rotation.service_nom,
-                    'ordre': rotation.ordre,
-                    'date_debut': rotation.date_debut,
-                    'date_fin': rotation.date_fin
-                }
-                for rotation in rotations
-            ]
-
-            student_schedule.create_from_planning(
-                db=self.db,
-                planning_id=db_planning.id,
-                etudiant_id=etudiant_id,
-                rotations=rotations_dict,
-                date_debut_planning=planning_start_date,
-                date_fin_planning=planning_end_date
-            )
+        # Create every student's schedule in bulk, within the planning transaction
+        student_schedule.create_many_from_planning(
+            db=self.db,
+            planning_id=db_planning.id,
+            rotations_by_student={
+                etudiant_id: [
+                    {
+                        'id': rotation.id,
+                        'service_id': rotation.service_id,
+                        'service_nom': rotation.service_nom,
+                        'ordre': rotation.ordre,
+                        'date_debut': rotation.date_debut,
+                        'date_fin': rotation.date_fin
+                    }
+                    for rotation in rotations
+                ]
+                for etudiant_id, rotations in rotations_by_student.items()
+            },
+            date_debut_planning=planning_start_date,
+            date_fin_planning=planning_end_date,
+            commit=False
+        )
 
     def _analyze_planning_efficiency(
         self, planning: PlanningSchema, services: List[Dict]
     ) -> PlanningEfficiencyAnalysis:
         """Analyze the efficiency of the generated planning"""
-        services_dict = {s['id']: s for s in services}
-
-        # Calculate overall planning duration
-        start_dates = [datetime.strptime(
-            r.date_debut, "%Y-%m-%d") for r in planning.rotations]
-        end_dates = [datetime.strptime(r.date_fin, "%Y-%m-%d")
-                     for r in planning.rotations]
-
-        planning_start = min(start_dates)
-        planning_end = max(end_dates)
-        total_duration = (planning_end - planning_start).days + 1
+        analysis = self._analyze(planning, services)
 
         # Calculate service occupation statistics
         service_occupation = {}
         for service in services:
-            service_id = service['id']
-            service_rotations = [
-                r for r in planning.rotations if r.service_id == service_id]
-
-            daily_occupation = defaultdict(int)
-            for rotation in service_rotations:
-                start_date = datetime.strptime(rotation.date_debut, "%Y-%m-%d")
-                end_date = datetime.strptime(rotation.date_fin, "%Y-%m-%d")
-
-                current_date = start_date
-                while current_date <= end_date:
-                    date_str = current_date.strftime("%Y-%m-%d")
-                    daily_occupation[date_str] += 1
-                    current_date += timedelta(days=1)
-
-            if daily_occupation:
-                avg_occupation = sum(
-                    daily_occupation.values()) / len(daily_occupation)
-                occupation_rate = avg_occupation / \
-                    service['places_disponibles']
-            else:
-                avg_occupation = 0
-                occupation_rate = 0
+            load = analysis.services.get(service['id'], ServiceLoad())
+            avg_occupation = load.mean_occupation
+            occupation_rate = avg_occupation / service['places_disponibles']
 
             service_occupation[service['nom']] = ServiceOccupationStats(
                 taux_occupation=round(occupation_rate * 100, 1),
-                jours_actifs=len(daily_occupation),
+                jours_actifs=load.busy_days,
                 occupation_moyenne=round(avg_occupation, 1)
             )
 
         return PlanningEfficiencyAnalysis(
-            duree_totale_jours=total_duration,
-            date_debut=planning_start.strftime("%Y-%m-%d"),
-            date_fin=planning_end.strftime("%Y-%m-%d"),
+            duree_totale_jours=analysis.makespan,
+            date_debut=to_date(analysis.start_day),
+            date_fin=to_date(analysis.end_day),
             nb_rotations=len(planning.rotations),
             occupation_services=service_occupation
         )
@@ -551,24 +376,10 @@ class AdvancedPlanningAlgorithm:
         """Validate planning and return errors if any"""
         errors = []
         services_dict = {s['id']: s for s in services}
+        analysis = self._analyze(planning, services)
 
-        # Check capacity constraints
-        service_daily_occupation = defaultdict(lambda: defaultdict(list))
-
-        for rotation in planning.rotations:
-            service_id = rotation.service_id
-            start_date = datetime.strptime(rotation.date_debut, "%Y-%m-%d")
-            end_date = datetime.strptime(rotation.date_fin, "%Y-%m-%d")
-
-            current_date = start_date
-            while current_date <= end_date:
-                date_str = current_date.strftime("%Y-%m-%d")
-                service_daily_occupation[service_id][date_str].append(
-                    rotation.etudiant_nom)
-                current_date += timedelta(days=1)
-
-        # Check for capacity overruns
-        for service_id, daily_occupation in service_daily_occupation.items():
+        # Check for capacity overruns, one error per overbooked date range
+        for service_id, load in analysis.services.items():
             service = services_dict.get(service_id)
             if not service:
                 continue
@@ -576,20 +387,17 @@ class AdvancedPlanningAlgorithm:
             capacity = service['places_disponibles']
             service_name = service['nom']
 
-            for date_str, students in daily_occupation.items():
-                if len(students) > capacity:
-                    errors.append(
-                        f"Dépassement de capacité dans '{service_name}' le {date_str}: "
-                        f"{len(students)} étudiants pour {capacity} places disponibles"
-                    )
+            for overload in load.overloads:
+                start, end = to_date(overload.start_day), to_date(overload.end_day)
+                period = f"le {start}" if start == end else f"du {start} au {end}"
+                errors.append(
+                    f"Dépassement de capacité dans '{service_name}' {period}: "
+                    f"{overload.peak} étudiants pour {capacity} places disponibles"
+                )
 
         # Check that each student has all services
-        student_services = defaultdict(set)
-        for rotation in planning.rotations:
-            student_services[rotation.etudiant_id].add(rotation.service_id)
-
         required_services = set(s['id'] for s in services)
-        for student_id, assigned_services in student_services.items():
+        for student_id, assigned_services in analysis.student_services.items():
             if assigned_services != required_services:
                 missing_services = required_services - assigned_services
                 if missing_services:
@@ -610,6 +418,13 @@ class AdvancedPlanningAlgorithm:
             erreurs=errors
         )
 
+    def _analyze(self, planning: PlanningSchema, services: List[Dict]) -> PlanningAnalysis:
+        """Interval analysis of the planning against the places of each service"""
+        return analyze(
+            [(r.etudiant_id, r.service_id, to_day(r.date_debut), to_day(r.date_fin))
+             for r in planning.rotations],
+            capacities={s['id']: s['places_disponibles'] for s in services})
+
     def _convert_to_planning_response(self, db_planning: Planning) -> PlanningSchema:
         """Convert database planning to response format"""
         rotations = []
@@ -0,0 +1,38 @@
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+# Rows sent per executemany round-trip
+BATCH_SIZE = 1000
+
+
+def column_values(obj) -> Dict[str, Any]:
+    """Column values explicitly set on a transient ORM object"""
+    state = obj.__dict__
+    return {
+        column.key: state[column.key]
+        for column in obj.__table__.columns
+        if column.key in state
+    }
+
+
+def bulk_insert(db: Session, model, rows: Sequence[Dict[str, Any]], batch_size: int = BATCH_SIZE) -> int:
+    """
+    Insert plain row dicts with Core ``insert()`` executemany batches.
+
+    Rows bypass the unit of work entirely: nothing is added to the session and
+    nothing is committed, so several tables can be written in one transaction.
+    """
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(model), list(rows[i:i + batch_size]))
+    return len(rows)
+
+
+def bulk_insert_objects(db: Session, objects: Iterable, batch_size: int = BATCH_SIZE) -> int:
+    """Insert transient ORM objects of one model without attaching them to the session"""
+    objects = list(objects)
+    if not objects:
+        return 0
+    rows: List[Dict[str, Any]] = [column_values(obj) for obj in objects]
+    return bulk_insert(db, type(objects[0]), rows, batch_size)
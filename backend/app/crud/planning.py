@@ -1,21 +1,53 @@
 from .planning_settings import planning_settings
 from .utils import validate_string_length, handle_db_commit, handle_unique_constraint, db_commit_context
 from ..schemas import PlanningCreate, PlanningBase
-from ..models import Planning, Promotion, Service, Rotation, Etudiant, PromotionYear
+from ..models import Planning, Promotion, Service, Rotation, Etudiant, PromotionYear, Speciality
 from .base import CRUDBase
+from .bulk import bulk_insert_objects
+from .student_schedule import student_schedule
+from .planning_cache import planning_cache
+from .planning_validation import planning_validation
+from .rotation import rotation as rotation_crud
+from ..scheduling.intervals import to_day
+from ..scheduling import (
+    EXACT_TIME_LIMIT_SECONDS,
+    GREEDY_SOLVER,
+    MULTISTART_BUDGET_SECONDS,
+    SOLVERS,
+    OccupancyIndex,
+    ProgressCallback,
+    SchedulingProblem,
+    analyze,
+    diagnose,
+    improve,
+    makespan_bounds,
+    multistart,
+    problem_bounds,
+    refine,
+    repair,
+    schedule,
+    schedule_shared,
+    solve,
+    solve_many,
+)
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 import uuid
 from datetime import datetime, timedelta
 import logging
-import math
+import time
+from types import SimpleNamespace
+from dataclasses import replace
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Scenarios evaluated by one simulation request
+MAX_SIMULATION_SCENARIOS = 16
+
 
 class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
     def get_by_promotion(self, db: Session, *, promo_id: str) -> Optional[Planning]:
@@ -23,14 +55,40 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         return db.query(Planning).filter(Planning.promo_id == promo_id).first()
 
     def generate_planning(
-        self, db: Session, *, promo_id: str, date_debut: str = None, all_years_mode: bool = False, promotion_year_id: str = None
+        self, db: Session, *, promo_id: str, date_debut: str = None, all_years_mode: bool = False, promotion_year_id: str = None,
+        solver: str = GREEDY_SOLVER, progress: Optional[ProgressCallback] = None,
+        starts: int = 1, starts_budget: float = MULTISTART_BUDGET_SECONDS,
+        optimize_budget: float = 0, use_cache: bool = True, time_budget_ms: Optional[int] = None
     ) -> tuple[Planning, int, int]:
-        """Generate optimized planning for a promotion using planning settings"""
+        """
+        Generate optimized planning for a promotion using planning settings.
+
+        ``progress(rotations placed, rotations targeted)`` is called as the kernel
+        places rotations, e.g. to report the state of a background job. With
+        ``starts`` > 1, each year keeps the best of that many randomized runs
+        finished within ``starts_budget`` seconds. A positive ``optimize_budget``
+        then compresses each year with local search for that many seconds.
+        With ``use_cache``, years whose inputs did not change since the last
+        generation are not scheduled again (see ``planning_cache``).
+
+        ``time_budget_ms`` bounds the scheduling, multi-start, exact and local
+        search phases together: when it runs out the best planning found so far
+        is saved, possibly partial, and each planning lists its unscheduled
+        (student, service) pairs in ``paires_non_planifiees``.
+        """
+        deadline = time.monotonic() + time_budget_ms / 1000 if time_budget_ms else None
         logger.debug(
             f"🚀 Starting planning generation for promotion: {promo_id}")
         logger.debug(f"📅 Date debut: {date_debut}")
         logger.debug(f"🟢 all_years_mode: {all_years_mode}")
         logger.debug(f"📅 promotion_year_id: {promotion_year_id}")
+        logger.debug(f"🧮 solver: {solver}, starts: {starts}")
+
+        if solver not in SOLVERS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Solveur inconnu: {solver} (valeurs possibles: {', '.join(SOLVERS)})"
+            )
 
         # Get planning settings
         try:
@@ -105,7 +163,7 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             for year in promotion_years:
                 logger.debug(
                     f"   - Year {year.annee_niveau}: {year.nom or 'Unnamed'}")
-            created_plannings = []
+            prepared_years = []
             total_services = 0
             for promotion_year in promotion_years:
                 year_services = promotion_year.services
@@ -122,12 +180,97 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     continue
                 logger.debug(
                     f"✅ Found {len(year_services)} services and {len(year_students)} students for year {promotion_year.annee_niveau}")
-                year_planning = self._generate_planning_for_year(
-                    db, promotion, promotion_year, year_students, year_services,
-                    settings, date_debut, logger
-                )
-                created_plannings.append(year_planning)
+                problem, bounds = self._prepare_year(
+                    promotion_year, year_students, year_services, settings, date_debut, logger)
+                prepared_years.append(
+                    (promotion_year, year_students, year_services, problem, bounds))
                 total_services += len(year_services)
+
+            if not prepared_years:
+                # Checked before the previous plannings are deleted
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Aucune année avec des services et des étudiants à planifier"
+                )
+
+            # Years have disjoint students and their own services: schedule them
+            # concurrently, then replace every previous planning of the promotion
+            # and persist all years in one transaction
+            problems = [problem for *_, problem, _ in prepared_years]
+            fingerprints = [
+                planning_cache.fingerprint(
+                    problem, year_services, settings, solver=solver, starts=starts,
+                    starts_budget=starts_budget, optimize_budget=optimize_budget,
+                    time_budget=deadline is not None)
+                for _, _, year_services, problem, _ in prepared_years
+            ]
+            entries = [planning_cache.lookup(db, fingerprint) if use_cache else None
+                       for fingerprint in fingerprints]
+            stored = [planning_cache.stored_planning(db, entry) for entry in entries]
+            existing_ids = {p.id for p in db.query(Planning.id).filter(Planning.promo_id == promo_id)}
+            if stored and all(stored) and {p.id for p in stored} == existing_ids:
+                # Same inputs for every year and no planning edited since
+                db.commit()
+                logger.info("♻️  Inputs unchanged, returning the stored year plannings")
+                for (promotion_year, *_, problem, _), entry, year_planning in zip(
+                        prepared_years, entries, stored):
+                    year_planning.paires_non_planifiees = self._unscheduled_pairs(
+                        problem, planning_cache.to_result(entry), promotion_year)
+                if progress:
+                    progress(sum(len(p.rotations) for p in stored),
+                             sum(len(p.student_ids) * len(p.service_ids) for p in problems))
+                return stored, total_services, len(etudiants)
+
+            results = [planning_cache.to_result(entry) if entry else None for entry in entries]
+            missing_years = [i for i, result in enumerate(results) if result is None]
+            if starts > 1:
+                # Each multi-start run already uses every core
+                for i in missing_years:
+                    _, year_students, year_services, problem, bounds = prepared_years[i]
+                    results[i] = self._best_of_starts(
+                        problem, bounds, year_students, year_services, settings, solver,
+                        starts, starts_budget, logger, deadline)
+            else:
+                for i, result in zip(missing_years, solve_many(
+                        [self._within(problems[i], deadline) for i in missing_years], solver)):
+                    results[i] = result
+            if optimize_budget > 0:
+                for i in missing_years:
+                    *_, problem, bounds = prepared_years[i]
+                    budget = self._remaining(optimize_budget, deadline)
+                    if budget > 0 and not results[i].truncated:
+                        results[i] = improve(
+                            problem, results[i], budget, lower_bound=bounds.lower_bound)
+            if progress:
+                # Worker processes cannot report back: account for the years at once
+                progress(sum(len(r.rotations) for r in results),
+                         sum(len(p.student_ids) * len(p.service_ids) for p in problems))
+            for existing_planning in db.query(Planning).filter(Planning.promo_id == promo_id).all():
+                self._delete_planning(db, existing_planning)
+            created_plannings = [
+                self._persist_year(
+                    db, promotion, promotion_year, year_students, year_services, settings,
+                    problem, result, bounds, logger)
+                for (promotion_year, year_students, year_services, problem, bounds), result
+                in zip(prepared_years, results)
+            ]
+            for fingerprint, (promotion_year, *_), result, year_planning in zip(
+                    fingerprints, prepared_years, results, created_plannings):
+                if result.truncated:
+                    continue  # Depends on the time left, not only on the inputs
+                planning_cache.store(
+                    db, fingerprint=fingerprint, promo_id=promo_id,
+                    promotion_year_id=promotion_year.id, planning_id=year_planning.id,
+                    result=result)
+            try:
+                logger.debug("💾 Committing all year plannings to database")
+                db.commit()
+                for year_planning in created_plannings:
+                    db.refresh(year_planning)
+            except Exception as e:
+                logger.error(f"❌ Error committing plannings: {e}")
+                db.rollback()
+                handle_unique_constraint(e, "Le planning")
             # Return the first planning (or the active year planning if available)
             active_planning = next((p for p in created_plannings if p.promotion_year_id ==
                                     next((y.id for y in promotion_years if y.is_active), None)),
@@ -169,7 +312,9 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     f"   - {service.nom} (duration: {service.duree_stage_jours} days, capacity: {service.places_disponibles})")
             planning = self._generate_planning_for_year(
                 db, promotion, specific_year, etudiants, services,
-                settings, date_debut, logger
+                settings, date_debut, logger, solver=solver, progress=progress,
+                starts=starts, starts_budget=starts_budget, optimize_budget=optimize_budget,
+                use_cache=use_cache, deadline=deadline
             )
             return planning, len(services), len(etudiants)
         else:
@@ -202,14 +347,118 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     f"   - {service.nom} (duration: {service.duree_stage_jours} days, capacity: {service.places_disponibles})")
             planning = self._generate_planning_for_year(
                 db, promotion, active_year, etudiants, services,
-                settings, date_debut, logger
+                settings, date_debut, logger, solver=solver, progress=progress,
+                starts=starts, starts_budget=starts_budget, optimize_budget=optimize_budget,
+                use_cache=use_cache, deadline=deadline
             )
             return planning, len(services), len(etudiants)
 
+    def generate_speciality_plannings(
+        self, db: Session, *, speciality_id: str, date_debut: str = None
+    ) -> tuple[List[Planning], int, int]:
+        """
+        Generate the plannings of every promotion and year of a speciality in one
+        pass, against one shared service occupancy so that cohorts never overbook
+        a service together.
+        """
+        logger.debug(
+            f"🚀 Starting joint planning generation for speciality: {speciality_id}")
+        speciality = db.query(Speciality).filter(
+            Speciality.id == speciality_id).first()
+        if not speciality:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Spécialité non trouvée"
+            )
+        promotions = db.query(Promotion).filter(
+            Promotion.speciality_id == speciality_id).all()
+        if not promotions:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Aucune promotion pour cette spécialité"
+            )
+
+        # Reference data is loaded once for every cohort
+        settings = planning_settings.get_or_create_default(db)
+        promotion_ids = [p.id for p in promotions]
+        students_by_year = {}
+        for etudiant in db.query(Etudiant).filter(
+                Etudiant.promotion_id.in_(promotion_ids),
+                Etudiant.is_active == True):
+            students_by_year.setdefault(
+                (etudiant.promotion_id, getattr(etudiant, 'annee_courante', 1)), []).append(etudiant)
+        promotion_years = db.query(PromotionYear).options(
+            selectinload(PromotionYear.services)
+        ).filter(
+            PromotionYear.promotion_id.in_(promotion_ids)
+        ).order_by(PromotionYear.annee_niveau).all()
+        promotions_by_id = {p.id: p for p in promotions}
+
+        prepared_years = []
+        for promotion_year in promotion_years:
+            year_services = promotion_year.services
+            year_students = students_by_year.get(
+                (promotion_year.promotion_id, promotion_year.annee_niveau), [])
+            if not year_services or not year_students:
+                logger.warning(
+                    f"⚠️ Skipping {promotion_year.nom}: {len(year_services)} services, {len(year_students)} students")
+                continue
+            year_start = date_debut or promotion_year.date_debut or settings.academic_year_start
+            problem, bounds = self._prepare_year(
+                promotion_year, year_students, year_services, settings, year_start, logger)
+            prepared_years.append(
+                (promotion_year, year_students, year_services, problem, bounds))
+
+        if not prepared_years:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Aucune année à planifier pour cette spécialité"
+            )
+
+        # One shared occupancy index: capacity is respected across cohorts
+        results = schedule_shared(
+            [problem for *_, problem, _ in prepared_years])
+
+        planned_promotion_ids = {
+            promotion_year.promotion_id for promotion_year, *_ in prepared_years}
+        for existing_planning in db.query(Planning).filter(
+                Planning.promo_id.in_(planned_promotion_ids)).all():
+            self._delete_planning(db, existing_planning)
+        created_plannings = [
+            self._persist_year(
+                db, promotions_by_id[promotion_year.promotion_id], promotion_year,
+                year_students, year_services, settings, problem, result, bounds, logger)
+            for (promotion_year, year_students, year_services, problem, bounds), result
+            in zip(prepared_years, results)
+        ]
+        try:
+            logger.debug("💾 Committing speciality plannings to database")
+            db.commit()
+            for year_planning in created_plannings:
+                db.refresh(year_planning)
+        except Exception as e:
+            logger.error(f"❌ Error committing plannings: {e}")
+            db.rollback()
+            handle_unique_constraint(e, "Le planning")
+
+        nb_services = len({s.id for _, _, services, _, _ in prepared_years for s in services})
+        nb_students = sum(len(students) for _, students, *_ in prepared_years)
+        logger.info(
+            f"🎉 Joint planning of {len(created_plannings)} cohorts: {nb_students} students, {nb_services} services")
+        return created_plannings, nb_services, nb_students
+
     def generate_planning_for_all_years(
-        self, db: Session, *, promo_id: str, date_debut: str, promotion_years: List
+        self, db: Session, *, promo_id: str, date_debut: str, promotion_years: List,
+        progress: Optional[ProgressCallback] = None, time_budget_ms: Optional[int] = None
     ) -> tuple[Planning, int, int]:
-        """Generate one big planning that combines all years into a single comprehensive plan"""
+        """
+        Generate one big planning that combines all years into a single comprehensive plan.
+
+        ``time_budget_ms`` bounds the scheduling of all the years together, as in
+        ``generate_planning``; years reached after it ran out are left unscheduled
+        and listed in ``paires_non_planifiees``.
+        """
+        deadline = time.monotonic() + time_budget_ms / 1000 if time_budget_ms else None
         logger.debug(
             f"🚀 Starting ALL YEARS planning generation for promotion: {promo_id}")
         logger.debug(f"📅 Date debut: {date_debut}")
@@ -284,61 +533,148 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         # Generate the big planning
         planning = self._generate_big_planning_for_all_years(
             db, promotion, promotion_years, etudiants, all_services, all_services_by_year,
-            settings, date_debut, logger
+            settings, date_debut, logger, progress=progress, deadline=deadline
         )
 
         return planning, len(all_services), len(etudiants)
 
-    def _generate_planning_for_year(self, db, promotion, promotion_year, etudiants, services, settings, date_debut, logger):
-        """Helper to generate a single planning for a specific promotion year."""
+    def _generate_planning_for_year(self, db, promotion, promotion_year, etudiants, services, settings, date_debut, logger,
+                                    solver=GREEDY_SOLVER, progress=None,
+                                    starts=1, starts_budget=MULTISTART_BUDGET_SECONDS,
+                                    optimize_budget=0, use_cache=True, deadline=None):
+        """
+        Helper to generate a single planning for a specific promotion year.
+
+        With ``use_cache``, unchanged inputs return the stored planning, or reuse
+        the stored scheduler output when the planning was edited or replaced.
+        Every phase stops at ``deadline`` (``time.monotonic()`` value) if given.
+        """
+        problem, bounds = self._prepare_year(
+            promotion_year, etudiants, services, settings, date_debut, logger)
+
+        fingerprint = planning_cache.fingerprint(
+            problem, services, settings, solver=solver, starts=starts,
+            starts_budget=starts_budget, optimize_budget=optimize_budget,
+            time_budget=deadline is not None)
+        existing_planning = self.get_by_promotion(db, promo_id=promotion.id)
+        entry = planning_cache.lookup(db, fingerprint) if use_cache else None
+        stored = planning_cache.stored_planning(db, entry)
+        if stored is not None and existing_planning is not None and stored.id == existing_planning.id:
+            # Same inputs and the planning was not edited since: nothing to redo
+            db.commit()
+            logger.info(f"♻️  Inputs unchanged, returning stored planning {stored.id}")
+            if progress:
+                progress(len(stored.rotations), len(etudiants) * len(services))
+            stored.paires_non_planifiees = self._unscheduled_pairs(
+                problem, planning_cache.to_result(entry), promotion_year)
+            return stored
+
+        # Mandatory completion algorithm - the shared event-driven kernel serves
+        # students by (completed services, next available date), looks up to
+        # 1 year ahead for a slot and backtracks on stagnation
+        if entry is not None:
+            logger.info("♻️  Inputs already scheduled, reusing the cached output")
+            result = planning_cache.to_result(entry)
+            if progress:
+                progress(len(result.rotations), len(etudiants) * len(services))
+        elif starts > 1:
+            result = self._best_of_starts(
+                problem, bounds, etudiants, services, settings, solver,
+                starts, starts_budget, logger, deadline)
+            if progress:
+                progress(len(result.rotations), len(etudiants) * len(services))
+        else:
+            result = solve(self._within(problem, deadline), solver, bounds.lower_bound, progress)
+        budget = self._remaining(optimize_budget, deadline)
+        if budget > 0 and entry is None and not result.truncated:
+            # Shift, reorder and swap rotations to shorten the planning
+            result = improve(problem, result, budget, lower_bound=bounds.lower_bound)
+
+        # The planning is final: replace the previous one and persist it at once
+        if existing_planning:
+            self._delete_planning(db, existing_planning)
+        db_planning = self._persist_year(
+            db, promotion, promotion_year, etudiants, services, settings,
+            problem, result, bounds, logger)
+        if not result.truncated:
+            planning_cache.store(
+                db, fingerprint=fingerprint, promo_id=promotion.id,
+                promotion_year_id=promotion_year.id, planning_id=db_planning.id, result=result)
+
+        # Commit the planning with its rotations in one transaction
+        try:
+            logger.debug("💾 Committing planning to database")
+            db.commit()
+            db.refresh(db_planning)
+            logger.debug(
+                f"✅ Planning successfully created with ID: {db_planning.id}")
+            return db_planning
+        except Exception as e:
+            logger.error(f"❌ Error committing planning: {e}")
+            db.rollback()
+            handle_unique_constraint(e, "Le planning")
+
+    def _best_of_starts(self, problem, bounds, etudiants, services, settings, solver,
+                        starts, starts_budget, logger, deadline=None):
+        """Keep the multi-start run with the best makespan, then the best quality score"""
+        candidates = multistart(
+            self._within(problem, deadline), starts, self._remaining(starts_budget, deadline),
+            lower_bound=bounds.lower_bound)
+
+        def rank(result):
+            rotations = [
+                Rotation(
+                    etudiant_id=etudiants[student_index].id,
+                    service_id=services[service_index].id,
+                    date_debut=problem.to_date(start_day).strftime("%Y-%m-%d"),
+                    date_fin=problem.to_date(end_day).strftime("%Y-%m-%d"))
+                for student_index, service_index, start_day, end_day in result.rotations
+            ]
+            quality = self._validate_planning_quality(
+                None, rotations, etudiants, services, settings)
+            return (len(result.missing), len(quality['critical_errors']),
+                    result.makespan, -quality['quality_score'])
+
+        if len(candidates) == 1:
+            best = candidates[0]  # Nothing to rank, e.g. the time budget ran out
+        else:
+            ranked = sorted(((rank(result), i) for i, result in enumerate(candidates)))
+            best = candidates[ranked[0][1]]
+        logger.info(
+            f"🎲 Multi-start: makespan {best.makespan} days kept among {len(candidates)} runs "
+            f"(first run {candidates[0].makespan} days)")
+        return refine(problem, best, solver, bounds.lower_bound,
+                      self._remaining(EXACT_TIME_LIMIT_SECONDS, deadline))
+
+    def _within(self, problem, deadline):
+        """The problem with a time limit ending at ``deadline``, if any"""
+        if deadline is None:
+            return problem
+        return replace(problem, time_limit=max(0.0, deadline - time.monotonic()))
+
+    def _remaining(self, seconds, deadline):
+        """A phase budget cut to the time left before ``deadline``"""
+        if deadline is None:
+            return seconds
+        return min(seconds, max(0.0, deadline - time.monotonic()))
+
+    def _unscheduled_pairs(self, problem, result, promotion_year):
+        """(student, service) pairs a kernel result could not place"""
+        return [
+            {'etudiant_id': problem.student_ids[student_index],
+             'service_id': problem.service_ids[service_index],
+             'promotion_year_id': promotion_year.id}
+            for student_index, service_index in result.missing
+        ]
+
+    def _prepare_year(self, promotion_year, etudiants, services, settings, date_debut, logger):
+        """Build and pre-check the kernel problem of a promotion year"""
         logger.debug(
             f"🔧 _generate_planning_for_year called with date_debut: {date_debut}")
         logger.debug(
             f"🔧 Promotion year: {promotion_year.nom} (ID: {promotion_year.id})")
         logger.debug(f"🔧 Calendar year: {promotion_year.annee_calendaire}")
 
-        # Clear existing planning properly
-        existing_planning = self.get_by_promotion(db, promo_id=promotion.id)
-        if existing_planning:
-            # Delete in correct order to avoid foreign key violations:
-            # 1. Delete student schedule details first
-            # 2. Delete student schedules
-            # 3. Delete rotations
-            # 4. Delete planning
-
-            from ..models import StudentSchedule, StudentScheduleDetail
-
-            # Get all student schedules for this planning
-            student_schedules = db.query(StudentSchedule).filter(
-                StudentSchedule.planning_id == existing_planning.id).all()
-
-            # Delete student schedule details first
-            for schedule in student_schedules:
-                db.query(StudentScheduleDetail).filter(
-                    StudentScheduleDetail.schedule_id == schedule.id).delete()
-
-            # Delete student schedules
-            db.query(StudentSchedule).filter(
-                StudentSchedule.planning_id == existing_planning.id).delete()
-
-            # Now delete rotations
-            db.query(Rotation).filter(Rotation.planning_id ==
-                                      existing_planning.id).delete()
-
-            # Finally delete the planning
-            db.delete(existing_planning)
-            db.flush()  # Ensure deletion is committed before creating new planning
-
-        # Create new planning
-        db_planning = Planning(
-            id=str(uuid.uuid4()),
-            promo_id=promotion.id,
-            promotion_year_id=promotion_year.id,
-            annee_niveau=promotion_year.annee_niveau
-        )
-        db.add(db_planning)
-        db.flush()
-
         # Calculate planning constraints
         try:
             nb_etudiants = len(etudiants)
@@ -347,16 +683,12 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
 
             # For mandatory completion, we extend the time limit as needed
             # Initial estimate: give enough time for all students to complete all services
-            estimated_total_days = 0
-            for service in services:
-                # Each service needs to run enough times to accommodate all students
-                # Taking into account service capacity and duration
-                service_capacity = min(
-                    service.places_disponibles, settings.max_concurrent_students)
-                service_runs_needed = math.ceil(
-                    nb_etudiants / service_capacity)
-                estimated_total_days = max(
-                    estimated_total_days, service_runs_needed * service.duree_stage_jours)
+            problem = self._build_scheduling_problem(
+                etudiants, services, settings, date_debut, max_backtracks=5)
+            # Each service needs to run enough times to accommodate all students,
+            # and each student needs its rotations back to back
+            bounds = problem_bounds(problem)
+            estimated_total_days = bounds.lower_bound
 
             # Add buffer for breaks and scheduling flexibility
             buffer_days = estimated_total_days * 0.3  # 30% buffer
@@ -370,6 +702,8 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             logger.debug(f"   - Start date: {date_debut_dt}")
             logger.debug(f"   - Estimated end date: {date_fin_limite}")
             logger.debug(f"   - Total duration: {total_duration_days} days")
+            logger.debug(
+                f"   - Makespan lower bound: {bounds.lower_bound} days (bottleneck: {bounds.bottleneck})")
             logger.debug(
                 f"   - MANDATORY COMPLETION: ALL students must complete ALL services")
         except Exception as e:
@@ -409,28 +743,12 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                 detail=f"Error in service preparation: {str(e)}"
             )
 
-        # Initialize tracking variables
-        rotations = []
-        service_occupation = {}
-        student_completed_services = {}
-        student_next_available_date = {}
-        student_waiting_queue = {}  # Track students waiting for specific services
-        assignment_history = []  # Track assignments for backtracking
+        # Fail fast when mandatory completion is impossible whatever the schedule
+        self._check_feasibility(problem, services, logger)
 
-        for etudiant in etudiants:
-            student_completed_services[etudiant.id] = set()
-            student_next_available_date[etudiant.id] = date_debut_dt
-            # List of service IDs student is waiting for
-            student_waiting_queue[etudiant.id] = []
-
-        # Mandatory completion algorithm - continues until ALL students complete ALL services
-        max_iterations = nb_etudiants * nb_services * 3  # More generous iteration limit
-        iteration = 0
-        stagnation_count = 0
         completion_target = nb_etudiants * nb_services  # Total rotations needed
 
         logger.debug(f"🔄 Starting MANDATORY COMPLETION algorithm:")
-        logger.debug(f"   - Max iterations: {max_iterations}")
         logger.debug(f"   - Completion target: {completion_target} rotations")
         logger.debug(
             f"   - Extension allowed: planning can extend beyond original duration")
@@ -439,336 +757,53 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         logger.debug(
             f"   - Max concurrent students (global): {settings.max_concurrent_students}")
         logger.debug(f"📋 Service capacities:")
-        for service in services:
-            effective_capacity = min(
-                service.places_disponibles, settings.max_concurrent_students)
+        for service, capacity in zip(services, problem.capacities):
             logger.debug(
-                f"   - {service.nom}: {service.places_disponibles} → effective: {effective_capacity}")
-
-        while iteration < max_iterations:
-            iteration += 1
-            progress_made = False
+                f"   - {service.nom}: {service.places_disponibles} → effective: {capacity}")
 
-            # Check completion status
-            current_rotations = len(rotations)
-            completion_rate = (current_rotations / completion_target) * \
-                100 if completion_target > 0 else 0
-
-            if iteration % 10 == 0:
-                logger.debug(f"🔄 Iteration {iteration}/{max_iterations}")
-                logger.debug(
-                    f"   - Rotations created: {current_rotations}/{completion_target} ({completion_rate:.1f}%)")
+        return problem, bounds
 
-                # Show student completion status
-                incomplete_students = 0
-                for etudiant in etudiants:
-                    completed_count = len(
-                        student_completed_services[etudiant.id])
-                    if completed_count < nb_services:
-                        incomplete_students += 1
+    def _persist_year(self, db, promotion, promotion_year, etudiants, services, settings,
+                      problem, result, bounds, logger):
+        """
+        Validate a kernel result and add its planning and rotations to the session
+        (no commit). The unplaced pairs are kept on ``paires_non_planifiees``; a
+        result cut by the time budget may leave students without rotations.
+        """
+        nb_etudiants = len(etudiants)
+        nb_services = len(services)
+        rotations = []
+        logger.info(
+            f"📏 Makespan {result.makespan} days, lower bound {bounds.lower_bound} "
+            f"(gap {bounds.gap(result.makespan)} days, {bounds.gap_ratio(result.makespan):.1%})")
 
-                logger.debug(
-                    f"   - Students with incomplete schedules: {incomplete_students}/{nb_etudiants}")
-
-            # Check if we've achieved mandatory completion
-            if current_rotations >= completion_target:
-                # Verify all students have completed all services
-                all_complete = True
-                for etudiant in etudiants:
-                    if len(student_completed_services[etudiant.id]) < nb_services:
-                        all_complete = False
-                        missing_services = nb_services - \
-                            len(student_completed_services[etudiant.id])
-                        logger.debug(
-                            f"   - {etudiant.nom} still needs {missing_services} services")
-
-                if all_complete:
-                    logger.debug("🎉 MANDATORY COMPLETION ACHIEVED!")
-                    logger.debug(
-                        f"   - All {nb_etudiants} students completed all {nb_services} services")
-                    logger.debug(f"   - Total rotations: {current_rotations}")
-                    break
-
-            # Sort students by completion priority (least completed first, then by next available date)
-            etudiants_sorted = sorted(etudiants, key=lambda e: (
-                # Primary: number of completed services (ascending - help students with fewer services first)
-                len(student_completed_services[e.id]),
-                # Secondary: next available date (ascending - help students who can start sooner)
-                student_next_available_date[e.id]
+        # Create new planning
+        db_planning = Planning(
+            id=str(uuid.uuid4()),
+            promo_id=promotion.id,
+            promotion_year_id=promotion_year.id,
+            annee_niveau=promotion_year.annee_niveau
+        )
+        db.add(db_planning)
+        db.flush()
+        db_planning.paires_non_planifiees = self._unscheduled_pairs(
+            problem, result, promotion_year)
+
+        student_completed_services = {e.id: set() for e in etudiants}
+        for student_index, service_index, start_day, end_day in result.rotations:
+            etudiant = etudiants[student_index]
+            service = services[service_index]
+            rotations.append(Rotation(
+                id=str(uuid.uuid4()),
+                etudiant_id=etudiant.id,
+                service_id=service.id,
+                date_debut=problem.to_date(start_day).strftime("%Y-%m-%d"),
+                date_fin=problem.to_date(end_day).strftime("%Y-%m-%d"),
+                ordre=len(rotations) + 1,
+                planning_id=db_planning.id,
+                promotion_year_id=promotion_year.id  # NEW: set the year
             ))
-
-            for etudiant in etudiants_sorted:
-                # Check if student has completed all services
-                if len(student_completed_services[etudiant.id]) >= nb_services:
-                    continue
-
-                # For mandatory completion, students can be scheduled far in the future if needed
-                current_date = student_next_available_date[etudiant.id]
-
-                # Find services this student hasn't completed yet
-                remaining_services = [
-                    s for s in services if s.id not in student_completed_services[etudiant.id]]
-
-                if not remaining_services:
-                    continue
-
-                # Find best available service from remaining services
-                service_options = []
-                best_assignment = None
-
-                for service in remaining_services:
-                    # Find earliest available slot for this service
-                    earliest_start = current_date
-                    service_found = False
-
-                    # Look for available slot within reasonable future (up to 1 year ahead)
-                    max_search_date = current_date + timedelta(days=365)
-                    search_date = earliest_start
-
-                    while search_date <= max_search_date:
-                        service_end_date = search_date + \
-                            timedelta(days=service.duree_stage_jours - 1)
-
-                        # Check service availability for entire duration
-                        service_id = service.id
-                        if service_id not in service_occupation:
-                            service_occupation[service_id] = {}
-
-                        max_concurrent = min(
-                            service.places_disponibles, settings.max_concurrent_students)
-
-                        # Check availability for entire service duration
-                        available_for_duration = True
-                        check_date = search_date
-                        while check_date <= service_end_date:
-                            date_str = check_date.strftime("%Y-%m-%d")
-                            if date_str not in service_occupation[service_id]:
-                                service_occupation[service_id][date_str] = 0
-
-                            if service_occupation[service_id][date_str] >= max_concurrent:
-                                available_for_duration = False
-                                break
-                            check_date += timedelta(days=1)
-
-                        if available_for_duration:
-                            # Calculate priority score for this service option
-                            # Priority factors: service availability, student workload balance, service demand
-
-                            # Service availability score
-                            total_availability = 0
-                            days_count = 0
-                            check_date = search_date
-                            while check_date <= service_end_date:
-                                date_str = check_date.strftime("%Y-%m-%d")
-                                current_occupation = service_occupation[service_id].get(
-                                    date_str, 0)
-                                total_availability += (max_concurrent -
-                                                       current_occupation)
-                                days_count += 1
-                                check_date += timedelta(days=1)
-                            availability_score = (
-                                total_availability / days_count) / max_concurrent
-
-                            # Student urgency score (students with fewer completed services get priority)
-                            student_completion_count = len(
-                                student_completed_services[etudiant.id])
-                            urgency_score = (
-                                nb_services - student_completion_count) / nb_services
-
-                            # Service demand score (prefer services with fewer total assignments)
-                            service_total_assignments = sum(
-                                1 for s in student_completed_services.values() if service.id in s)
-                            target_assignments = nb_etudiants
-                            if service_total_assignments < target_assignments:
-                                demand_score = (
-                                    target_assignments - service_total_assignments) / target_assignments
-                            else:
-                                demand_score = 0.1  # Small score for overloaded services
-
-                            # Time delay penalty (prefer earlier start dates)
-                            days_delay = (search_date - current_date).days
-                            # Reduce score for delays > 30 days
-                            delay_penalty = max(0, 1 - (days_delay / 30))
-
-                            # Combined score
-                            score = (availability_score * 0.3 +
-                                     urgency_score * 0.4 +
-                                     demand_score * 0.2 +
-                                     delay_penalty * 0.1)
-
-                            service_options.append({
-                                'service': service,
-                                'start_date': search_date,
-                                'end_date': service_end_date,
-                                'order': len(rotations) + 1,
-                                'score': score,
-                                'days_delay': days_delay
-                            })
-
-                            service_found = True
-                            break  # Found earliest available slot for this service
-
-                        # Try next day
-                        search_date += timedelta(days=1)
-
-                    if not service_found:
-                        logger.warning(
-                            f"⚠️  No available slot found for {etudiant.nom} in {service.nom} within search window")
-
-                # Select best option from available services
-                if service_options:
-                    # Sort by score (prioritize high-priority assignments)
-                    service_options.sort(
-                        key=lambda x: x['score'], reverse=True)
-                    best_assignment = service_options[0]
-
-                    # Log if assignment is delayed
-                    if best_assignment['days_delay'] > 0:
-                        logger.debug(
-                            f"🕐 {etudiant.nom} assigned to {best_assignment['service'].nom} with {best_assignment['days_delay']} day delay")
-
-                # Create rotation if assignment found
-                if best_assignment:
-                    # Double-check capacity before finalizing assignment
-                    service_id = best_assignment['service'].id
-                    start_date = best_assignment['start_date']
-                    end_date = best_assignment['end_date']
-                    max_allowed = min(
-                        best_assignment['service'].places_disponibles, settings.max_concurrent_students)
-
-                    # Verify no capacity violation will occur
-                    capacity_violation = False
-                    check_date = start_date
-                    while check_date <= end_date:
-                        date_str = check_date.strftime("%Y-%m-%d")
-                        current_occupancy = service_occupation.get(
-                            service_id, {}).get(date_str, 0)
-                        if current_occupancy >= max_allowed:
-                            capacity_violation = True
-                            logger.warning(
-                                f"⚠️  Capacity violation prevented for {best_assignment['service'].nom} on {date_str}: {current_occupancy}/{max_allowed}")
-                            break
-                        check_date += timedelta(days=1)
-
-                    if capacity_violation:
-                        # Skip this assignment to prevent violation
-                        continue
-
-                    rotation = Rotation(
-                        id=str(uuid.uuid4()),
-                        etudiant_id=etudiant.id,
-                        service_id=best_assignment['service'].id,
-                        date_debut=best_assignment['start_date'].strftime(
-                            "%Y-%m-%d"),
-                        date_fin=best_assignment['end_date'].strftime(
-                            "%Y-%m-%d"),
-                        ordre=best_assignment['order'],
-                        planning_id=db_planning.id,
-                        promotion_year_id=promotion_year.id  # NEW: set the year
-                    )
-                    rotations.append(rotation)
-                    db.add(rotation)
-
-                    # Track assignment for backtracking
-                    assignment_history.append({
-                        'rotation': rotation,
-                        'etudiant_id': etudiant.id,
-                        'service_id': best_assignment['service'].id,
-                        'start_date': best_assignment['start_date'],
-                        'end_date': best_assignment['end_date'],
-                        'iteration': iteration
-                    })
-
-                    # Update tracking
-                    student_completed_services[etudiant.id].add(
-                        best_assignment['service'].id)
-                    student_next_available_date[etudiant.id] = best_assignment['end_date'] + timedelta(
-                        days=settings.break_days_between_rotations)
-
-                    # Update service occupation
-                    current_date = best_assignment['start_date']
-                    while current_date <= best_assignment['end_date']:
-                        date_str = current_date.strftime("%Y-%m-%d")
-                        if date_str not in service_occupation[best_assignment['service'].id]:
-                            service_occupation[best_assignment['service'].id][date_str] = 0
-                        service_occupation[best_assignment['service'].id][date_str] += 1
-                        current_date += timedelta(days=1)
-
-                    # Log successful assignment
-                    if iteration % 25 == 0:
-                        completed_services = len(
-                            student_completed_services[etudiant.id])
-                        logger.debug(
-                            f"✅ {etudiant.nom} → {best_assignment['service'].nom} ({completed_services}/{nb_services} services)")
-
-                    progress_made = True
-
-            # Handle stagnation with more aggressive backtracking for mandatory completion
-            if not progress_made:
-                stagnation_count += 1
-
-                # If stagnated, try backtracking more aggressively
-                if stagnation_count >= 2 and len(assignment_history) > 0:
-                    # For mandatory completion, we're more aggressive with backtracking
-                    # Remove up to 33% of assignments
-                    backtrack_count = min(10, len(assignment_history) // 3)
-
-                    logger.debug(
-                        f"🔄 Backtracking {backtrack_count} assignments due to stagnation")
-
-                    for _ in range(backtrack_count):
-                        if not assignment_history:
-                            break
-
-                        # Remove last assignment
-                        last_assignment = assignment_history.pop()
-
-                        # Remove from database
-                        db.delete(last_assignment['rotation'])
-                        rotations.remove(last_assignment['rotation'])
-
-                        # Update tracking
-                        student_completed_services[last_assignment['etudiant_id']].discard(
-                            last_assignment['service_id'])
-
-                        # Recalculate student next available date
-                        student_rotations = [
-                            r for r in rotations if r.etudiant_id == last_assignment['etudiant_id']]
-                        if student_rotations:
-                            latest_rotation = max(
-                                student_rotations, key=lambda r: datetime.strptime(r.date_fin, "%Y-%m-%d"))
-                            student_next_available_date[last_assignment['etudiant_id']] = datetime.strptime(
-                                latest_rotation.date_fin, "%Y-%m-%d") + timedelta(days=settings.break_days_between_rotations)
-                        else:
-                            student_next_available_date[last_assignment['etudiant_id']
-                                                        ] = date_debut_dt
-
-                        # Update service occupation
-                        current_date = last_assignment['start_date']
-                        while current_date <= last_assignment['end_date']:
-                            date_str = current_date.strftime("%Y-%m-%d")
-                            if (last_assignment['service_id'] in service_occupation and
-                                    date_str in service_occupation[last_assignment['service_id']]):
-                                service_occupation[last_assignment['service_id']
-                                                   ][date_str] -= 1
-                                if service_occupation[last_assignment['service_id']][date_str] <= 0:
-                                    del service_occupation[last_assignment['service_id']][date_str]
-                            current_date += timedelta(days=1)
-
-                    stagnation_count = 0
-                    continue
-
-                # If we've stagnated for too long, extend time limits
-                elif stagnation_count >= 5:
-                    logger.debug(
-                        "🕐 Extending time limits due to persistent stagnation")
-                    # Extend the search window for finding available slots
-                    # This is handled in the service assignment loop above
-                    stagnation_count = 0
-                    continue
-
-            else:
-                stagnation_count = 0
+            student_completed_services[etudiant.id].add(service.id)
 
         # Final completion check
         final_completion_check = True
@@ -788,8 +823,6 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                 f"   - Incomplete students: {len(incomplete_students)}")
             for student_info in incomplete_students:
                 logger.warning(f"   - {student_info}")
-            logger.warning(
-                f"   - Algorithm stopped after {iteration} iterations")
             logger.warning(
                 f"   - This may require manual intervention or longer time limits")
         else:
@@ -797,7 +830,8 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             logger.info(
                 f"   - All {nb_etudiants} students completed all {nb_services} services")
             logger.info(f"   - Total rotations: {len(rotations)}")
-            logger.info(f"   - Completed in {iteration} iterations")
+            logger.info(
+                f"   - Backtracks: {result.backtracks}, deferred searches: {result.deferrals}")
 
         # Continue with validation...
 
@@ -806,7 +840,8 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             logger.debug(
                 f"🔍 Validating planning quality with {len(rotations)} rotations")
             validation_results = self._validate_planning_quality(
-                db_planning, rotations, etudiants, services, settings)
+                db_planning, rotations, etudiants, services, settings,
+                allow_unassigned=result.truncated)
 
             logger.debug(f"✅ Validation complete:")
             logger.debug(
@@ -841,22 +876,12 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                 detail=f"Error during validation: {str(e)}"
             )
 
-        # Commit the planning
-        try:
-            logger.debug("💾 Committing planning to database")
-            db.commit()
-            db.refresh(db_planning)
-            logger.debug(
-                f"✅ Planning successfully created with ID: {db_planning.id}")
-            return db_planning
-        except Exception as e:
-            logger.error(f"❌ Error committing planning: {e}")
-            db.rollback()
-            handle_unique_constraint(e, "Le planning")
+        bulk_insert_objects(db, rotations)
+        return db_planning
 
     def _generate_big_planning_for_all_years(
         self, db, promotion, promotion_years, etudiants, all_services, all_services_by_year,
-        settings, date_debut, logger
+        settings, date_debut, logger, progress=None, deadline=None
     ):
         """Helper to generate one big planning that combines all years in sequence"""
         logger.debug(
@@ -865,29 +890,7 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         # Clear existing planning properly
         existing_planning = self.get_by_promotion(db, promo_id=promotion.id)
         if existing_planning:
-            # Delete in correct order to avoid foreign key violations
-            from ..models import StudentSchedule, StudentScheduleDetail
-
-            # Get all student schedules for this planning
-            student_schedules = db.query(StudentSchedule).filter(
-                StudentSchedule.planning_id == existing_planning.id).all()
-
-            # Delete student schedule details first
-            for schedule in student_schedules:
-                db.query(StudentScheduleDetail).filter(
-                    StudentScheduleDetail.schedule_id == schedule.id).delete()
-
-            # Delete student schedules
-            db.query(StudentSchedule).filter(
-                StudentSchedule.planning_id == existing_planning.id).delete()
-
-            # Now delete rotations
-            db.query(Rotation).filter(Rotation.planning_id ==
-                                      existing_planning.id).delete()
-
-            # Finally delete the planning
-            db.delete(existing_planning)
-            db.flush()
+            self._delete_planning(db, existing_planning)
 
         # Create new big planning (no specific year since it's combined)
         db_planning = Planning(
@@ -909,6 +912,8 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
 
         # Generate rotations for each year in sequence
         all_rotations = []
+        unscheduled = []
+        truncated = False
         current_date = None
 
         for i, promotion_year in enumerate(promotion_years_sorted):
@@ -943,9 +948,18 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     f"   - {service.nom} (duration: {service.duree_stage_jours} days, capacity: {service.places_disponibles})")
 
             # Generate rotations for this year
-            year_rotations = self._generate_rotations_for_year(
-                etudiants, year_services, settings, year_start_date, logger
+            def year_progress(done, target, offset=len(all_rotations)):
+                progress(offset + done, len(etudiants) * len(all_services))
+            year_rotations, result = self._generate_rotations_for_year(
+                etudiants, year_services, settings, year_start_date, logger,
+                progress=year_progress if progress else None, deadline=deadline
             )
+            truncated = truncated or result.truncated
+            unscheduled.extend(
+                {'etudiant_id': etudiants[student_index].id,
+                 'service_id': year_services[service_index].id,
+                 'promotion_year_id': promotion_year.id}
+                for student_index, service_index in result.missing)
 
             # Add year information to rotations and add to big planning
             for j, (etudiant, service, start_date, end_date) in enumerate(year_rotations):
@@ -960,20 +974,24 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     planning_id=db_planning.id,
                     promotion_year_id=promotion_year.id  # Assign to the appropriate year
                 )
-                db.add(rotation)
                 all_rotations.append(rotation)
 
             logger.info(
                 f"✅ Completed planning for {promotion_year.nom}: {len(year_rotations)} rotations")
 
-        if not all_rotations:
+        if not all_rotations and not truncated:
             logger.error("❌ No rotations generated for any year")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Aucune rotation générée pour les années sélectionnées"
             )
 
+        bulk_insert_objects(db, all_rotations)
         db.commit()
+        db_planning.paires_non_planifiees = unscheduled
+        if truncated:
+            logger.warning(
+                f"⏱️  Time budget spent: big planning saved with {len(unscheduled)} unscheduled pairs")
         logger.info(f"🎉 BIG PLANNING WITH CHAINED YEARS SUCCESSFUL!")
         logger.info(
             f"   - Total rotations across all years: {len(all_rotations)}")
@@ -981,14 +999,18 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
 
         # Validate the big planning quality
         self._validate_planning_quality(
-            db_planning, all_rotations, etudiants, all_services, settings)
+            db_planning, all_rotations, etudiants, all_services, settings,
+            allow_unassigned=truncated)
 
         return db_planning
 
     def _generate_rotations_for_year(
-        self, etudiants, services, settings, year_start_date, logger
+        self, etudiants, services, settings, year_start_date, logger, progress=None, deadline=None
     ):
-        """Generate rotations for a specific year starting from the given date"""
+        """
+        Generate rotations for a specific year starting from the given date;
+        returns them with the kernel result
+        """
         logger.debug(
             f"🔄 Generating rotations for year starting: {year_start_date.strftime('%Y-%m-%d')}")
 
@@ -996,13 +1018,10 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         nb_services = len(services)
 
         # Calculate planning constraints for this year
-        estimated_total_days = 0
-        for service in services:
-            service_capacity = min(
-                service.places_disponibles, settings.max_concurrent_students)
-            service_runs_needed = math.ceil(nb_etudiants / service_capacity)
-            estimated_total_days = max(
-                estimated_total_days, service_runs_needed * service.duree_stage_jours)
+        problem = self._build_scheduling_problem(
+            etudiants, services, settings, year_start_date.strftime("%Y-%m-%d"))
+        bounds = problem_bounds(problem)
+        estimated_total_days = bounds.lower_bound
 
         # Add buffer for breaks and scheduling flexibility
         buffer_days = estimated_total_days * 0.3  # 30% buffer
@@ -1016,254 +1035,311 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
         logger.debug(f"   - Estimated end date: {year_end_date}")
         logger.debug(f"   - Total duration: {total_duration_days} days")
 
-        # Use the existing mandatory completion algorithm from _generate_planning_for_year
-        # Initialize tracking variables
-        rotations = []
-        service_occupation = {}  # Track service capacity per date
-        student_completed_services = {}  # Track which services each student has completed
-        student_next_available_date = {}  # Track when each student is available next
+        self._check_feasibility(problem, services, logger)
 
-        # Initialize student tracking
-        for etudiant in etudiants:
-            student_completed_services[etudiant.id] = set()
-            student_next_available_date[etudiant.id] = year_start_date
-            student_waiting_queue = {}  # Not used in this simplified version
-
-        # Mandatory completion algorithm - continues until ALL students complete ALL services
-        max_iterations = nb_etudiants * nb_services * 3  # More generous iteration limit
-        iteration = 0
+        # Same kernel as _generate_planning_for_year, without backtracking
         completion_target = nb_etudiants * nb_services  # Total rotations needed
-
         logger.debug(f"🔄 Starting MANDATORY COMPLETION algorithm:")
-        logger.debug(f"   - Max iterations: {max_iterations}")
         logger.debug(f"   - Completion target: {completion_target} rotations")
-        logger.debug(
-            f"   - Extension allowed: planning can extend beyond original duration")
-
-        while iteration < max_iterations:
-            iteration += 1
-            progress_made = False
 
-            # Check completion status
-            current_rotations = len(rotations)
-            completion_rate = (current_rotations / completion_target) * \
-                100 if completion_target > 0 else 0
+        result = schedule(self._within(problem, deadline), progress)
+        rotations = [
+            (etudiants[student_index], services[service_index],
+             problem.to_date(start_day), problem.to_date(end_day))
+            for student_index, service_index, start_day, end_day in result.rotations
+        ]
 
-            if iteration % 10 == 0:
-                logger.debug(f"🔄 Iteration {iteration}/{max_iterations}")
-                logger.debug(
-                    f"   - Rotations created: {current_rotations}/{completion_target} ({completion_rate:.1f}%)")
-
-            # Check if we've achieved mandatory completion
-            if current_rotations >= completion_target:
-                # Verify all students have completed all services
-                all_complete = True
-                for etudiant in etudiants:
-                    if len(student_completed_services[etudiant.id]) < nb_services:
-                        all_complete = False
-                        missing_services = nb_services - \
-                            len(student_completed_services[etudiant.id])
-                        logger.debug(
-                            f"   - {etudiant.nom} still needs {missing_services} services")
-
-                if all_complete:
-                    logger.debug("🎉 MANDATORY COMPLETION ACHIEVED!")
-                    logger.debug(
-                        f"   - All {nb_etudiants} students completed all {nb_services} services")
-                    logger.debug(f"   - Total rotations: {current_rotations}")
-                    break
-
-            # Sort students by completion priority (least completed first, then by next available date)
-            etudiants_sorted = sorted(etudiants, key=lambda e: (
-                # Primary: number of completed services
-                len(student_completed_services[e.id]),
-                # Secondary: next available date
-                student_next_available_date[e.id]
-            ))
-
-            for etudiant in etudiants_sorted:
-                # Check if student has completed all services
-                if len(student_completed_services[etudiant.id]) >= nb_services:
-                    continue
-
-                current_date = student_next_available_date[etudiant.id]
+        if result.complete:
+            logger.info(f"🎉 MANDATORY COMPLETION SUCCESSFUL!")
+            logger.info(
+                f"   - All {nb_etudiants} students completed all {nb_services} services")
+            logger.info(f"   - Total rotations: {len(rotations)}")
+            logger.info(f"   - Deferred searches: {result.deferrals}")
+            logger.info(
+                f"   - Makespan {result.makespan} days, lower bound {bounds.lower_bound} days")
+        else:
+            logger.warning(f"⚠️  MANDATORY COMPLETION NOT ACHIEVED:")
+            logger.warning(
+                f"   - Created {len(rotations)} rotations out of {completion_target} needed")
 
-                # Find services this student hasn't completed yet
-                remaining_services = [
-                    s for s in services if s.id not in student_completed_services[etudiant.id]]
+        logger.debug(f"✅ Generated {len(rotations)} rotations for this year")
+        return rotations, result
+
+    def _delete_planning(self, db, db_planning):
+        """Delete a planning with its rotations and student schedules (no commit)"""
+        # Delete in correct order to avoid foreign key violations:
+        # 1. Delete student schedule details first
+        # 2. Delete student schedules
+        # 3. Delete rotations
+        # 4. Delete planning
+
+        from ..models import StudentSchedule, StudentScheduleDetail
+
+        # Get all student schedules for this planning
+        student_schedules = db.query(StudentSchedule).filter(
+            StudentSchedule.planning_id == db_planning.id).all()
+
+        # Delete student schedule details first
+        for db_schedule in student_schedules:
+            db.query(StudentScheduleDetail).filter(
+                StudentScheduleDetail.schedule_id == db_schedule.id).delete()
+
+        # Delete student schedules
+        db.query(StudentSchedule).filter(
+            StudentSchedule.planning_id == db_planning.id).delete()
+
+        # Now delete rotations
+        db.query(Rotation).filter(Rotation.planning_id ==
+                                  db_planning.id).delete()
+
+        # Finally delete the planning
+        db.delete(db_planning)
+        rotation_crud.forget_interval_index(db_planning.id)
+        db.flush()  # Ensure deletion is committed before creating new planning
+
+    def _feasibility_payload(self, report, elapsed_ms):
+        """Serialize a feasibility report for PlanningFeasibilityDiagnosis"""
+        return {
+            'is_feasible': report.feasible,
+            'borne_inferieure_jours': report.lower_bound,
+            'horizon_jours': report.horizon_days,
+            'problemes': [
+                {
+                    'code': issue.code,
+                    'message': issue.message,
+                    'service_id': issue.service_id,
+                    'jours_requis': issue.required_days,
+                    'nb_etudiants_bloques': issue.blocked_students,
+                }
+                for issue in report.issues
+            ],
+            'etudiants_bloques': report.blocked_students,
+            'duree_analyse_ms': round(elapsed_ms, 3),
+        }
 
-                if not remaining_services:
-                    continue
+    def _check_feasibility(self, problem, services, logger):
+        """Raise a 400 with the structured diagnosis if the problem cannot be completed"""
+        started = time.perf_counter()
+        report = diagnose(problem, service_names=[s.nom for s in services])
+        if report.feasible:
+            return
+        logger.error(f"❌ Infeasible planning: {report.summary()}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={
+                'message': f"Planning impossible: {report.summary()}",
+                'diagnostic': self._feasibility_payload(
+                    report, (time.perf_counter() - started) * 1000),
+            }
+        )
 
-                # Find best available service from remaining services
-                service_options = []
-
-                for service in remaining_services:
-                    # Find earliest available slot for this service
-                    earliest_start = current_date
-                    service_found = False
-
-                    # Look for available slot within reasonable future (up to 1 year ahead)
-                    max_search_date = current_date + timedelta(days=365)
-                    search_date = earliest_start
-
-                    while search_date <= max_search_date:
-                        service_end_date = search_date + \
-                            timedelta(days=service.duree_stage_jours - 1)
-
-                        # Check service availability for entire duration
-                        service_id = service.id
-                        if service_id not in service_occupation:
-                            service_occupation[service_id] = {}
-
-                        max_concurrent = min(
-                            service.places_disponibles, settings.max_concurrent_students)
-
-                        # Check availability for entire service duration
-                        available_for_duration = True
-                        check_date = search_date
-                        while check_date <= service_end_date:
-                            date_str = check_date.strftime("%Y-%m-%d")
-                            if date_str not in service_occupation[service_id]:
-                                service_occupation[service_id][date_str] = 0
-
-                            if service_occupation[service_id][date_str] >= max_concurrent:
-                                available_for_duration = False
-                                break
-                            check_date += timedelta(days=1)
-
-                        if available_for_duration:
-                            # Calculate priority score
-                            # Service availability score
-                            total_availability = 0
-                            days_count = 0
-                            check_date = search_date
-                            while check_date <= service_end_date:
-                                date_str = check_date.strftime("%Y-%m-%d")
-                                current_occupation = service_occupation[service_id].get(
-                                    date_str, 0)
-                                total_availability += (max_concurrent -
-                                                       current_occupation)
-                                days_count += 1
-                                check_date += timedelta(days=1)
-                            availability_score = (
-                                total_availability / days_count) / max_concurrent
-
-                            # Student urgency score
-                            student_completion_count = len(
-                                student_completed_services[etudiant.id])
-                            urgency_score = (
-                                nb_services - student_completion_count) / nb_services
-
-                            # Service demand score
-                            service_total_assignments = sum(
-                                1 for s in student_completed_services.values() if service.id in s)
-                            target_assignments = nb_etudiants
-                            if service_total_assignments < target_assignments:
-                                demand_score = (
-                                    target_assignments - service_total_assignments) / target_assignments
-                            else:
-                                demand_score = 0.1
-
-                            # Time delay penalty
-                            days_delay = (search_date - current_date).days
-                            delay_penalty = max(0, 1 - (days_delay / 30))
-
-                            # Combined score
-                            score = (availability_score * 0.3 + urgency_score *
-                                     0.4 + demand_score * 0.2 + delay_penalty * 0.1)
-
-                            service_options.append({
-                                'service': service,
-                                'start_date': search_date,
-                                'end_date': service_end_date,
-                                'order': len(rotations) + 1,
-                                'score': score,
-                                'days_delay': days_delay
-                            })
-
-                            service_found = True
-                            break
-
-                        # Try next day
-                        search_date += timedelta(days=1)
-
-                # Select best option from available services
-                if service_options:
-                    # Sort by score (highest first)
-                    service_options.sort(
-                        key=lambda x: x['score'], reverse=True)
-                    best_option = service_options[0]
-
-                    service = best_option['service']
-                    start_date = best_option['start_date']
-                    end_date = best_option['end_date']
-
-                    # Create rotation
-                    rotation_data = (etudiant, service, start_date, end_date)
-                    rotations.append(rotation_data)
-
-                    # Update tracking
-                    student_completed_services[etudiant.id].add(service.id)
-                    student_next_available_date[etudiant.id] = end_date + \
-                        timedelta(days=settings.break_days_between_rotations)
-
-                    # Update service occupation
-                    service_id = service.id
-                    check_date = start_date
-                    while check_date <= end_date:
-                        date_str = check_date.strftime("%Y-%m-%d")
-                        if date_str not in service_occupation[service_id]:
-                            service_occupation[service_id][date_str] = 0
-                        service_occupation[service_id][date_str] += 1
-                        check_date += timedelta(days=1)
-
-                    progress_made = True
-                    logger.debug(
-                        f"🕐 {etudiant.nom} assigned to {service.nom} with {best_option['days_delay']} day delay")
-                else:
-                    logger.warning(
-                        f"⚠️  No available slot found for {etudiant.nom} in any remaining service")
+    def diagnose_feasibility(
+        self, db: Session, *, promo_id: str, promotion_year_id: str = None,
+        date_debut: str = None, horizon_days: int = None
+    ) -> dict:
+        """Pre-flight feasibility analysis of a promotion year without generating anything"""
+        started = time.perf_counter()
+        settings = planning_settings.get_or_create_default(db)
+        promotion_year, etudiants = self._load_year_roster(
+            db, promo_id, promotion_year_id)
+        services = promotion_year.services
+        problem = self._build_scheduling_problem(
+            etudiants, services, settings, date_debut or settings.academic_year_start)
+        report = diagnose(problem, horizon_days=horizon_days,
+                          service_names=[s.nom for s in services])
+        return self._feasibility_payload(
+            report, (time.perf_counter() - started) * 1000)
+
+    def _load_year_roster(self, db: Session, promo_id: str, promotion_year_id: str = None):
+        """Promotion year (the active one by default) and active students of a promotion"""
+        promotion = db.query(Promotion).filter(
+            Promotion.id == promo_id).first()
+        if not promotion:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Promotion non trouvée"
+            )
 
-            if not progress_made:
-                logger.warning(
-                    f"⚠️  No progress made in iteration {iteration}")
-                break
+        year_query = db.query(PromotionYear).filter(
+            PromotionYear.promotion_id == promo_id)
+        if promotion_year_id:
+            year_query = year_query.filter(
+                PromotionYear.id == promotion_year_id)
+        else:
+            year_query = year_query.filter(PromotionYear.is_active == True)
+        promotion_year = year_query.first()
+        if not promotion_year:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Année spécifiée non trouvée" if promotion_year_id
+                else "Aucune année active trouvée pour cette promotion"
+            )
 
-        # Final completion check
-        current_rotations = len(rotations)
-        if current_rotations >= completion_target:
-            all_complete = True
-            for etudiant in etudiants:
-                if len(student_completed_services[etudiant.id]) < nb_services:
-                    all_complete = False
-                    break
-
-            if all_complete:
-                logger.info(f"🎉 MANDATORY COMPLETION SUCCESSFUL!")
-                logger.info(
-                    f"   - All {nb_etudiants} students completed all {nb_services} services")
-                logger.info(f"   - Total rotations: {current_rotations}")
-                logger.info(f"   - Completed in {iteration} iterations")
+        etudiants = db.query(Etudiant).filter(
+            Etudiant.promotion_id == promo_id,
+            Etudiant.is_active == True
+        ).all()
+        return promotion_year, etudiants
+
+    def simulate(
+        self, db: Session, *, promo_id: str, scenarios: List, promotion_year_id: str = None,
+        date_debut: str = None
+    ) -> dict:
+        """
+        Evaluate what-if scenarios of a promotion year entirely in memory.
+
+        Each scenario overrides the planning settings and service places; the
+        feasible ones are scheduled in parallel worker processes. Nothing is
+        written: the existing plannings and rotations are left untouched.
+        """
+        started = time.perf_counter()
+        if not scenarios:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Au moins un scénario doit être fourni"
+            )
+        if len(scenarios) > MAX_SIMULATION_SCENARIOS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Au maximum {MAX_SIMULATION_SCENARIOS} scénarios par simulation"
+            )
+        settings = planning_settings.get_or_create_default(db)
+        promotion_year, etudiants = self._load_year_roster(
+            db, promo_id, promotion_year_id)
+        services = list(promotion_year.services)
+        service_names = [s.nom for s in services]
+        default_start = date_debut or settings.academic_year_start
+
+        results = [None] * len(scenarios)
+        problems = []
+        for index, scenario in enumerate(scenarios):
+            unknown = set(scenario.places_disponibles) - {s.id for s in services}
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Scénario '{scenario.nom}': service(s) hors de cette année: {', '.join(sorted(unknown))}"
+                )
+            if any(places < 1 for places in scenario.places_disponibles.values()) or \
+                    (scenario.max_concurrent_students is not None and scenario.max_concurrent_students < 1) or \
+                    (scenario.break_days_between_rotations is not None and scenario.break_days_between_rotations < 0):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Scénario '{scenario.nom}': les places et étudiants simultanés doivent être positifs, "
+                           f"les jours de pause ne peuvent pas être négatifs"
+                )
+            scenario_start = scenario.date_debut or default_start
+            try:
+                datetime.strptime(scenario_start, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Scénario '{scenario.nom}': format de date invalide. Utilisez YYYY-MM-DD"
+                )
+            scenario_settings = SimpleNamespace(
+                max_concurrent_students=settings.max_concurrent_students
+                if scenario.max_concurrent_students is None else scenario.max_concurrent_students,
+                break_days_between_rotations=settings.break_days_between_rotations
+                if scenario.break_days_between_rotations is None else scenario.break_days_between_rotations,
+            )
+            problem = self._build_scheduling_problem(
+                etudiants, services, scenario_settings, scenario_start, max_backtracks=5, places=scenario.places_disponibles)
+            report = diagnose(problem, service_names=service_names)
+            if report.feasible:
+                problems.append((index, problem))
             else:
-                logger.warning(f"⚠️  MANDATORY COMPLETION NOT ACHIEVED:")
-                logger.warning(
-                    f"   - Created {current_rotations} rotations out of {completion_target} needed")
-                for etudiant in etudiants:
-                    completed_count = len(
-                        student_completed_services[etudiant.id])
-                    logger.warning(
-                        f"   - {etudiant.nom}: {completed_count}/{nb_services} services completed")
-        else:
-            logger.warning(f"⚠️  MANDATORY COMPLETION NOT ACHIEVED:")
-            logger.warning(
-                f"   - Created {current_rotations} rotations out of {completion_target} needed")
+                results[index] = {
+                    'nom': scenario.nom,
+                    'is_feasible': False,
+                    'erreur': report.summary(),
+                    'borne_inferieure_jours': report.lower_bound,
+                }
+
+        solved = solve_many([problem for _, problem in problems])
+        for (index, problem), result in zip(problems, solved):
+            results[index] = {
+                'nom': scenarios[index].nom,
+                'is_feasible': True,
+                **self._simulation_metrics(problem, result, services),
+            }
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"🧪 {len(scenarios)} scenario(s) simulated in {elapsed_ms:.1f}ms (nothing persisted)")
+        return {
+            'promo_id': promo_id,
+            'promotion_year_id': promotion_year.id,
+            'nb_etudiants': len(etudiants),
+            'nb_services': len(services),
+            'scenarios': results,
+            'duree_ms': round(elapsed_ms, 3),
+        }
 
-        logger.debug(f"✅ Generated {len(rotations)} rotations for this year")
-        return rotations
+    def _simulation_metrics(self, problem, result, services):
+        """Makespan, service occupancy and completion of a simulated kernel result"""
+        bounds = problem_bounds(problem)
+        makespan = result.makespan
+        occupancy = OccupancyIndex(problem.origin, horizon_days=max(makespan, 1))
+        busy_days = {}
+        for service_id, capacity in zip(problem.service_ids, problem.capacities):
+            occupancy.add_service(service_id, capacity)
+        for _, service_index, start_day, end_day in result.rotations:
+            service_id = problem.service_ids[service_index]
+            occupancy.reserve(service_id, start_day, end_day - start_day + 1)
+            busy_days[service_id] = busy_days.get(
+                service_id, 0) + end_day - start_day + 1
+
+        incomplete = sorted({problem.student_ids[i] for i, _ in result.missing})
+        target = len(problem.student_ids) * len(problem.service_ids)
+        return {
+            'makespan_jours': makespan,
+            'date_debut': problem.start_date,
+            'date_fin': problem.to_date(makespan - 1).strftime("%Y-%m-%d") if result.rotations else None,
+            'borne_inferieure_jours': bounds.lower_bound,
+            'ecart_jours': bounds.gap(makespan),
+            'nb_rotations': len(result.rotations),
+            'taux_completion': round(len(result.rotations) / target, 4) if target else 0.0,
+            'etudiants_complets': len(problem.student_ids) - len(incomplete),
+            'etudiants_incomplets': incomplete,
+            'occupation_services': [
+                {
+                    'service_id': service.id,
+                    'service_nom': service.nom,
+                    'capacite': capacity,
+                    'pic_occupation': occupancy.peak(service.id),
+                    # Occupied place-days over the places available until the end
+                    'taux_occupation': round(
+                        busy_days.get(service.id, 0) / (capacity * makespan), 4)
+                    if capacity and makespan > 0 else 0.0,
+                }
+                for service, capacity in zip(services, problem.capacities)
+            ],
+        }
+
+    def _build_scheduling_problem(self, etudiants, services, settings, start_date, max_backtracks=0,
+                                  places=None):
+        """Describe a year's scheduling run for the database-free kernel"""
+        places = places or {}
+        return SchedulingProblem(
+            student_ids=tuple(e.id for e in etudiants),
+            service_ids=tuple(s.id for s in services),
+            durations=tuple(s.duree_stage_jours for s in services),
+            # Effective capacity is bounded by the global concurrency setting
+            capacities=tuple(
+                min(places.get(s.id, s.places_disponibles), settings.max_concurrent_students)
+                for s in services),
+            start_date=start_date,
+            rest_days=settings.break_days_between_rotations,
+            max_delay=365,  # Look up to 1 year ahead for a slot
+            max_backtracks=max_backtracks,
+        )
 
-    def _validate_planning_quality(self, planning, rotations, etudiants, services, settings):
-        """Validate planning quality and return detailed metrics"""
+    def _validate_planning_quality(self, planning, rotations, etudiants, services, settings,
+                                   allow_unassigned=False):
+        """
+        Validate planning quality and return detailed metrics; with
+        ``allow_unassigned`` (partial plannings) students without rotations are
+        only a warning
+        """
         logger.debug("🔍 Starting planning quality validation")
         validation_results = {
             'critical_errors': [],
@@ -1272,61 +1348,35 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             'quality_score': 0.0
         }
 
-        # 1. Constraint validation
-        service_concurrent_capacity = {}  # Track concurrent capacity by date
-        student_assignments = {}
-
-        for rotation in rotations:
-            # Track student assignments
-            if rotation.etudiant_id not in student_assignments:
-                student_assignments[rotation.etudiant_id] = []
-            student_assignments[rotation.etudiant_id].append(rotation)
-
-            # Track concurrent capacity for each service by date
-            if rotation.service_id not in service_concurrent_capacity:
-                service_concurrent_capacity[rotation.service_id] = {}
-
-            # Calculate concurrent occupancy for each day of the rotation
-            start_date = datetime.strptime(rotation.date_debut, "%Y-%m-%d")
-            end_date = datetime.strptime(rotation.date_fin, "%Y-%m-%d")
-            current_date = start_date
-
-            while current_date <= end_date:
-                date_str = current_date.strftime("%Y-%m-%d")
-                if date_str not in service_concurrent_capacity[rotation.service_id]:
-                    service_concurrent_capacity[rotation.service_id][date_str] = 0
-                service_concurrent_capacity[rotation.service_id][date_str] += 1
-                current_date += timedelta(days=1)
+        # 1. Constraint validation: one interval pass gives every service's peak
+        analysis = analyze(
+            [(r.etudiant_id, r.service_id, to_day(r.date_debut), to_day(r.date_fin))
+             for r in rotations],
+            rest_days=settings.break_days_between_rotations)
 
         # Check service capacity violations (concurrent capacity)
         for service in services:
             max_capacity = min(service.places_disponibles,
                                settings.max_concurrent_students)
 
-            if service.id in service_concurrent_capacity:
-                # Find maximum concurrent occupancy
-                max_concurrent_occupancy = max(
-                    service_concurrent_capacity[service.id].values())
-
-                if max_concurrent_occupancy > max_capacity:
+            load = analysis.services.get(service.id)
+            if load:
+                if load.peak > max_capacity:
                     validation_results['critical_errors'].append(
-                        f"Service {service.nom} exceeds concurrent capacity: {max_concurrent_occupancy} > {max_capacity}")
+                        f"Service {service.nom} exceeds concurrent capacity: {load.peak} > {max_capacity}")
 
-                # Count total assignments for utilization metrics
-                total_assignments = len(
-                    [r for r in rotations if r.service_id == service.id])
                 logger.debug(
-                    f"   📊 {service.nom}: {total_assignments} total assignments, max concurrent: {max_concurrent_occupancy}/{max_capacity}")
+                    f"   📊 {service.nom}: {load.assignments} total assignments, max concurrent: {load.peak}/{max_capacity}")
             else:
                 validation_results['warnings'].append(
                     f"Service {service.nom} has no assignments")
 
         # 2. Student workload validation
         for etudiant in etudiants:
-            student_rotations = student_assignments.get(etudiant.id, [])
+            student_rotations = analysis.student_services.get(etudiant.id, ())
 
             if len(student_rotations) == 0:
-                validation_results['critical_errors'].append(
+                validation_results['warnings' if allow_unassigned else 'critical_errors'].append(
                     f"Student {etudiant.nom} {etudiant.prenom} has no assignments")
             elif len(student_rotations) < len(services) * 0.7:  # Less than 70% of services
                 validation_results['warnings'].append(
@@ -1334,20 +1384,11 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
 
         # 3. Load balancing metrics
         # Calculate total assignments per service for load balancing
-        service_total_assignments = {}
-        for service in services:
-            service_total_assignments[service.id] = len(
-                [r for r in rotations if r.service_id == service.id])
+        service_ids = [service.id for service in services]
+        service_total_assignments = dict(zip(service_ids, analysis.assignments(service_ids)))
 
         if service_total_assignments:
-            assignment_values = list(service_total_assignments.values())
-            avg_assignments = sum(assignment_values) / len(assignment_values)
-            max_assignments = max(assignment_values)
-            min_assignments = min(assignment_values)
-
-            # Load balance score (lower is better)
-            load_balance_score = (max_assignments - min_assignments) / \
-                avg_assignments if avg_assignments > 0 else 0
+            load_balance_score = analysis.load_balance(service_ids)
             validation_results['metrics']['load_balance_score'] = load_balance_score
 
             if load_balance_score > 0.5:
@@ -1355,12 +1396,7 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
                     f"Poor load balancing: score {load_balance_score:.2f}")
 
         # 4. Duration distribution validation
-        total_duration = sum(
-            (datetime.strptime(r.date_fin, "%Y-%m-%d") -
-             datetime.strptime(r.date_debut, "%Y-%m-%d")).days + 1
-            for r in rotations
-        )
-        avg_duration_per_student = total_duration / \
+        avg_duration_per_student = analysis.place_days / \
             len(etudiants) if etudiants else 0
         validation_results['metrics']['avg_duration_per_student'] = avg_duration_per_student
 
@@ -1381,7 +1417,18 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             len(service_utilization) if service_utilization else 0
         validation_results['metrics']['avg_service_utilization'] = avg_utilization
 
-        # 6. Calculate overall quality score
+        # 6. Makespan and optimality gap against the lower bounds
+        optimality = self._optimality_metrics(
+            rotations, len(etudiants), services, settings, analysis)
+        if optimality:
+            validation_results['metrics'].update({
+                'makespan_days': optimality['makespan_jours'],
+                'makespan_lower_bound': optimality['borne_inferieure_jours'],
+                'optimality_gap_days': optimality['ecart_jours'],
+                'optimality_gap': optimality['ecart_relatif'],
+            })
+
+        # 7. Calculate overall quality score
         quality_factors = []
 
         # No critical errors factor
@@ -1412,6 +1459,277 @@ class CRUDPlanning(CRUDBase[Planning, PlanningCreate, PlanningBase]):
             f"🎯 Validation completed with quality score: {validation_results['quality_score']:.2f}")
         return validation_results
 
+    def _optimality_metrics(self, rotations, nb_students, services, settings, analysis=None):
+        """Makespan of the rotations compared with the lower bound of the year"""
+        if not rotations:
+            return None
+        if analysis is None:
+            analysis = analyze(
+                [(r.etudiant_id, r.service_id, to_day(r.date_debut), to_day(r.date_fin))
+                 for r in rotations])
+        makespan = analysis.makespan
+
+        bounds = makespan_bounds(
+            nb_students,
+            [s.id for s in services],
+            [s.duree_stage_jours for s in services],
+            [min(s.places_disponibles, settings.max_concurrent_students) for s in services],
+            settings.break_days_between_rotations,
+        )
+        bottleneck = next(
+            (s.nom for s in services if s.id == bounds.bottleneck), None)
+        return {
+            'makespan_jours': makespan,
+            'borne_inferieure_jours': bounds.lower_bound,
+            'ecart_jours': bounds.gap(makespan),
+            'ecart_relatif': round(bounds.gap_ratio(makespan), 4),
+            'service_goulot': bottleneck,
+        }
+
+    def get_optimality_reports(self, db: Session, *, db_planning: Planning) -> List[dict]:
+        """Optimality gap of a stored planning, one report per promotion year it covers"""
+        settings = planning_settings.get_or_create_default(db)
+        rotations_by_year = {}
+        for rotation in db_planning.rotations:
+            rotations_by_year.setdefault(
+                rotation.promotion_year_id, []).append(rotation)
+
+        reports = []
+        for promotion_year_id, year_rotations in rotations_by_year.items():
+            service_ids = {r.service_id for r in year_rotations}
+            services = db.query(Service).filter(
+                Service.id.in_(service_ids)).all()
+            metrics = self._optimality_metrics(
+                year_rotations, len({r.etudiant_id for r in year_rotations}), services, settings)
+            reports.append({
+                'planning_id': db_planning.id,
+                'promotion_year_id': promotion_year_id,
+                **metrics,
+            })
+        return reports
+
+    def repair_planning(
+        self, db: Session, *, db_planning: Planning, date_reference: str = None,
+        commit: bool = True
+    ) -> dict:
+        """
+        Re-plan only the students affected by roster or capacity changes.
+
+        Rotations started on or before ``date_reference`` are pinned, and so are the
+        future rotations of every unaffected student. Deactivated students lose
+        their future rotations; active students missing services, or whose future
+        rotations no longer fit the current capacities, have their future rotations
+        rescheduled around the kept ones. The diff is applied in one transaction,
+        only flushed when ``commit`` is False so that callers can group repairs.
+        """
+        started = time.perf_counter()
+        settings = planning_settings.get_or_create_default(db)
+        date_reference = date_reference or datetime.now().strftime("%Y-%m-%d")
+        try:
+            reference_dt = datetime.strptime(date_reference, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Format de date invalide. Utilisez YYYY-MM-DD"
+            )
+
+        rotations = db.query(Rotation).filter(
+            Rotation.planning_id == db_planning.id).all()
+        etudiants = db.query(Etudiant).filter(
+            Etudiant.promotion_id == db_planning.promo_id).all()
+        active_ids = {e.id for e in etudiants if e.is_active}
+
+        # Services required per promotion year covered by the planning
+        year_ids = {r.promotion_year_id for r in rotations}
+        if db_planning.promotion_year_id:
+            year_ids.add(db_planning.promotion_year_id)
+        years = {y.id: y for y in db.query(PromotionYear).options(
+            selectinload(PromotionYear.services)).filter(
+            PromotionYear.id.in_([y for y in year_ids if y]))}
+        services_by_year = {}
+        for year_id in year_ids:
+            if year_id in years:
+                services_by_year[year_id] = list(years[year_id].services)
+        service_ids = {r.service_id for r in rotations}
+        service_ids.update(s.id for services in services_by_year.values() for s in services)
+        services = {s.id: s for s in db.query(Service).filter(
+            Service.id.in_(service_ids))}
+        for year_id in year_ids:
+            if year_id not in services_by_year:
+                # Legacy rotations without a year: the services they already use
+                services_by_year[year_id] = [services[sid] for sid in sorted(
+                    {r.service_id for r in rotations if r.promotion_year_id == year_id})]
+
+        origin = min([reference_dt] + [
+            datetime.strptime(r.date_debut, "%Y-%m-%d") for r in rotations])
+
+        def day(date_str):
+            return (datetime.strptime(date_str, "%Y-%m-%d") - origin).days
+
+        # Rotations already started are part of the students' recorded progress
+        pinned = [r for r in rotations if r.date_debut <= date_reference]
+        future = [r for r in rotations if r.date_debut > date_reference]
+
+        # Roster of each year: students already planned in it, and students whose
+        # current level is the year's (other years' students are not its concern)
+        assigned = {}
+        roster_by_year = {year_id: set() for year_id in services_by_year}
+        for r in rotations:
+            assigned.setdefault(
+                (r.etudiant_id, r.promotion_year_id), set()).add(r.service_id)
+            roster_by_year[r.promotion_year_id].add(r.etudiant_id)
+        for year_id, year in years.items():
+            roster_by_year[year_id].update(
+                e.id for e in etudiants if e.annee_courante == year.annee_niveau)
+
+        # Active students missing services (re-activated, or services added)
+        impacted = set()
+        for year_id, year_services in services_by_year.items():
+            for etudiant_id in roster_by_year[year_id] & active_ids:
+                if any(s.id not in assigned.get((etudiant_id, year_id), ()) for s in year_services):
+                    impacted.add(etudiant_id)
+
+        # Future rotations that no longer fit the current capacities, earliest kept first
+        occupancy = OccupancyIndex(origin)
+        for service in services.values():
+            occupancy.add_service(service.id, min(
+                service.places_disponibles, settings.max_concurrent_students))
+        for r in pinned:
+            occupancy.reserve(r.service_id, day(r.date_debut),
+                              day(r.date_fin) - day(r.date_debut) + 1)
+        def span(r):
+            return r.service_id, day(r.date_debut), day(r.date_fin) - day(r.date_debut) + 1
+
+        def fits(r):
+            service_id, start, duration = span(r)
+            return occupancy.range_max(service_id, start, duration) < occupancy.capacity(service_id)
+
+        reserved = {}
+        overbooked = []
+        for r in sorted(future, key=lambda r: (r.date_debut, r.ordre)):
+            if r.etudiant_id not in active_ids or r.etudiant_id in impacted:
+                continue
+            if fits(r):
+                occupancy.reserve(*span(r))
+                reserved.setdefault(r.etudiant_id, []).append(r)
+            else:
+                # The student's whole future is re-planned: free what it held
+                impacted.add(r.etudiant_id)
+                overbooked.append(r.etudiant_id)
+                for kept_rotation in reserved.pop(r.etudiant_id, []):
+                    occupancy.release(*span(kept_rotation))
+        # Students flagged against places freed later on keep their rotations
+        for etudiant_id in overbooked:
+            student_future = [r for r in future if r.etudiant_id == etudiant_id]
+            if all(fits(r) for r in student_future):
+                for r in student_future:
+                    occupancy.reserve(*span(r))
+                impacted.discard(etudiant_id)
+
+        removed = [r for r in future
+                   if r.etudiant_id not in active_ids or r.etudiant_id in impacted]
+        removed_ids = {r.id for r in removed}
+        kept = [r for r in rotations if r.id not in removed_ids]
+        logger.info(
+            f"🩹 Repairing planning {db_planning.id} from {date_reference}: "
+            f"{len(pinned)} pinned, {len(removed)} removed, {len(impacted)} students to re-plan")
+
+        kept_days = [(r.service_id, day(r.date_debut), day(r.date_fin)) for r in kept]
+        last_end = {}
+        for r in kept:
+            last_end[r.etudiant_id] = max(last_end.get(r.etudiant_id, -1), day(r.date_fin))
+        reference_day = day(date_reference)
+
+        new_rotations = []
+        incomplete = []
+        next_ordre = max((r.ordre for r in rotations), default=0) + 1
+        to_replan = [e for e in etudiants if e.id in impacted]
+        # Years are repaired in calendar order so later years follow earlier ones
+        year_order = sorted(services_by_year, key=lambda year_id: min(
+            [r.date_debut for r in rotations if r.promotion_year_id == year_id], default=date_reference))
+        for year_id in year_order:
+            year_services = services_by_year[year_id]
+            year_replan = [e for e in to_replan if e.id in roster_by_year[year_id]]
+            if not year_replan or not year_services:
+                continue
+            problem = self._build_scheduling_problem(
+                year_replan, year_services, settings, origin.strftime("%Y-%m-%d"), max_backtracks=5)
+            self._check_feasibility(problem, year_services, logger)
+            completed = {e.id: assigned.get((e.id, year_id), set()) - {
+                r.service_id for r in removed if r.etudiant_id == e.id} for e in year_replan}
+            ready_days = {
+                e.id: max(reference_day + 1, last_end.get(e.id, -1) + problem.rest_days)
+                for e in year_replan}
+            result = repair(problem, kept_days, completed, ready_days)
+
+            for student_index, service_index, start_day, end_day in result.rotations:
+                etudiant = year_replan[student_index]
+                service = year_services[service_index]
+                new_rotations.append(Rotation(
+                    id=str(uuid.uuid4()),
+                    etudiant_id=etudiant.id,
+                    service_id=service.id,
+                    date_debut=problem.to_date(start_day).strftime("%Y-%m-%d"),
+                    date_fin=problem.to_date(end_day).strftime("%Y-%m-%d"),
+                    ordre=next_ordre,
+                    planning_id=db_planning.id,
+                    promotion_year_id=year_id
+                ))
+                next_ordre += 1
+                kept_days.append((service.id, start_day, end_day))
+                last_end[etudiant.id] = max(last_end.get(etudiant.id, -1), end_day)
+            incomplete.extend(
+                year_replan[i].id for i in sorted({i for i, _ in result.missing}))
+
+        if incomplete:
+            logger.warning(
+                f"⚠️  {len(set(incomplete))} students could not be fully re-planned")
+
+        added_by_student = {}
+        for r in new_rotations:
+            added_by_student.setdefault(r.etudiant_id, []).append({
+                'id': r.id,
+                'service_id': r.service_id,
+                'service_nom': services[r.service_id].nom,
+                'ordre': r.ordre,
+                'date_debut': r.date_debut,
+                'date_fin': r.date_fin,
+            })
+        try:
+            student_schedule.apply_rotation_changes(
+                db, planning_id=db_planning.id, removed_rotation_ids=list(removed_ids),
+                added_rotations_by_student=added_by_student)
+            if removed_ids:
+                db.query(Rotation).filter(Rotation.id.in_(removed_ids)).delete(
+                    synchronize_session=False)
+            bulk_insert_objects(db, new_rotations)
+            planning_cache.detach(db, planning_id=db_planning.id)
+            planning_validation.bump(db, planning_id=db_planning.id)
+            if commit:
+                db.commit()
+            else:
+                db.flush()
+            rotation_crud.forget_interval_index(db_planning.id)
+        except IntegrityError as e:
+            db.rollback()
+            handle_unique_constraint(e, "Planning")
+        db.expire(db_planning)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f"✅ Planning repaired in {elapsed_ms:.1f}ms: -{len(removed)} +{len(new_rotations)} rotations")
+        return {
+            'planning_id': db_planning.id,
+            'date_reference': date_reference,
+            'etudiants_replanifies': [e.id for e in to_replan],
+            'etudiants_incomplets': sorted(set(incomplete)),
+            'rotations_figees': len(pinned),
+            'rotations_conservees': len(kept),
+            'rotations_supprimees': len(removed),
+            'rotations_ajoutees': len(new_rotations),
+            'duree_ms': round(elapsed_ms, 3),
+        }
+
     def get_student_planning(
         self, db: Session, *, promo_id: str, etudiant_id: str
     ) -> List[Rotation]:
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..models import Planning, PlanningCache
+from ..scheduling import SchedulingProblem, SchedulingResult
+
+logger = logging.getLogger(__name__)
+
+# Scheduler outputs kept, least recently used evicted first
+MAX_CACHE_ENTRIES = int(os.environ.get("PLANNING_CACHE_SIZE", "256"))
+
+
+class CRUDPlanningCache:
+    """
+    Content-addressed store of scheduler outputs.
+
+    A generation is identified by what it depends on: the ordered active
+    students, the services with their duration and places, the settings used by
+    the kernel, the start date and the solver options. Regenerating with the same
+    fingerprint returns the stored planning when it is still untouched, or
+    rebuilds it from the stored output without running the scheduler.
+    """
+
+    def fingerprint(self, problem: SchedulingProblem, services, settings, **options) -> str:
+        payload = {
+            'problem': asdict(problem),
+            'places': [s.places_disponibles for s in services],
+            'max_concurrent_students': settings.max_concurrent_students,
+            'break_days_between_rotations': settings.break_days_between_rotations,
+            'options': options,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    def lookup(self, db: Session, fingerprint: str) -> Optional[PlanningCache]:
+        """Cache entry of a fingerprint, marked as used (no commit)"""
+        entry = db.get(PlanningCache, fingerprint)
+        if entry:
+            entry.nb_utilisations = (entry.nb_utilisations or 0) + 1
+            entry.date_dernier_acces = datetime.utcnow()
+        return entry
+
+    def stored_planning(self, db: Session, entry: Optional[PlanningCache]) -> Optional[Planning]:
+        """Planning still holding the entry's output unchanged, if any"""
+        if not entry or not entry.planning_id:
+            return None
+        return db.get(Planning, entry.planning_id)
+
+    def to_result(self, entry: PlanningCache) -> SchedulingResult:
+        data = json.loads(entry.resultat)
+        return SchedulingResult(
+            rotations=[tuple(r) for r in data['rotations']],
+            missing=[tuple(m) for m in data['missing']],
+            backtracks=data['backtracks'],
+            deferrals=data['deferrals'],
+        )
+
+    def store(
+        self, db: Session, *, fingerprint: str, promo_id: str, promotion_year_id: Optional[str],
+        planning_id: str, result: SchedulingResult
+    ) -> PlanningCache:
+        """Record the output of a generation and evict beyond the bound (no commit)"""
+        entry = db.get(PlanningCache, fingerprint)
+        if not entry:
+            entry = PlanningCache(
+                fingerprint=fingerprint, promo_id=promo_id,
+                promotion_year_id=promotion_year_id, nb_utilisations=0,
+                resultat=json.dumps({
+                    'rotations': result.rotations,
+                    'missing': result.missing,
+                    'backtracks': result.backtracks,
+                    'deferrals': result.deferrals,
+                }))
+            db.add(entry)
+        entry.planning_id = planning_id
+        entry.date_dernier_acces = datetime.utcnow()
+        db.flush()
+
+        overflow = db.query(PlanningCache).count() - MAX_CACHE_ENTRIES
+        if overflow > 0:
+            for stale in db.query(PlanningCache).filter(
+                    PlanningCache.fingerprint != fingerprint).order_by(
+                    PlanningCache.date_dernier_acces).limit(overflow).all():
+                db.delete(stale)
+            logger.debug(f"🧹 Evicted {overflow} planning cache entries")
+        return entry
+
+    def detach(self, db: Session, *, planning_id: str):
+        """
+        Forget that a planning holds its cached output, e.g. after a manual edit;
+        the output itself stays reusable (no commit).
+        """
+        db.query(PlanningCache).filter(
+            PlanningCache.planning_id == planning_id).update(
+            {PlanningCache.planning_id: None}, synchronize_session=False)
+
+    def invalidate(
+        self, db: Session, *, promo_id: Optional[str] = None, promotion_year_id: Optional[str] = None
+    ) -> int:
+        """Delete the entries of a promotion, of a year, or all of them"""
+        query = db.query(PlanningCache)
+        if promo_id:
+            query = query.filter(PlanningCache.promo_id == promo_id)
+        if promotion_year_id:
+            query = query.filter(PlanningCache.promotion_year_id == promotion_year_id)
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        logger.info(f"🧹 Planning cache invalidated: {deleted} entries")
+        return deleted
+
+
+planning_cache = CRUDPlanningCache()
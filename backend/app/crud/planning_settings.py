@@ -5,6 +5,7 @@ from fastapi import HTTPException, status
 from .base import CRUDBase
 from ..models import PlanningSettings
 from ..schemas import PlanningSettingsCreate, PlanningSettingsUpdate
+from .planning_validation import planning_validation
 from .utils import handle_db_commit, handle_unique_constraint
 
 
@@ -41,6 +42,10 @@ class CRUDPlanningSettings(CRUDBase[PlanningSettings, PlanningSettingsCreate, Pl
 
         # Update the settings
         update_data = obj_in.dict(exclude_unset=True)
+        if update_data.get('break_days_between_rotations', settings.break_days_between_rotations) \
+                != settings.break_days_between_rotations:
+            # Gap checks of every planning depend on the rest days
+            planning_validation.bump_all(db)
         for field, value in update_data.items():
             setattr(settings, field, value)
 
@@ -55,6 +60,7 @@ class CRUDPlanningSettings(CRUDBase[PlanningSettings, PlanningSettingsCreate, Pl
         """Create new settings or update existing ones"""
         # Deactivate all existing settings
         db.query(PlanningSettings).update({"is_active": False})
+        planning_validation.bump_all(db)
 
         # Create new active settings
         settings = self.create(db, obj_in=obj_in)
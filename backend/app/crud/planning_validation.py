@@ -0,0 +1,79 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from ..models import Planning, Rotation
+
+logger = logging.getLogger(__name__)
+
+
+class CRUDPlanningValidation:
+    """
+    Validation results kept on their planning for one version.
+
+    ``Planning.version`` is bumped by every write that can change a validation:
+    rotation edits, reorders and repairs, and changes of the service capacities
+    or of the settings. A stored result is served while the version it was
+    computed for is current, and the version doubles as the ETag of the
+    validation endpoint. The python and sql modes may word or order their
+    findings differently, so each mode keeps its own result and ETag.
+    """
+
+    def bump(self, db: Session, *, planning_id: str) -> int:
+        """
+        Increment the version of a planning and return it (no commit); the row
+        stays locked until the caller commits, so the value is its own
+        """
+        db.query(Planning).filter(Planning.id == planning_id).update(
+            {Planning.version: Planning.version + 1}, synchronize_session=False)
+        return db.query(Planning.version).filter(Planning.id == planning_id).scalar()
+
+    def bump_all(
+        self, db: Session, *, promo_id: Optional[str] = None, service_id: Optional[str] = None
+    ) -> int:
+        """Increment the version of the plannings of a promotion, of a service, or all (no commit)"""
+        query = db.query(Planning)
+        if promo_id:
+            query = query.filter(Planning.promo_id == promo_id)
+        if service_id:
+            query = query.filter(Planning.id.in_(
+                db.query(Rotation.planning_id).filter(Rotation.service_id == service_id)))
+        return query.update(
+            {Planning.version: Planning.version + 1}, synchronize_session=False)
+
+    def etag(self, planning: Planning, mode: str) -> str:
+        return f'W/"{planning.id}-{planning.version}-{mode}"'
+
+    def _stored(self, planning: Planning) -> Dict[str, Any]:
+        """Results of the current version, by validation mode"""
+        if planning.validation_version != planning.version or not planning.validation_resultat:
+            return {}
+        return json.loads(planning.validation_resultat)
+
+    def cached(self, planning: Planning, mode: str) -> Optional[Dict[str, Any]]:
+        """Stored result of ``mode`` when it was computed for the current version"""
+        return self._stored(planning).get(mode)
+
+    def store(
+        self, db: Session, *, planning: Planning, version: int, mode: str, result: Dict[str, Any]
+    ):
+        """
+        Keep a result of ``mode`` computed for ``version``, next to the other
+        mode's result of that version, unless the planning changed meanwhile
+        """
+        results = self._stored(planning) if planning.version == version else {}
+        results[mode] = result
+        stored = db.query(Planning).filter(
+            Planning.id == planning.id, Planning.version == version
+        ).update({
+            Planning.validation_version: version,
+            Planning.validation_resultat: json.dumps(results),
+        }, synchronize_session=False)
+        db.commit()
+        if stored:
+            logger.debug(
+                f"🗃️  {mode} validation of planning {planning.id} stored for version {version}")
+
+planning_validation = CRUDPlanningValidation()
@@ -7,6 +7,7 @@ import uuid
 from .base import CRUDBase
 from ..models import Promotion, Etudiant
 from ..schemas import PromotionCreate, PromotionBase
+from .planning_validation import planning_validation
 from .utils import validate_string_length, handle_db_commit, handle_unique_constraint, db_commit_context
 
 
@@ -84,6 +85,9 @@ class CRUDPromotion(CRUDBase[Promotion, PromotionCreate, PromotionBase]):
                 # Delete rotations for this student
                 db.query(Rotation).filter(Rotation.etudiant_id == student.id).delete()
             
+            # The plannings of the promotion lost these students' rotations
+            planning_validation.bump_all(db, promo_id=db_obj.id)
+
             # Now safely delete students
             db.query(Etudiant).filter(Etudiant.promotion_id == db_obj.id).delete()
             
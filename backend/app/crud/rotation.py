@@ -1,21 +1,128 @@
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import and_, or_, func, Date
+from sqlalchemy import and_, or_, func, Date, text
 from fastapi import HTTPException, status
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
 import logging
+import threading
+from collections import OrderedDict
 
 from .base import CRUDBase
 from ..models import Rotation, Etudiant, Service, Planning
 from ..schemas import RotationCreate, RotationBase, RotationUpdate
 from .utils import validate_string_length, handle_db_commit, handle_unique_constraint, db_commit_context
+from .planning_cache import planning_cache
+from .planning_validation import planning_validation
+from .planning_settings import planning_settings
+from ..scheduling import IntervalIndex, analyze
+from ..scheduling.intervals import to_date, to_day
 
 logger = logging.getLogger(__name__)
 
+# Plannings whose interval index is kept for checking edits, least recently
+# used forgotten first
+MAX_INTERVAL_INDEXES = 32
+
+# PostgreSQL validation of one planning: only violation rows leave the database.
+# Overbooked ranges: +1/-1 events per rotation, a running sum per service gives
+# the occupancy of each segment between events, adjacent overbooked segments
+# are merged into one range.
+_CAPACITY_VIOLATIONS_SQL = text("""
+WITH r AS (
+    SELECT service_id, CAST(date_debut AS date) AS d0, CAST(date_fin AS date) AS d1
+    FROM rotations WHERE planning_id = :planning_id
+), events AS (
+    SELECT service_id, d0 AS day, 1 AS delta FROM r
+    UNION ALL
+    SELECT service_id, d1 + 1, -1 FROM r
+), deltas AS (
+    SELECT service_id, day, SUM(delta) AS delta FROM events GROUP BY service_id, day
+), segments AS (
+    SELECT service_id, day,
+           SUM(delta) OVER w AS occupancy,
+           LEAD(day) OVER w - 1 AS until
+    FROM deltas
+    WINDOW w AS (PARTITION BY service_id ORDER BY day)
+), overbooked AS (
+    SELECT g.*, s.nom, s.places_disponibles,
+           CASE WHEN LAG(g.until) OVER w = g.day - 1 THEN 0 ELSE 1 END AS new_range
+    FROM segments g JOIN services s ON s.id = g.service_id
+    WHERE g.occupancy > s.places_disponibles
+    WINDOW w AS (PARTITION BY g.service_id ORDER BY g.day)
+), ranges AS (
+    SELECT *, SUM(new_range) OVER (PARTITION BY service_id ORDER BY day) AS range_id
+    FROM overbooked
+)
+SELECT service_id, nom, places_disponibles,
+       MIN(day) AS date_debut, MAX(until) AS date_fin, MAX(occupancy) AS occupation_max
+FROM ranges
+GROUP BY service_id, nom, places_disponibles, range_id
+ORDER BY nom, MIN(day)
+""")
+
+# Student timelines: each rotation is compared with the earlier rotation of the
+# same student ending last (overlap when it starts before that end, gap when it
+# starts more than the rest days after it)
+_TIMELINE_VIOLATIONS_SQL = text("""
+WITH r AS (
+    SELECT id, etudiant_id, date_debut, date_fin,
+           CAST(date_debut AS date) AS d0, CAST(date_fin AS date) AS d1,
+           ROW_NUMBER() OVER (PARTITION BY etudiant_id
+                              ORDER BY CAST(date_debut AS date), CAST(date_fin AS date), id) AS pos
+    FROM rotations WHERE planning_id = :planning_id
+), running AS (
+    SELECT r.*, MAX(d1) OVER (PARTITION BY etudiant_id ORDER BY pos
+                              ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS latest_end
+    FROM r
+)
+SELECT CASE WHEN cur.d0 <= cur.latest_end THEN 'overlap' ELSE 'gap' END AS kind,
+       e.prenom, e.nom,
+       prev.date_debut AS prev_debut, prev.date_fin AS prev_fin,
+       cur.date_debut, cur.date_fin
+FROM running cur
+JOIN LATERAL (
+    SELECT p.date_debut, p.date_fin FROM r p
+    WHERE p.etudiant_id = cur.etudiant_id AND p.pos < cur.pos AND p.d1 = cur.latest_end
+    ORDER BY p.pos LIMIT 1
+) prev ON TRUE
+JOIN etudiants e ON e.id = cur.etudiant_id
+WHERE cur.d0 <= cur.latest_end OR cur.d0 - cur.latest_end > :rest_days
+ORDER BY e.nom, e.prenom, cur.pos
+""")
+
+_PLANNING_TOTALS_SQL = text("""
+SELECT COUNT(*) AS total_rotations,
+       COUNT(DISTINCT etudiant_id) AS total_students,
+       COUNT(DISTINCT service_id) AS total_services
+FROM rotations WHERE planning_id = :planning_id
+""")
+
+_STUDENTS_WITHOUT_ROTATIONS_SQL = text("""
+SELECT COUNT(*) FROM etudiants e
+JOIN plannings p ON p.promo_id = e.promotion_id
+WHERE p.id = :planning_id AND e.is_active
+  AND NOT EXISTS (SELECT 1 FROM rotations r
+                  WHERE r.planning_id = p.id AND r.etudiant_id = e.id)
+""")
+
+
+class _IndexEntry:
+    """Interval index of one planning version, with the lock serializing its edits"""
+
+    def __init__(self, index: IntervalIndex, version: int):
+        self.index = index
+        self.version = version
+        self.lock = threading.Lock()
+
 
 class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
+    def __init__(self, model):
+        super().__init__(model)
+        self._indexes: "OrderedDict[str, _IndexEntry]" = OrderedDict()
+        self._indexes_lock = threading.Lock()
+
     def get_by_planning(self, db: Session, *, planning_id: str) -> List[Rotation]:
         return db.query(Rotation).filter(Rotation.planning_id == planning_id).order_by(Rotation.ordre).all()
 
@@ -111,7 +218,10 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
 
         try:
             db.add(db_rotation)
+            planning_cache.detach(db, planning_id=obj_in.planning_id)
+            planning_validation.bump(db, planning_id=obj_in.planning_id)
             db.commit()
+            self.forget_interval_index(obj_in.planning_id)
             db.refresh(db_rotation)
             return db_rotation
         except Exception as e:
@@ -177,12 +287,114 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
         try:
             for field, value in obj_in.dict(exclude_unset=True).items():
                 setattr(db_obj, field, value)
+            planning_cache.detach(db, planning_id=db_obj.planning_id)
+            planning_validation.bump(db, planning_id=db_obj.planning_id)
             db.commit()
+            self.forget_interval_index(db_obj.planning_id)
             db.refresh(db_obj)
             return db_obj
         except Exception as e:
             handle_unique_constraint(e, "La rotation")
 
+    def _interval_index(self, db: Session, planning_id: str) -> _IndexEntry:
+        """
+        Interval index of a planning, built with one query on first use and
+        again when another writer changed the planning's version
+        """
+        version = db.query(Planning.version).filter(Planning.id == planning_id).scalar()
+        with self._indexes_lock:
+            entry = self._indexes.get(planning_id)
+            if entry is not None and entry.version == version:
+                self._indexes.move_to_end(planning_id)
+                return entry
+
+        rows = db.query(
+            Rotation.id, Rotation.etudiant_id, Rotation.service_id,
+            Rotation.date_debut, Rotation.date_fin
+        ).filter(Rotation.planning_id == planning_id).all()
+        index = IntervalIndex(
+            (r.id, r.etudiant_id, r.service_id, to_day(r.date_debut), to_day(r.date_fin))
+            for r in rows)
+        logger.debug(f"🗂️  Interval index built for planning {planning_id}: {len(index)} rotations")
+
+        with self._indexes_lock:
+            entry = self._indexes.get(planning_id)
+            if entry is None or entry.version != version:
+                entry = self._indexes[planning_id] = _IndexEntry(index, version)
+            self._indexes.move_to_end(planning_id)
+            while len(self._indexes) > MAX_INTERVAL_INDEXES:
+                self._indexes.popitem(last=False)
+            return entry
+
+    def forget_interval_index(self, planning_id: str):
+        """Drop the interval index of a planning whose rotations were rewritten"""
+        with self._indexes_lock:
+            self._indexes.pop(planning_id, None)
+
+    def update_with_incremental_check(
+        self, db: Session, *, db_obj: Rotation, obj_in: Dict[str, Any], service: Service
+    ) -> List[str]:
+        """
+        Apply an edit after checking it against the planning's interval index:
+        only the student's timeline and the rotations of ``service`` during the
+        new dates are looked at. Overlaps and capacity overruns are refused,
+        new gaps are returned as warnings.
+        """
+        date_debut = obj_in.get('date_debut', db_obj.date_debut)
+        date_fin = obj_in.get('date_fin', db_obj.date_fin)
+        try:
+            start, end = to_day(date_debut), to_day(date_fin)
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Format de date invalide. Utilisez YYYY-MM-DD"
+            )
+        if start >= end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La date de début doit être antérieure à la date de fin"
+            )
+        etudiant_id = obj_in.get('etudiant_id', db_obj.etudiant_id)
+        service_id = obj_in.get('service_id', db_obj.service_id)
+
+        settings = planning_settings.get_active_settings(db)
+        entry = self._interval_index(db, db_obj.planning_id)
+        with entry.lock:
+            warnings = []
+            if (etudiant_id, service_id, start, end) != entry.index.rotations.get(db_obj.id):
+                check = entry.index.check(
+                    db_obj.id, etudiant_id, service_id, start, end,
+                    capacity=service.places_disponibles,
+                    rest_days=settings.break_days_between_rotations if settings else 1)
+                if check.overlaps:
+                    _, _, other_start, other_end = entry.index.rotations[check.overlaps[0]]
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"L'étudiant a déjà une rotation sur cette période "
+                               f"(du {to_date(other_start)} au {to_date(other_end)})"
+                    )
+                if check.overloads:
+                    overload = check.overloads[0]
+                    first, last = to_date(overload.start_day), to_date(overload.end_day)
+                    period = f"le {first}" if first == last else f"du {first} au {last}"
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Dépassement de capacité dans '{service.nom}' {period}: "
+                               f"{overload.peak} étudiants pour {service.places_disponibles} places disponibles"
+                    )
+                warnings = [
+                    f"Intervalle de {next_start - last_end - 1} jours entre le "
+                    f"{to_date(last_end)} et le {to_date(next_start)}"
+                    for last_end, next_start in check.gaps]
+
+            # The planning no longer matches the scheduler output it was built from
+            planning_cache.detach(db, planning_id=db_obj.planning_id)
+            version = planning_validation.bump(db, planning_id=db_obj.planning_id)
+            self.update(db, db_obj=db_obj, obj_in=obj_in)
+            entry.index.move(db_obj.id, etudiant_id, service_id, start, end)
+            entry.version = version
+        return warnings
+
     def get_current_rotation(
         self, db: Session, *, etudiant_id: str, planning_id: str
     ) -> Optional[Rotation]:
@@ -231,6 +443,8 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
                 if rotation:
                     rotation.ordre = order_data['ordre']
 
+            planning_cache.detach(db, planning_id=planning_id)
+            planning_validation.bump(db, planning_id=planning_id)
             db.commit()
 
             # Return updated rotations
@@ -249,82 +463,62 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
     ) -> Dict[str, Any]:
         """Validate all rotations in a planning and return validation results"""
         try:
-            # Get all rotations for this planning
-            rotations = self.get_by_planning(db, planning_id=planning_id)
+            # Get all rotations for this planning, with their students, at once
+            rotations = db.query(Rotation).options(selectinload(Rotation.etudiant)).filter(
+                Rotation.planning_id == planning_id).order_by(Rotation.ordre).all()
 
             errors = []
             warnings = []
 
-            # Check for overlapping rotations per student
-            student_rotations = {}
-            for rotation in rotations:
-                if rotation.etudiant_id not in student_rotations:
-                    student_rotations[rotation.etudiant_id] = []
-                student_rotations[rotation.etudiant_id].append(rotation)
-
-            # Validate each student's rotations
-            for etudiant_id, student_rots in student_rotations.items():
-                # Sort by start date
-                student_rots.sort(key=lambda x: x.date_debut)
-
-                # Check for overlaps
-                for i in range(len(student_rots) - 1):
-                    current = student_rots[i]
-                    next_rotation = student_rots[i + 1]
-
-                    # Check if there's a gap between rotations
-                    current_end = datetime.strptime(
-                        current.date_fin, "%Y-%m-%d").date()
-                    next_start = datetime.strptime(
-                        next_rotation.date_debut, "%Y-%m-%d").date()
-
-                    if next_start > current_end + timedelta(days=1):
-                        warnings.append(
-                            f"Gap detected for student {current.etudiant.prenom} {current.etudiant.nom}: "
-                            f"{current_end} to {next_start}"
-                        )
-
-                    # Check for overlaps
-                    if current_end >= next_start:
-                        errors.append(
-                            f"Overlapping rotations for student {current.etudiant.prenom} {current.etudiant.nom}: "
-                            f"{current.date_debut} to {current.date_fin} overlaps with "
-                            f"{next_rotation.date_debut} to {next_rotation.date_fin}"
-                        )
-
-            # Check service capacity violations
-            service_rotations = {}
-            for rotation in rotations:
-                if rotation.service_id not in service_rotations:
-                    service_rotations[rotation.service_id] = []
-                service_rotations[rotation.service_id].append(rotation)
-
-            for service_id, service_rots in service_rotations.items():
-                service = db.query(Service).filter(
-                    Service.id == service_id).first()
+            # One interval pass checks every student's timeline and, with a
+            # sweep per service, gives the exact overbooked date ranges
+            service_ids = {rotation.service_id for rotation in rotations}
+            services = {
+                service.id: service for service in db.query(Service).filter(
+                    Service.id.in_(list(service_ids))).all()}
+            settings = planning_settings.get_active_settings(db)
+            analysis = analyze(
+                [(r.etudiant_id, r.service_id, to_day(r.date_debut), to_day(r.date_fin))
+                 for r in rotations],
+                capacities={s.id: s.places_disponibles for s in services.values()},
+                rest_days=settings.break_days_between_rotations if settings else 1)
+
+            for previous_index, next_index in analysis.gaps:
+                current, next_rotation = rotations[previous_index], rotations[next_index]
+                warnings.append(
+                    f"Gap detected for student {current.etudiant.prenom} {current.etudiant.nom}: "
+                    f"{current.date_fin} to {next_rotation.date_debut}"
+                )
+
+            for previous_index, next_index in analysis.overlaps:
+                current, next_rotation = rotations[previous_index], rotations[next_index]
+                errors.append(
+                    f"Overlapping rotations for student {current.etudiant.prenom} {current.etudiant.nom}: "
+                    f"{current.date_debut} to {current.date_fin} overlaps with "
+                    f"{next_rotation.date_debut} to {next_rotation.date_fin}"
+                )
+
+            capacity_violations = []
+            for service_id, load in analysis.services.items():
+                service = services.get(service_id)
                 if not service:
                     continue
 
-                # Check capacity for each day
-                for rotation in service_rots:
-                    start_date = datetime.strptime(
-                        rotation.date_debut, "%Y-%m-%d").date()
-                    end_date = datetime.strptime(
-                        rotation.date_fin, "%Y-%m-%d").date()
-
-                    # Count overlapping rotations for this service
-                    overlapping_count = db.query(Rotation).filter(
-                        Rotation.service_id == service_id,
-                        Rotation.date_debut <= rotation.date_fin,
-                        Rotation.date_fin >= rotation.date_debut
-                    ).count()
-
-                    if overlapping_count > service.places_disponibles:
-                        errors.append(
-                            f"Service {service.nom} capacity exceeded: "
-                            f"{overlapping_count} students assigned, capacity is {service.places_disponibles}"
-                        )
-                        break
+                for overload in load.overloads:
+                    violation = {
+                        "service_id": service.id,
+                        "service_nom": service.nom,
+                        "date_debut": to_date(overload.start_day),
+                        "date_fin": to_date(overload.end_day),
+                        "occupation_max": overload.peak,
+                        "capacite": service.places_disponibles,
+                    }
+                    capacity_violations.append(violation)
+                    errors.append(
+                        f"Service {service.nom} capacity exceeded from {violation['date_debut']} "
+                        f"to {violation['date_fin']}: {overload.peak} students assigned, "
+                        f"capacity is {service.places_disponibles}"
+                    )
 
             # Check for students with no rotations
             planning = db.query(Planning).filter(
@@ -354,8 +548,9 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
                 "erreurs": errors,
                 "warnings": warnings,
                 "total_rotations": len(rotations),
-                "total_students": len(student_rotations),
-                "total_services": len(service_rotations)
+                "total_students": len(analysis.student_services),
+                "total_services": len(analysis.services),
+                "depassements_capacite": capacity_violations
             }
 
         except Exception as e:
@@ -366,8 +561,91 @@ class CRUDRotation(CRUDBase[Rotation, RotationCreate, RotationBase]):
                 "warnings": [],
                 "total_rotations": 0,
                 "total_students": 0,
-                "total_services": 0
+                "total_services": 0,
+                "depassements_capacite": []
+            }
+
+    def require_database_validation(self, db: Session) -> None:
+        """Reject the database-side validation on dialects other than PostgreSQL"""
+        if db.get_bind().dialect.name != "postgresql":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="La validation côté base de données nécessite PostgreSQL"
+            )
+
+    def validate_all_assignments_in_database(
+        self, db: Session, *, planning_id: str
+    ) -> Dict[str, Any]:
+        """
+        Same checks and result as ``validate_all_assignments``, computed by
+        PostgreSQL with window functions so that no rotation is loaded
+        """
+        self.require_database_validation(db)
+        try:
+            settings = planning_settings.get_active_settings(db)
+            params = {"planning_id": planning_id}
+
+            errors = []
+            warnings = []
+            for row in db.execute(_TIMELINE_VIOLATIONS_SQL, {
+                    **params,
+                    "rest_days": settings.break_days_between_rotations if settings else 1}):
+                if row.kind == "overlap":
+                    errors.append(
+                        f"Overlapping rotations for student {row.prenom} {row.nom}: "
+                        f"{row.prev_debut} to {row.prev_fin} overlaps with "
+                        f"{row.date_debut} to {row.date_fin}"
+                    )
+                else:
+                    warnings.append(
+                        f"Gap detected for student {row.prenom} {row.nom}: "
+                        f"{row.prev_fin} to {row.date_debut}"
+                    )
+
+            capacity_violations = []
+            for row in db.execute(_CAPACITY_VIOLATIONS_SQL, params):
+                violation = {
+                    "service_id": row.service_id,
+                    "service_nom": row.nom,
+                    "date_debut": row.date_debut.strftime("%Y-%m-%d"),
+                    "date_fin": row.date_fin.strftime("%Y-%m-%d"),
+                    "occupation_max": int(row.occupation_max),
+                    "capacite": row.places_disponibles,
+                }
+                capacity_violations.append(violation)
+                errors.append(
+                    f"Service {row.nom} capacity exceeded from {violation['date_debut']} "
+                    f"to {violation['date_fin']}: {violation['occupation_max']} students assigned, "
+                    f"capacity is {row.places_disponibles}"
+                )
+
+            without_rotations = db.execute(_STUDENTS_WITHOUT_ROTATIONS_SQL, params).scalar()
+            if without_rotations:
+                warnings.append(
+                    f"{without_rotations} students have no rotations assigned"
+                )
+
+            totals = db.execute(_PLANNING_TOTALS_SQL, params).one()
+            return {
+                "is_valid": len(errors) == 0,
+                "erreurs": errors,
+                "warnings": warnings,
+                "total_rotations": totals.total_rotations,
+                "total_students": totals.total_students,
+                "total_services": totals.total_services,
+                "depassements_capacite": capacity_violations
             }
 
+        except Exception as e:
+            logger.error(f"Error validating planning {planning_id} in database: {str(e)}")
+            return {
+                "is_valid": False,
+                "erreurs": [f"Error during validation: {str(e)}"],
+                "warnings": [],
+                "total_rotations": 0,
+                "total_students": 0,
+                "total_services": 0,
+                "depassements_capacite": []
+            }
 
 rotation = CRUDRotation(Rotation)
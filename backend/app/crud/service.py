@@ -7,6 +7,7 @@ import uuid
 from .base import CRUDBase
 from ..models import Service, Speciality
 from ..schemas import ServiceCreate, ServiceBase
+from .planning_validation import planning_validation
 from .utils import validate_string_length, handle_db_commit, handle_unique_constraint, db_commit_context
 
 
@@ -115,6 +116,9 @@ class CRUDService(CRUDBase[Service, ServiceCreate, ServiceBase]):
             )
 
         try:
+            if obj_in.places_disponibles != db_obj.places_disponibles:
+                # Capacity checks of the plannings using this service change
+                planning_validation.bump_all(db, service_id=db_obj.id)
             for field, value in obj_in.dict(exclude_unset=True).items():
                 setattr(db_obj, field, value)
             db.commit()
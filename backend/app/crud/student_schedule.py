@@ -1,4 +1,5 @@
 from typing import List, Optional, Dict, Any
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from fastapi import HTTPException, status
@@ -7,6 +8,7 @@ from datetime import datetime, timedelta
 import json
 
 from .base import CRUDBase
+from .bulk import bulk_insert
 from ..models import StudentSchedule, StudentScheduleDetail, Etudiant, Planning, Service
 from ..schemas import (
     StudentScheduleCreate,
@@ -71,32 +73,8 @@ class CRUDStudentSchedule(CRUDBase[StudentSchedule, StudentScheduleCreate, Stude
 
             # Create schedule details for each rotation
             for rotation_data in rotations:
-                try:
-                    date_debut_rotation = datetime.strptime(
-                        rotation_data['date_debut'], "%Y-%m-%d")
-                    date_fin_rotation = datetime.strptime(
-                        rotation_data['date_fin'], "%Y-%m-%d")
-                    duree_jours = (date_fin_rotation -
-                                   date_debut_rotation).days + 1
-                except (ValueError, KeyError) as e:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Données de rotation invalides: {str(e)}"
-                    )
-
-                schedule_detail = StudentScheduleDetail(
-                    id=str(uuid.uuid4()),
-                    schedule_id=db_schedule.id,
-                    rotation_id=rotation_data.get('id'),
-                    service_id=rotation_data.get('service_id'),
-                    service_nom=rotation_data.get('service_nom'),
-                    ordre_service=rotation_data.get('ordre'),
-                    date_debut=rotation_data['date_debut'],
-                    date_fin=rotation_data['date_fin'],
-                    duree_jours=duree_jours,
-                    statut="planifie"
-                )
-                db.add(schedule_detail)
+                db.add(StudentScheduleDetail(
+                    **self._detail_values(db_schedule.id, rotation_data)))
 
             db.commit()
             db.refresh(db_schedule)
@@ -109,6 +87,140 @@ class CRUDStudentSchedule(CRUDBase[StudentSchedule, StudentScheduleCreate, Stude
                 detail=f"Erreur lors de la création du planning: {str(e)}"
             )
 
+    def _detail_values(self, schedule_id: str, rotation_data: Dict) -> Dict[str, Any]:
+        """Column values of the schedule detail of one rotation"""
+        try:
+            date_debut_rotation = datetime.strptime(
+                rotation_data['date_debut'], "%Y-%m-%d")
+            date_fin_rotation = datetime.strptime(
+                rotation_data['date_fin'], "%Y-%m-%d")
+            duree_jours = (date_fin_rotation -
+                           date_debut_rotation).days + 1
+        except (ValueError, KeyError) as e:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Données de rotation invalides: {str(e)}"
+            )
+
+        return {
+            'id': str(uuid.uuid4()),
+            'schedule_id': schedule_id,
+            'rotation_id': rotation_data.get('id'),
+            'service_id': rotation_data.get('service_id'),
+            'service_nom': rotation_data.get('service_nom'),
+            'ordre_service': rotation_data.get('ordre'),
+            'date_debut': rotation_data['date_debut'],
+            'date_fin': rotation_data['date_fin'],
+            'duree_jours': duree_jours,
+            'statut': "planifie"
+        }
+
+    def create_many_from_planning(
+        self,
+        db: Session,
+        *,
+        planning_id: str,
+        rotations_by_student: Dict[str, List[Dict]],
+        date_debut_planning: str,
+        date_fin_planning: str,
+        commit: bool = True
+    ) -> int:
+        """
+        Create the schedules of many students with bulk inserts.
+
+        Schedules and details are written with executemany batches instead of one
+        ORM object each; with ``commit=False`` they join the caller's transaction.
+        """
+        try:
+            date_debut = datetime.strptime(date_debut_planning, "%Y-%m-%d")
+            date_fin = datetime.strptime(date_fin_planning, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail="Format de date invalide. Utilisez YYYY-MM-DD"
+            )
+        duree_totale_jours = (date_fin - date_debut).days + 1
+
+        schedule_rows = []
+        detail_rows = []
+        for etudiant_id, rotations in rotations_by_student.items():
+            if not rotations:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Au moins une rotation doit être fournie"
+                )
+            schedule_id = str(uuid.uuid4())
+            schedule_rows.append({
+                'id': schedule_id,
+                'etudiant_id': etudiant_id,
+                'planning_id': planning_id,
+                'version': 1,
+                'is_active': True,
+                'date_debut_planning': date_debut_planning,
+                'date_fin_planning': date_fin_planning,
+                'nb_services_total': len(rotations),
+                'nb_services_completes': 0,
+                'duree_totale_jours': duree_totale_jours,
+                'taux_occupation_moyen': 0,
+                'statut': "en_cours"
+            })
+            detail_rows.extend(
+                self._detail_values(schedule_id, rotation_data) for rotation_data in rotations)
+
+        try:
+            bulk_insert(db, StudentSchedule, schedule_rows)
+            bulk_insert(db, StudentScheduleDetail, detail_rows)
+            if commit:
+                db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail=f"Erreur lors de la création du planning: {str(e)}"
+            )
+        return len(schedule_rows)
+
+    def apply_rotation_changes(
+        self,
+        db: Session,
+        *,
+        planning_id: str,
+        removed_rotation_ids: List[str],
+        added_rotations_by_student: Dict[str, List[Dict]]
+    ) -> int:
+        """
+        Mirror a planning repair on the existing schedules (no commit).
+
+        Details of removed rotations are deleted and new rotations are appended to
+        each student's active schedule of the planning. Students without a schedule
+        are left alone: theirs is created when schedules are next generated.
+        """
+        if removed_rotation_ids:
+            db.query(StudentScheduleDetail).filter(
+                StudentScheduleDetail.rotation_id.in_(removed_rotation_ids)
+            ).delete(synchronize_session=False)
+
+        schedules = db.query(StudentSchedule).filter(
+            StudentSchedule.planning_id == planning_id,
+            StudentSchedule.is_active == True
+        ).all()
+        detail_rows = []
+        for db_schedule in schedules:
+            for rotation_data in added_rotations_by_student.get(db_schedule.etudiant_id, []):
+                detail_rows.append(
+                    self._detail_values(db_schedule.id, rotation_data))
+        bulk_insert(db, StudentScheduleDetail, detail_rows)
+
+        # Keep the totals in line with the remaining details
+        counts = dict(db.query(
+            StudentScheduleDetail.schedule_id, func.count(StudentScheduleDetail.id)
+        ).filter(
+            StudentScheduleDetail.schedule_id.in_([s.id for s in schedules])
+        ).group_by(StudentScheduleDetail.schedule_id).all())
+        for db_schedule in schedules:
+            db_schedule.nb_services_total = counts.get(db_schedule.id, 0)
+        return len(detail_rows)
+
     def get_by_etudiant(self, db: Session, *, etudiant_id: str) -> List[StudentSchedule]:
         """Get all schedules for a student"""
         return db.query(StudentSchedule).filter(
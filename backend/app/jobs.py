@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+JOB_PENDING = "en_attente"
+JOB_RUNNING = "en_cours"
+JOB_DONE = "termine"
+JOB_FAILED = "echoue"
+
+# Generations running at once; each holds one DB connection while it runs
+MAX_JOB_WORKERS = int(os.environ.get("PLANNING_JOB_WORKERS", "2"))
+# Jobs waiting for a worker before new submissions are refused
+MAX_PENDING_JOBS = 32
+# Finished jobs kept for polling, oldest forgotten first
+MAX_KEPT_JOBS = 200
+# Longest wait between two events of a job stream (used as keep-alive)
+STREAM_INTERVAL_SECONDS = 1.0
+# Shortest delay between two events of a job stream
+STREAM_THROTTLE_SECONDS = 0.1
+
+
+@dataclass
+class Job:
+    """State of one background generation"""
+    id: str
+    type: str
+    statut: str = JOB_PENDING
+    rotations_planifiees: int = 0
+    rotations_cible: int = 0
+    # Rotations currently placed, lower than the above after a backtrack
+    rotations_courantes: int = 0
+    retours_arriere: int = 0
+    date_creation: datetime = field(default_factory=datetime.now)
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+    resultat: Any = None
+    erreur: Any = None
+    code_erreur: Optional[int] = None
+
+    @property
+    def progression(self) -> float:
+        """Percent of the rotation target reached"""
+        if self.statut == JOB_DONE:
+            return 100.0
+        if self.rotations_cible <= 0:
+            return 0.0
+        return round(min(100.0, 100.0 * self.rotations_planifiees / self.rotations_cible), 1)
+
+    @property
+    def duree_ms(self) -> Optional[float]:
+        """Milliseconds spent running so far, or in total once finished"""
+        if not self.date_debut:
+            return None
+        return round(((self.date_fin or datetime.now()) - self.date_debut).total_seconds() * 1000, 1)
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'type': self.type,
+            'statut': self.statut,
+            'progression': self.progression,
+            'rotations_planifiees': self.rotations_planifiees,
+            'rotations_cible': self.rotations_cible,
+            'retours_arriere': self.retours_arriere,
+            'duree_ms': self.duree_ms,
+            'date_creation': self.date_creation,
+            'date_debut': self.date_debut,
+            'date_fin': self.date_fin,
+            'resultat': self.resultat,
+            'erreur': self.erreur,
+            'code_erreur': self.code_erreur,
+        }
+
+
+class JobManager:
+    """
+    Bounded pool of background workers with in-memory job tracking.
+
+    Each job runs ``func(db, progress)`` on its own session, so the request that
+    submitted it returns at once and does not hold a connection. Jobs live in
+    this process only: they are lost on restart and not shared between workers.
+    """
+
+    def __init__(self, max_workers: int = MAX_JOB_WORKERS, max_pending: int = MAX_PENDING_JOBS,
+                 max_kept: int = MAX_KEPT_JOBS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="planning-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Notified on every change of a job, for streams
+        self._changed = threading.Condition(self._lock)
+        self.max_pending = max_pending
+        self.max_kept = max_kept
+
+    def submit(self, job_type: str, func: Callable[[Session, Callable[[int, int], None]], Any]) -> dict:
+        """Queue a job and return its initial state"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.statut == JOB_PENDING)
+            if pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Trop de générations en attente, réessayez plus tard"
+                )
+            job = Job(id=str(uuid.uuid4()), type=job_type)
+            self._jobs[job.id] = job
+            self._evict()
+            snapshot = job.to_dict()
+        self._executor.submit(self._run, job, func)
+        logger.info(f"📥 Job {job.id} ({job_type}) queued")
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def events(self, job_id: str, interval: float = STREAM_INTERVAL_SECONDS) -> Iterator[Tuple[str, dict]]:
+        """
+        Follow a job until it finishes, yielding ``(event, state)``.
+
+        Events are ``progression`` when rotations are placed, ``retour_arriere``
+        when backtracks undid some, ``attente`` when nothing changed for
+        ``interval`` seconds, then one final ``termine`` or ``echoue``. Changes
+        closer than ``STREAM_THROTTLE_SECONDS`` are merged into one event.
+        """
+        seen = None
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is not None and job.date_fin is None and self._marker(job) == seen:
+                    self._changed.wait(timeout=interval)
+                    job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                state = job.to_dict()
+                marker = self._marker(job)
+                finished = job.date_fin is not None
+            if finished:
+                yield state['statut'], state
+                return
+            if marker == seen:
+                yield "attente", state
+            elif seen is not None and marker[2] > seen[2]:
+                yield "retour_arriere", state
+            else:
+                yield "progression", state
+            seen = marker
+            time.sleep(STREAM_THROTTLE_SECONDS)
+
+    @staticmethod
+    def _marker(job: Job) -> tuple:
+        return job.statut, job.rotations_courantes, job.retours_arriere
+
+    def _evict(self):
+        """Forget the oldest finished jobs beyond ``max_kept``"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.statut in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.max_kept)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job, func):
+        with self._changed:
+            job.statut = JOB_RUNNING
+            job.date_debut = datetime.now()
+            self._changed.notify_all()
+
+        def progress(done: int, target: int):
+            # Backtracking may undo rotations: only report forward progress
+            with self._changed:
+                if done < job.rotations_courantes:
+                    job.retours_arriere += 1
+                job.rotations_courantes = done
+                job.rotations_cible = target
+                job.rotations_planifiees = max(job.rotations_planifiees, done)
+                self._changed.notify_all()
+
+        db = SessionLocal()
+        try:
+            result = func(db, progress)
+            with self._lock:
+                job.resultat = result
+                job.statut = JOB_DONE
+            logger.info(f"✅ Job {job.id} done")
+        except HTTPException as e:
+            db.rollback()
+            with self._lock:
+                job.erreur = e.detail
+                job.code_erreur = e.status_code
+                job.statut = JOB_FAILED
+            logger.warning(f"⚠️  Job {job.id} failed: {e.detail}")
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"❌ Job {job.id} crashed")
+            with self._lock:
+                job.erreur = str(e)
+                job.code_erreur = 500
+                job.statut = JOB_FAILED
+        finally:
+            db.close()
+            with self._changed:
+                job.date_fin = datetime.now()
+                self._changed.notify_all()
+
+
+planning_jobs = JobManager()
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Boolean, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from .database import Base
 import uuid
@@ -165,6 +165,11 @@ class Planning(Base):
     # Year level for this planning (1, 2, 3, etc.)
     annee_niveau = Column(Integer, nullable=True)
     date_creation = Column(DateTime(timezone=True), server_default=func.now())
+    # Bumped by every write that can change the validation of the planning
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Last validation result (JSON) and the version it was computed for
+    validation_version = Column(Integer, nullable=True)
+    validation_resultat = deferred(Column(Text, nullable=True))
 
     # Relationships
     promotion = relationship("Promotion", back_populates="plannings")
@@ -175,6 +180,22 @@ class Planning(Base):
         "StudentSchedule", back_populates="planning", cascade="all, delete-orphan")
 
 
+class PlanningCache(Base):
+    """Scheduler output of one generation, keyed by a fingerprint of its inputs"""
+    __tablename__ = "planning_cache"
+
+    # sha256 of the students, services, settings, start date and solver options
+    fingerprint = Column(String(64), primary_key=True)
+    promo_id = Column(String(36), nullable=False, index=True)
+    promotion_year_id = Column(String(36), nullable=True, index=True)
+    # Planning still holding this output unchanged, if any
+    planning_id = Column(String(36), nullable=True)
+    resultat = Column(Text, nullable=False)  # JSON of the kernel result
+    nb_utilisations = Column(Integer, default=0)
+    date_creation = Column(DateTime(timezone=True), server_default=func.now())
+    date_dernier_acces = Column(DateTime, default=datetime.utcnow)
+
+
 class PlanningSettings(Base):
     __tablename__ = "planning_settings"
 
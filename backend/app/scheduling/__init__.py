@@ -0,0 +1,44 @@
+# Scheduling package: database-free structures used by the planning generators
+from .occupancy import OccupancyIndex
+from .intervals import (
+    EditCheck,
+    IntervalIndex,
+    OverloadRange,
+    PlanningAnalysis,
+    ServiceLoad,
+    analyze,
+    occupancy_segments,
+    overload_ranges,
+    peak_occupancy,
+)
+from .scoring import ScoringState
+from .engine import Assignment, EventScheduler, ProgressCallback
+from .kernel import (
+    DEMAND_STRATEGY,
+    EXACT_SOLVER,
+    GREEDY_SOLVER,
+    LOAD_STRATEGY,
+    SOLVERS,
+    SchedulingProblem,
+    SchedulingResult,
+    repair,
+    schedule,
+    schedule_shared,
+)
+from .exact import EXACT_TIME_LIMIT_SECONDS, solve_exact
+from .bounds import MakespanBounds, makespan_bounds, problem_bounds
+from .feasibility import FeasibilityIssue, FeasibilityReport, diagnose
+from .local_search import LOCAL_SEARCH_BUDGET_SECONDS, improve
+from .parallel import MULTISTART_BUDGET_SECONDS, multistart, refine, solve, solve_many
+
+__all__ = [
+    "OccupancyIndex", "OverloadRange", "occupancy_segments", "overload_ranges", "peak_occupancy",
+    "PlanningAnalysis", "ServiceLoad", "analyze", "EditCheck", "IntervalIndex",
+    "ScoringState", "Assignment", "EventScheduler", "ProgressCallback",
+    "DEMAND_STRATEGY", "LOAD_STRATEGY", "SchedulingProblem", "SchedulingResult", "schedule",
+    "schedule_shared", "repair",
+    "GREEDY_SOLVER", "EXACT_SOLVER", "SOLVERS", "EXACT_TIME_LIMIT_SECONDS", "solve_exact",
+    "MakespanBounds", "makespan_bounds", "problem_bounds",
+    "FeasibilityIssue", "FeasibilityReport", "diagnose", "solve", "solve_many",
+    "refine", "multistart", "MULTISTART_BUDGET_SECONDS", "improve", "LOCAL_SEARCH_BUDGET_SECONDS",
+]
@@ -0,0 +1,77 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+from .kernel import SchedulingProblem
+
+
+@dataclass
+class MakespanBounds:
+    """
+    Lower bounds on the number of days a planning needs, counted from day 0 to
+    the end of the last rotation.
+
+    ``capacity_bounds`` holds, per service, the days needed to run every student
+    through it: each of its ``c`` places hosts one student at a time, so a
+    horizon of ``M`` days fits at most ``c * floor(M / d)`` students.
+    ``workload_bound`` is the length of one student's rotations placed back to
+    back with the rest days between them.
+    """
+    capacity_bounds: Dict[str, int] = field(default_factory=dict)
+    workload_bound: int = 0
+
+    @property
+    def capacity_bound(self) -> int:
+        return max(self.capacity_bounds.values(), default=0)
+
+    @property
+    def lower_bound(self) -> int:
+        return max(self.capacity_bound, self.workload_bound)
+
+    @property
+    def bottleneck(self) -> Optional[str]:
+        """Service whose capacity bound is the binding one, if any"""
+        if not self.capacity_bounds or self.capacity_bound < self.workload_bound:
+            return None
+        return max(self.capacity_bounds, key=self.capacity_bounds.get)
+
+    def gap(self, makespan: int) -> int:
+        """Days between a planning's makespan and the lower bound"""
+        return max(0, makespan - self.lower_bound)
+
+    def gap_ratio(self, makespan: int) -> float:
+        """Optimality gap relative to the lower bound (0.0 = provably optimal)"""
+        if self.lower_bound <= 0:
+            return 0.0
+        return self.gap(makespan) / self.lower_bound
+
+
+def makespan_bounds(
+    nb_students: int,
+    service_ids: Sequence[str],
+    durations: Sequence[int],
+    capacities: Sequence[int],
+    rest_days: int,
+) -> MakespanBounds:
+    """Capacity and workload lower bounds; services without places are left out"""
+    bounds = MakespanBounds()
+    if nb_students <= 0 or not service_ids:
+        return bounds
+
+    for service_id, duration, capacity in zip(service_ids, durations, capacities):
+        if capacity > 0:
+            bounds.capacity_bounds[service_id] = math.ceil(
+                nb_students / capacity) * duration
+
+    # Next start = end day + rest days, i.e. rest_days - 1 free days in between
+    rest_days = max(rest_days, 1)
+    bounds.workload_bound = max(
+        sum(durations) + (rest_days - 1) * (len(durations) - 1), max(durations))
+    return bounds
+
+
+def problem_bounds(problem: SchedulingProblem) -> MakespanBounds:
+    """Lower bounds of a kernel problem"""
+    return makespan_bounds(
+        len(problem.student_ids), problem.service_ids, problem.durations,
+        problem.capacities, problem.rest_days)
@@ -0,0 +1,241 @@
+import heapq
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from .occupancy import OccupancyIndex
+from .scoring import ScoringState
+
+logger = logging.getLogger(__name__)
+
+# score(service_index, start_day, free_places, completed_count, days_delay)
+ScoreFunction = Callable[[int, int, float, int, int], float]
+# progress(rotations placed, rotations targeted); the count drops after a backtrack
+ProgressCallback = Callable[[int, int], None]
+
+# Largest random bonus added to a candidate's score in seeded runs
+SCORE_JITTER = 0.05
+
+
+@dataclass
+class Assignment:
+    """One student placed in one service for a window of days"""
+    student_id: str
+    service_id: str
+    start_day: int
+    duration: int
+
+    @property
+    def end_day(self) -> int:
+        return self.start_day + self.duration - 1
+
+
+class EventScheduler:
+    """
+    Greedy scheduler driven by a heap of student-availability events.
+
+    The heap is keyed by (completed services, next available day, input order), so
+    the student popped is always the one the iteration/sort loop would have served
+    next. A student is pushed back only after receiving an assignment, which makes
+    the run proportional to the number of rotations instead of iterations x students.
+
+    Students with no feasible slot within ``max_delay`` days are parked until the
+    heap drains. They are then retried after backtracking the most recent
+    assignments (up to ``max_backtracks`` rounds) or, once that budget is spent,
+    after moving their search window past the one that was fully booked.
+
+    With a ``seed`` the input order is shuffled and every score gets a small
+    random bonus, so that multi-start runs explore different plannings. Past a
+    ``deadline`` (``time.monotonic()`` value) the run stops with what it has
+    placed and ``truncated`` is set.
+
+    Backtracking only touches the occupancy index, the scoring counters and the
+    per-student assignment stacks; callers persist ``history`` once the run is over.
+    """
+
+    def __init__(
+        self,
+        occupancy: OccupancyIndex,
+        student_ids: Sequence[str],
+        service_ids: Sequence[str],
+        durations: Sequence[int],
+        *,
+        rest_days: int,
+        max_delay: int,
+        scoring: Optional[ScoringState] = None,
+        score: Optional[ScoreFunction] = None,
+        max_backtracks: int = 0,
+        start_day: int = 0,
+        completed: Optional[Dict[str, Set[str]]] = None,
+        ready_days: Optional[Dict[str, int]] = None,
+        progress: Optional[ProgressCallback] = None,
+        seed: Optional[int] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.occupancy = occupancy
+        self.student_ids = list(student_ids)
+        self.service_ids = list(service_ids)
+        self.durations = list(durations)
+        self.rest_days = rest_days
+        self.max_delay = max_delay
+        self.scoring = scoring
+        self.score = score or self._default_score
+        self.max_backtracks = max_backtracks
+        self.start_day = start_day
+        self.progress = progress
+        self.deadline = deadline
+        self.truncated = False
+        # Seeded runs shuffle the student order and perturb near-equal scores
+        self._rng = random.Random(seed) if seed is not None else None
+
+        # Services already done and first free day, e.g. when repairing a planning
+        self.completed: Dict[str, Set[str]] = {
+            sid: set((completed or {}).get(sid, ())) for sid in self.student_ids}
+        self.initial_ready: Dict[str, int] = {
+            sid: (ready_days or {}).get(sid, start_day) for sid in self.student_ids}
+        self.history: List[Assignment] = []
+        # Each student's assignments in creation order, so undoing the latest
+        # one and finding the new next available day are O(1)
+        self.stacks: Dict[str, List[Assignment]] = {
+            sid: [] for sid in self.student_ids}
+        self.backtracks = 0
+        self.deferrals = 0
+
+    def _default_score(
+        self, index: int, start_day: int, free_places: float, completed_count: int, days_delay: int
+    ) -> float:
+        service_id = self.service_ids[index]
+        availability_score = free_places / self.occupancy.capacity(service_id)
+        return self.scoring.score(service_id, availability_score, completed_count, days_delay)
+
+    def run(self) -> List[Assignment]:
+        """Schedule every student in every service and return the assignments in creation order"""
+        students = list(self.student_ids)
+        if self._rng:
+            self._rng.shuffle(students)
+        order = {sid: i for i, sid in enumerate(students)}
+        version = {sid: 0 for sid in self.student_ids}
+        ready = dict(self.initial_ready)
+        heap = [(len(self.completed[sid]), ready[sid], order[sid], 0, sid)
+                for sid in self.student_ids]
+        heapq.heapify(heap)
+        stalled: List[str] = []
+        nb_services = len(self.service_ids)
+        target = nb_services * len(self.student_ids)
+        already_done = sum(len(done) for done in self.completed.values())
+
+        def push(sid: str):
+            version[sid] += 1
+            heapq.heappush(heap, (len(self.completed[sid]), ready[sid],
+                                  order[sid], version[sid], sid))
+
+        while heap or stalled:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.truncated = True
+                logger.info(
+                    f"⏱️  Time budget spent: {len(self.history)}/{target - already_done} rotations placed")
+                break
+            if not heap:
+                if self.backtracks < self.max_backtracks and self._backtrack(ready, push):
+                    self.backtracks += 1
+                    if self.progress:
+                        self.progress(already_done + len(self.history), target)
+                else:
+                    # Nothing frees up without backtracking: search past the booked window
+                    for sid in stalled:
+                        ready[sid] += self.max_delay + 1
+                    self.deferrals += 1
+                for sid in stalled:
+                    push(sid)
+                stalled = []
+                continue
+
+            completed_count, day, _, entry_version, sid = heapq.heappop(heap)
+            if entry_version != version[sid]:
+                continue  # Stale event superseded by backtracking
+
+            done = self.completed[sid]
+            remaining = [i for i in range(nb_services)
+                         if self.service_ids[i] not in done]
+            if not remaining:
+                continue
+
+            best = self._best_candidate(remaining, day, completed_count)
+            if best is None:
+                stalled.append(sid)
+                continue
+
+            index, start_day = best
+            assignment = Assignment(
+                sid, self.service_ids[index], start_day, self.durations[index])
+            self._apply(assignment)
+            ready[sid] = assignment.end_day + self.rest_days
+            if self.progress:
+                self.progress(already_done + len(self.history), target)
+            if len(done) < nb_services:
+                push(sid)
+
+        return self.history
+
+    def _best_candidate(self, remaining: List[int], day: int, completed_count: int):
+        """Highest-scoring (service index, start day) among the remaining services"""
+        service_ids = [self.service_ids[i] for i in remaining]
+        durations = [self.durations[i] for i in remaining]
+        starts = self.occupancy.earliest_starts(
+            service_ids, day, durations, self.max_delay)
+        free = self.occupancy.mean_free_many(
+            service_ids, [max(s, day) for s in starts.tolist()], durations)
+
+        best = None
+        best_score = None
+        for index, start_day, free_places in zip(remaining, starts.tolist(), free.tolist()):
+            if start_day < 0:
+                continue
+            score = self.score(index, start_day, free_places,
+                               completed_count, start_day - day)
+            if self._rng:
+                score += self._rng.random() * SCORE_JITTER
+            if best_score is None or score > best_score:
+                best_score = score
+                best = (index, start_day)
+        return best
+
+    def _apply(self, assignment: Assignment):
+        self.occupancy.reserve(assignment.service_id,
+                               assignment.start_day, assignment.duration)
+        if self.scoring:
+            self.scoring.record(assignment.service_id)
+        self.completed[assignment.student_id].add(assignment.service_id)
+        self.stacks[assignment.student_id].append(assignment)
+        self.history.append(assignment)
+
+    def _backtrack(self, ready: Dict[str, int], push) -> bool:
+        """Undo up to a third (max 10) of the latest assignments; False if nothing to undo"""
+        backtrack_count = min(10, len(self.history) // 3)
+        if backtrack_count == 0:
+            return False
+
+        logger.debug(
+            f"🔄 Backtracking {backtrack_count} assignments due to stagnation")
+        touched = set()
+        for _ in range(backtrack_count):
+            assignment = self.history.pop()
+            self.occupancy.release(assignment.service_id,
+                                   assignment.start_day, assignment.duration)
+            if self.scoring:
+                self.scoring.unrecord(assignment.service_id)
+            self.completed[assignment.student_id].discard(
+                assignment.service_id)
+            # The latest assignment overall is also the latest of its student
+            self.stacks[assignment.student_id].pop()
+            touched.add(assignment.student_id)
+
+        for sid in touched:
+            # Next available day follows the student's remaining latest assignment
+            stack = self.stacks[sid]
+            ready[sid] = stack[-1].end_day + \
+                self.rest_days if stack else self.initial_ready[sid]
+            push(sid)
+        return True
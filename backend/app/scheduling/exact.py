@@ -0,0 +1,157 @@
+import logging
+from typing import List, Optional
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+from .kernel import SchedulingProblem, SchedulingResult
+
+logger = logging.getLogger(__name__)
+
+# Default wall-clock limit handed to HiGHS
+EXACT_TIME_LIMIT_SECONDS = 30.0
+# Larger models are not attempted: the greedy result is kept instead
+MAX_EXACT_VARIABLES = 200_000
+MAX_EXACT_NONZEROS = 5_000_000
+
+
+def solve_exact(
+    problem: SchedulingProblem,
+    incumbent: SchedulingResult,
+    time_limit: float = EXACT_TIME_LIMIT_SECONDS,
+    lower_bound: int = 0,
+    max_variables: int = MAX_EXACT_VARIABLES,
+) -> Optional[SchedulingResult]:
+    """
+    Minimise the makespan with a time-indexed MILP solved by HiGHS.
+
+    ``x[s, j, t] = 1`` when student ``s`` starts service ``j`` on day ``t``. Each
+    student does each service once, at most ``capacity[j]`` students are in a
+    service on any day, and a student's rotations are separated as in the greedy
+    kernel (next start >= end day + rest days). The horizon is the makespan of
+    ``incumbent`` so the model never searches past the greedy planning.
+
+    Returns None when the model is too large, infeasible within the horizon or
+    when HiGHS finds no solution before ``time_limit``.
+    """
+    durations = np.asarray(problem.durations, dtype=np.int64)
+    # Days a start blocks for the same student (the start day of the next one excluded)
+    blocks = np.maximum(durations, durations - 1 + problem.rest_days)
+    horizon = incumbent.makespan
+    if not incumbent.complete:
+        # Leave room to append every service after the partial planning
+        horizon += int(blocks.sum())
+    elif lower_bound >= horizon:
+        return None  # The incumbent is already optimal
+    nb_students = len(problem.student_ids)
+    nb_services = len(problem.service_ids)
+    windows = horizon - durations + 1  # Possible start days per service
+    if horizon <= 0 or (windows <= 0).any():
+        return None
+
+    nb_variables = int(nb_students * windows.sum()) + 1
+    nonzeros = int(nb_students * (windows * (durations + np.minimum(blocks, horizon) + 2)).sum())
+    if nb_variables > max_variables or nonzeros > MAX_EXACT_NONZEROS:
+        logger.info(
+            f"⏭️  Exact model skipped: {nb_variables} variables, {nonzeros} non-zeros")
+        return None
+
+    makespan_var = nb_variables - 1
+    assign_rows = nb_students * nb_services
+    capacity_rows = nb_services * horizon
+    student_rows = nb_students * horizon
+    makespan_rows = nb_students * nb_services
+
+    rows: List[np.ndarray] = []
+    cols: List[np.ndarray] = []
+    vals: List[np.ndarray] = []
+    base = 0
+    for j in range(nb_services):
+        duration, block, window = int(durations[j]), int(blocks[j]), int(windows[j])
+        students = np.repeat(np.arange(nb_students), window)
+        starts = np.tile(np.arange(window), nb_students)
+        var = base + np.arange(nb_students * window)
+
+        # Each student does the service exactly once
+        rows.append(students * nb_services + j)
+        cols.append(var)
+        vals.append(np.ones(len(var)))
+
+        # Capacity of the service on every day the rotation covers
+        covered = starts[:, None] + np.arange(duration)[None, :]
+        rows.append((assign_rows + j * horizon + covered).ravel())
+        cols.append(np.repeat(var, duration))
+        vals.append(np.ones(len(var) * duration))
+
+        # One rotation at a time per student, rest days included
+        blocked = starts[:, None] + np.arange(block)[None, :]
+        keep = blocked < horizon
+        rows.append((assign_rows + capacity_rows +
+                     students[:, None] * horizon + blocked)[keep])
+        cols.append(np.broadcast_to(var[:, None], blocked.shape)[keep])
+        vals.append(np.ones(int(keep.sum())))
+
+        # Makespan covers the end of every rotation
+        makespan_row = assign_rows + capacity_rows + student_rows + students * nb_services + j
+        rows.append(makespan_row)
+        cols.append(var)
+        vals.append((starts + duration).astype(float))
+        base += len(var)
+
+    makespan_row = assign_rows + capacity_rows + student_rows + np.arange(makespan_rows)
+    rows.append(makespan_row)
+    cols.append(np.full(makespan_rows, makespan_var))
+    vals.append(np.full(makespan_rows, -1.0))
+
+    nb_rows = assign_rows + capacity_rows + student_rows + makespan_rows
+    matrix = coo_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(nb_rows, nb_variables)).tocsr()
+
+    lower = np.concatenate([
+        np.ones(assign_rows),
+        np.full(capacity_rows + student_rows + makespan_rows, -np.inf),
+    ])
+    upper = np.concatenate([
+        np.ones(assign_rows),
+        np.repeat(np.asarray(problem.capacities, dtype=float), horizon),
+        np.ones(student_rows),
+        np.zeros(makespan_rows),
+    ])
+
+    objective = np.zeros(nb_variables)
+    objective[makespan_var] = 1.0
+    integrality = np.ones(nb_variables)
+    integrality[makespan_var] = 0
+    variable_lower = np.zeros(nb_variables)
+    variable_upper = np.ones(nb_variables)
+    variable_lower[makespan_var] = lower_bound
+    variable_upper[makespan_var] = horizon
+
+    solution = milp(
+        objective,
+        constraints=LinearConstraint(matrix, lower, upper),
+        integrality=integrality,
+        bounds=Bounds(variable_lower, variable_upper),
+        options={"time_limit": time_limit, "disp": False},
+    )
+    if solution.x is None:
+        logger.info(f"⏱️  Exact solver found no solution: {solution.message}")
+        return None
+
+    logger.info(
+        f"🎯 Exact solver: makespan {solution.fun:.0f} (greedy {incumbent.makespan}), {solution.message}")
+    chosen = np.flatnonzero(solution.x[:makespan_var] > 0.5)
+    rotations = []
+    base = 0
+    for j in range(nb_services):
+        window = int(windows[j])
+        block_vars = chosen[(chosen >= base) & (chosen < base + nb_students * window)] - base
+        for s, t in zip((block_vars // window).tolist(), (block_vars % window).tolist()):
+            rotations.append((s, j, t, t + int(durations[j]) - 1))
+        base += nb_students * window
+
+    # Same creation order as the kernel: by start day, then student
+    rotations.sort(key=lambda r: (r[2], r[0], r[1]))
+    return SchedulingResult(rotations=rotations)
@@ -0,0 +1,114 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .bounds import problem_bounds
+from .kernel import SchedulingProblem
+
+# Issue codes
+NO_STUDENTS = "no_students"
+NO_SERVICES = "no_services"
+NO_CAPACITY = "no_capacity"
+INVALID_DURATION = "invalid_duration"
+SERVICE_EXCEEDS_HORIZON = "service_exceeds_horizon"
+WORKLOAD_EXCEEDS_HORIZON = "workload_exceeds_horizon"
+
+
+@dataclass
+class FeasibilityIssue:
+    """One reason why mandatory completion cannot be reached"""
+    code: str
+    message: str
+    service_id: Optional[str] = None
+    required_days: Optional[int] = None
+    blocked_students: int = 0
+
+
+@dataclass
+class FeasibilityReport:
+    """Pre-flight diagnosis of a scheduling problem"""
+    issues: List[FeasibilityIssue] = field(default_factory=list)
+    # Students that cannot complete their services whatever the schedule
+    blocked_students: List[str] = field(default_factory=list)
+    lower_bound: int = 0
+    horizon_days: Optional[int] = None
+
+    @property
+    def feasible(self) -> bool:
+        return not self.issues
+
+    def summary(self) -> str:
+        return "; ".join(issue.message for issue in self.issues)
+
+
+def diagnose(
+    problem: SchedulingProblem,
+    horizon_days: Optional[int] = None,
+    service_names: Optional[List[str]] = None,
+) -> FeasibilityReport:
+    """
+    Check in O(services) whether every student can do every service.
+
+    Without ``horizon_days`` only hard impossibilities are reported (no places,
+    invalid durations): the generators extend the planning as needed otherwise.
+    With a horizon, services whose capacity bound and students whose workload do
+    not fit in it are reported as well.
+    """
+    names = service_names or list(problem.service_ids)
+    nb_students = len(problem.student_ids)
+    report = FeasibilityReport(horizon_days=horizon_days)
+
+    if nb_students == 0:
+        report.issues.append(FeasibilityIssue(
+            NO_STUDENTS, "Aucun étudiant actif à planifier"))
+        return report
+    if not problem.service_ids:
+        report.issues.append(FeasibilityIssue(
+            NO_SERVICES, "Aucun service disponible", blocked_students=nb_students))
+        report.blocked_students = list(problem.student_ids)
+        return report
+
+    all_blocked = False
+    for service_id, name, duration, capacity in zip(
+            problem.service_ids, names, problem.durations, problem.capacities):
+        if duration <= 0:
+            report.issues.append(FeasibilityIssue(
+                INVALID_DURATION,
+                f"Service '{name}' a une durée de stage invalide ({duration} jours)",
+                service_id=service_id, blocked_students=nb_students))
+            all_blocked = True
+        elif capacity <= 0:
+            report.issues.append(FeasibilityIssue(
+                NO_CAPACITY,
+                f"Service '{name}' n'a aucune place effective (capacité {capacity})",
+                service_id=service_id, blocked_students=nb_students))
+            all_blocked = True
+    if all_blocked:
+        report.blocked_students = list(problem.student_ids)
+        return report
+
+    bounds = problem_bounds(problem)
+    report.lower_bound = bounds.lower_bound
+    if horizon_days is None:
+        return report
+
+    for service_id, name, duration, capacity in zip(
+            problem.service_ids, names, problem.durations, problem.capacities):
+        required = bounds.capacity_bounds[service_id]
+        if required > horizon_days:
+            # Each place hosts floor(horizon / duration) students back to back
+            fitting = capacity * (horizon_days // duration)
+            report.issues.append(FeasibilityIssue(
+                SERVICE_EXCEEDS_HORIZON,
+                f"Service '{name}' demande {required} jours pour accueillir {nb_students} "
+                f"étudiants ({capacity} places, {duration} jours) au-delà de l'horizon de {horizon_days} jours",
+                service_id=service_id, required_days=required,
+                blocked_students=max(0, nb_students - fitting)))
+
+    if bounds.workload_bound > horizon_days:
+        report.issues.append(FeasibilityIssue(
+            WORKLOAD_EXCEEDS_HORIZON,
+            f"Chaque étudiant a besoin de {bounds.workload_bound} jours de stages et de repos, "
+            f"au-delà de l'horizon de {horizon_days} jours",
+            required_days=bounds.workload_bound, blocked_students=nb_students))
+        report.blocked_students = list(problem.student_ids)
+    return report
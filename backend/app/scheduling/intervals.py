@@ -0,0 +1,270 @@
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# (first day, last day), both inclusive, as ordinals
+Interval = Tuple[int, int]
+# (student id, service id, first day, last day) of one rotation
+RotationInterval = Tuple[str, str, int, int]
+
+
+@lru_cache(maxsize=8192)
+def to_day(value: str) -> int:
+    """Ordinal of a YYYY-MM-DD date (plannings reuse few distinct dates)"""
+    return datetime.strptime(value, "%Y-%m-%d").toordinal()
+
+
+def to_date(day: int) -> str:
+    """YYYY-MM-DD date of an ordinal"""
+    return date.fromordinal(day).strftime("%Y-%m-%d")
+
+
+@dataclass
+class OverloadRange:
+    """Consecutive days on which a service hosts more students than its capacity"""
+    start_day: int
+    end_day: int
+    peak: int
+
+
+def occupancy_segments(intervals: Iterable[Interval]) -> List[Tuple[int, int, int]]:
+    """
+    Daily occupancy as constant segments ``(first day, last day, count)`` with
+    ``count > 0``, from a sweep over the sorted start and end events.
+    """
+    events = []
+    for start, end in intervals:
+        events.append((start, 1))
+        events.append((end + 1, -1))
+    events.sort()
+
+    segments = []
+    count = 0
+    previous = None
+    for day, delta in events:
+        if previous is not None and day > previous and count > 0:
+            segments.append((previous, day - 1, count))
+        count += delta
+        previous = day
+    return segments
+
+
+def peak_occupancy(intervals: Iterable[Interval]) -> int:
+    return max((count for _, _, count in occupancy_segments(intervals)), default=0)
+
+
+def overload_ranges(intervals: Iterable[Interval], capacity: int) -> List[OverloadRange]:
+    """Maximal ranges of days whose occupancy exceeds ``capacity``, with their peak"""
+    ranges: List[OverloadRange] = []
+    for start, end, count in occupancy_segments(intervals):
+        if count <= capacity:
+            continue
+        if ranges and ranges[-1].end_day == start - 1:
+            ranges[-1].end_day = end
+            ranges[-1].peak = max(ranges[-1].peak, count)
+        else:
+            ranges.append(OverloadRange(start, end, count))
+    return ranges
+
+
+@dataclass
+class ServiceLoad:
+    """Occupancy of one service over a planning"""
+    assignments: int = 0
+    peak: int = 0
+    busy_days: int = 0   # Days with at least one student
+    place_days: int = 0  # Sum of the rotation lengths
+    overloads: List[OverloadRange] = field(default_factory=list)
+
+    @property
+    def mean_occupation(self) -> float:
+        """Students per busy day"""
+        return self.place_days / self.busy_days if self.busy_days else 0.0
+
+
+@dataclass
+class PlanningAnalysis:
+    """
+    Constraint checks and metrics of a set of rotations.
+
+    ``overlaps`` and ``gaps`` hold indices into the analysed rotations: a pair
+    of rotations of the same student sharing days, and a pair of consecutive
+    rotations separated by more than the allowed rest.
+    """
+    start_day: Optional[int] = None
+    end_day: Optional[int] = None
+    services: Dict[str, ServiceLoad] = field(default_factory=dict)
+    student_services: Dict[str, set] = field(default_factory=dict)
+    overlaps: List[Tuple[int, int]] = field(default_factory=list)
+    gaps: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def makespan(self) -> int:
+        if self.start_day is None:
+            return 0
+        return self.end_day - self.start_day + 1
+
+    @property
+    def place_days(self) -> int:
+        return sum(load.place_days for load in self.services.values())
+
+    def assignments(self, service_ids: Sequence[str]) -> List[int]:
+        return [self.services[s].assignments if s in self.services else 0 for s in service_ids]
+
+    def load_balance(self, service_ids: Sequence[str]) -> float:
+        """(max - min) / mean rotations per service, 0 when perfectly balanced"""
+        counts = self.assignments(service_ids)
+        if not counts or sum(counts) == 0:
+            return 0.0
+        mean = sum(counts) / len(counts)
+        return (max(counts) - min(counts)) / mean
+
+
+def analyze(
+    rotations: Sequence[RotationInterval],
+    capacities: Optional[Dict[str, int]] = None,
+    rest_days: int = 1,
+) -> PlanningAnalysis:
+    """
+    Check and measure a planning in O(n log n), whatever the rotation lengths.
+
+    Each service's occupancy comes from one sweep over its start and end events
+    (peak, busy days, ranges above ``capacities``). Each student's rotations are
+    sorted once: a rotation starting before the latest end seen so far overlaps
+    it, and a start more than ``rest_days`` after the previous end is a gap.
+    """
+    capacities = capacities or {}
+    analysis = PlanningAnalysis()
+    if not rotations:
+        return analysis
+    analysis.start_day = min(r[2] for r in rotations)
+    analysis.end_day = max(r[3] for r in rotations)
+
+    by_service: Dict[str, List[Interval]] = {}
+    by_student: Dict[str, List[int]] = {}
+    for index, (student_id, service_id, start, end) in enumerate(rotations):
+        by_service.setdefault(service_id, []).append((start, end))
+        by_student.setdefault(student_id, []).append(index)
+        analysis.student_services.setdefault(student_id, set()).add(service_id)
+
+    for service_id, intervals in by_service.items():
+        segments = occupancy_segments(intervals)
+        load = ServiceLoad(
+            assignments=len(intervals),
+            peak=max((count for _, _, count in segments), default=0),
+            busy_days=sum(end - start + 1 for start, end, _ in segments),
+            place_days=sum(end - start + 1 for start, end in intervals),
+        )
+        capacity = capacities.get(service_id)
+        if capacity is not None and load.peak > capacity:
+            load.overloads = overload_ranges(intervals, capacity)
+        analysis.services[service_id] = load
+
+    for indices in by_student.values():
+        indices.sort(key=lambda i: (rotations[i][2], rotations[i][3]))
+        latest = indices[0]
+        for current in indices[1:]:
+            start = rotations[current][2]
+            if start <= rotations[latest][3]:
+                analysis.overlaps.append((latest, current))
+            elif start - rotations[latest][3] > rest_days:
+                analysis.gaps.append((latest, current))
+            if rotations[current][3] > rotations[latest][3]:
+                latest = current
+    return analysis
+
+
+@dataclass
+class EditCheck:
+    """Effect of moving one rotation, from ``IntervalIndex.check``"""
+    overlaps: List[str] = field(default_factory=list)  # Rotations of the student sharing days
+    overloads: List[OverloadRange] = field(default_factory=list)  # Within the new days
+    gaps: List[Interval] = field(default_factory=list)  # New (last day, next first day) gaps
+
+    @property
+    def ok(self) -> bool:
+        return not self.overlaps and not self.overloads
+
+
+class IntervalIndex:
+    """
+    Rotations of one planning by student and by service, sorted by first day.
+
+    Made to check single edits: ``check`` only looks at the edited student's
+    timeline and at the rotations of the target service that start within the
+    new dates widened by the longest rotation of the service. Services have a
+    fixed rotation length, so those are the rotations intersecting the new
+    dates: the cost is O(log n + k) for k of them, whatever the planning size.
+    """
+
+    def __init__(self, rotations: Iterable[Tuple[str, str, str, int, int]] = ()):
+        self.rotations: Dict[str, RotationInterval] = {}
+        self._students: Dict[str, List[Tuple[int, int, str]]] = {}
+        self._services: Dict[str, List[Tuple[int, int, str]]] = {}
+        # Longest rotation ever added per service, an upper bound after removals
+        self._longest: Dict[str, int] = {}
+        for rotation_id, student_id, service_id, start, end in rotations:
+            self.add(rotation_id, student_id, service_id, start, end)
+
+    def __len__(self) -> int:
+        return len(self.rotations)
+
+    def add(self, rotation_id: str, student_id: str, service_id: str, start: int, end: int):
+        self.rotations[rotation_id] = (student_id, service_id, start, end)
+        insort(self._students.setdefault(student_id, []), (start, end, rotation_id))
+        insort(self._services.setdefault(service_id, []), (start, end, rotation_id))
+        self._longest[service_id] = max(self._longest.get(service_id, 0), end - start + 1)
+
+    def remove(self, rotation_id: str):
+        rotation = self.rotations.pop(rotation_id, None)
+        if rotation is None:
+            return
+        student_id, service_id, start, end = rotation
+        self._students[student_id].remove((start, end, rotation_id))
+        self._services[service_id].remove((start, end, rotation_id))
+
+    def move(self, rotation_id: str, student_id: str, service_id: str, start: int, end: int):
+        self.remove(rotation_id)
+        self.add(rotation_id, student_id, service_id, start, end)
+
+    def check(
+        self, rotation_id: str, student_id: str, service_id: str, start: int, end: int,
+        capacity: Optional[int] = None, rest_days: int = 1,
+    ) -> EditCheck:
+        """What giving ``rotation_id`` these student, service and days would break"""
+        result = EditCheck()
+
+        before = [r for r in self._students.get(student_id, []) if r[2] != rotation_id]
+        result.overlaps = [other for s, e, other in before if s <= end and e >= start]
+        after = sorted(before + [(start, end, rotation_id)])
+        old_gaps = set(_timeline_gaps(self._students.get(student_id, []), rest_days))
+        result.gaps = [g for g in _timeline_gaps(after, rest_days) if g not in old_gaps]
+
+        if capacity is not None:
+            rotations = self._services.get(service_id, [])
+            # Sorted by first day: an intersecting rotation starts by ``end`` and
+            # no earlier than its own length before ``start``
+            first = bisect_left(rotations, (start - self._longest.get(service_id, 0) + 1,))
+            limit = bisect_right(rotations, (end, _LAST_DAY, ""))
+            # Clipped to the new dates, where the occupancy is then exact
+            intervals = [(max(s, start), min(e, end)) for s, e, other in rotations[first:limit]
+                         if e >= start and other != rotation_id]
+            intervals.append((start, end))
+            result.overloads = overload_ranges(intervals, capacity)
+        return result
+
+
+_LAST_DAY = date.max.toordinal()
+
+
+def _timeline_gaps(timeline: Sequence[Tuple[int, int, str]], rest_days: int) -> List[Interval]:
+    """(latest last day, next first day) pairs more than ``rest_days`` apart"""
+    gaps = []
+    latest = None
+    for start, end, _ in timeline:
+        if latest is not None and start - latest > rest_days:
+            gaps.append((latest, start))
+        latest = end if latest is None else max(latest, end)
+    return gaps
@@ -0,0 +1,195 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .engine import EventScheduler, ProgressCallback
+from .occupancy import OccupancyIndex
+from .scoring import ScoringState
+
+# Scoring strategies understood by the kernel
+DEMAND_STRATEGY = "demand"  # CRUDPlanning: availability, urgency, demand, delay
+LOAD_STRATEGY = "load"      # AdvancedPlanningAlgorithm: load balancing
+
+# Solvers selectable on planning generation
+GREEDY_SOLVER = "greedy"  # Event-driven heuristic below
+EXACT_SOLVER = "exact"    # Makespan MILP seeded with the greedy result (see exact.py)
+SOLVERS = (GREEDY_SOLVER, EXACT_SOLVER)
+
+
+@dataclass(frozen=True)
+class SchedulingProblem:
+    """
+    Plain-data description of one greedy scheduling run.
+
+    Everything is a primitive or a tuple so that problems can be hashed, pickled
+    to worker processes and rebuilt without a database session.
+    """
+    student_ids: Tuple[str, ...]
+    service_ids: Tuple[str, ...]
+    durations: Tuple[int, ...]
+    capacities: Tuple[int, ...]
+    start_date: str  # YYYY-MM-DD, day 0 of every offset
+    rest_days: int   # Next start = end day + rest_days, at least the day after
+    max_delay: int = 365
+    max_backtracks: int = 0
+    strategy: str = DEMAND_STRATEGY
+    seed: Optional[int] = None  # Randomized tie-breaking for multi-start runs
+    time_limit: Optional[float] = None  # Seconds before a run stops with what it placed
+
+    def __post_init__(self):
+        # A student never starts a rotation on the day the previous one ends,
+        # even without break days (the exact solver blocks that day too)
+        object.__setattr__(self, "rest_days", max(self.rest_days, 1))
+
+    @property
+    def origin(self) -> datetime:
+        return datetime.strptime(self.start_date, "%Y-%m-%d")
+
+    def to_date(self, day: int) -> datetime:
+        """Convert a day offset back to a date"""
+        return self.origin + timedelta(days=day)
+
+
+# (student index, service index, start day, end day), days inclusive
+RotationTuple = Tuple[int, int, int, int]
+# (service id, start day, end day) of a rotation left in place by a repair
+KeptRotation = Tuple[str, int, int]
+
+
+@dataclass
+class SchedulingResult:
+    """Compact output of the kernel"""
+    rotations: List[RotationTuple] = field(default_factory=list)
+    missing: List[Tuple[int, int]] = field(default_factory=list)
+    backtracks: int = 0
+    deferrals: int = 0
+    truncated: bool = False  # Stopped by the time limit before placing everything
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+    @property
+    def makespan(self) -> int:
+        """Number of days from day 0 to the last rotation end"""
+        return max((r[3] for r in self.rotations), default=-1) + 1
+
+
+def schedule(problem: SchedulingProblem, progress: Optional[ProgressCallback] = None) -> SchedulingResult:
+    """Run the greedy event-driven scheduler on a plain problem description"""
+    occupancy = OccupancyIndex(problem.origin)
+    for service_id, capacity in zip(problem.service_ids, problem.capacities):
+        occupancy.add_service(service_id, capacity)
+    return _run(problem, occupancy, start_day=0, progress=progress)
+
+
+def schedule_shared(problems: Sequence[SchedulingProblem]) -> List[SchedulingResult]:
+    """
+    Schedule several cohorts against one shared occupancy index.
+
+    Services are matched by id across problems, so a service used by two
+    promotions never hosts more than its capacity in total. Cohorts are placed in
+    start-date order, each one seeing the places already taken by the previous
+    ones; results are returned in the order of ``problems`` with days relative to
+    each problem's own start date.
+    """
+    if not problems:
+        return []
+    origin = min(problem.origin for problem in problems)
+    occupancy = OccupancyIndex(origin)
+    capacities: Dict[str, int] = {}
+    for problem in problems:
+        for service_id, capacity in zip(problem.service_ids, problem.capacities):
+            capacities[service_id] = min(capacity, capacities.get(service_id, capacity))
+    for service_id, capacity in capacities.items():
+        occupancy.add_service(service_id, capacity)
+
+    results: List[Optional[SchedulingResult]] = [None] * len(problems)
+    for index in sorted(range(len(problems)), key=lambda i: problems[i].start_date):
+        offset = (problems[index].origin - origin).days
+        results[index] = _run(problems[index], occupancy, start_day=offset)
+    return results
+
+
+def repair(
+    problem: SchedulingProblem,
+    kept: Iterable[KeptRotation],
+    completed: Optional[Dict[str, Iterable[str]]] = None,
+    ready_days: Optional[Dict[str, int]] = None,
+) -> SchedulingResult:
+    """
+    Schedule the services still missing for a few students around a kept planning.
+
+    ``kept`` rotations, whoever they belong to, are reserved first so that the new
+    ones fit in the places left. ``completed`` maps a student id to the services it
+    already has and ``ready_days`` to its first free day. Only the new rotations
+    are returned; ``missing`` lists what could not be placed.
+    """
+    occupancy = OccupancyIndex(problem.origin)
+    for service_id, capacity in zip(problem.service_ids, problem.capacities):
+        occupancy.add_service(service_id, capacity)
+    for service_id, start_day, end_day in kept:
+        if service_id in problem.service_ids:
+            occupancy.reserve(service_id, start_day, end_day - start_day + 1)
+    return _run(problem, occupancy, start_day=0,
+                completed=completed, ready_days=ready_days)
+
+
+def _run(
+    problem: SchedulingProblem,
+    occupancy: OccupancyIndex,
+    start_day: int,
+    completed: Optional[Dict[str, Iterable[str]]] = None,
+    ready_days: Optional[Dict[str, int]] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> SchedulingResult:
+    """Place one problem's students on ``occupancy`` from ``start_day`` (its day 0)"""
+    scoring = ScoringState(
+        problem.service_ids, len(problem.student_ids),
+        capacities=problem.capacities, durations=problem.durations)
+
+    def load_score(index, start_day, free_places, completed_count, days_delay):
+        service_id = problem.service_ids[index]
+        return scoring.load_score(
+            problem.capacities[index], problem.durations[index],
+            occupancy.occupation(service_id, start_day), days_delay)
+
+    score = load_score if problem.strategy == LOAD_STRATEGY else None
+
+    scheduler = EventScheduler(
+        occupancy,
+        problem.student_ids,
+        problem.service_ids,
+        problem.durations,
+        rest_days=problem.rest_days,
+        max_delay=problem.max_delay,
+        scoring=scoring,
+        score=score,
+        max_backtracks=problem.max_backtracks,
+        start_day=start_day,
+        completed={sid: set(done) for sid, done in (completed or {}).items()},
+        ready_days=ready_days,
+        progress=progress,
+        seed=problem.seed,
+        deadline=time.monotonic() + problem.time_limit if problem.time_limit is not None else None,
+    )
+    assignments = scheduler.run()
+
+    student_index = {sid: i for i, sid in enumerate(problem.student_ids)}
+    service_index = {sid: i for i, sid in enumerate(problem.service_ids)}
+    result = SchedulingResult(
+        rotations=[
+            (student_index[a.student_id], service_index[a.service_id],
+             a.start_day - start_day, a.end_day - start_day)
+            for a in assignments
+        ],
+        backtracks=scheduler.backtracks,
+        deferrals=scheduler.deferrals,
+        truncated=scheduler.truncated,
+    )
+    for i, sid in enumerate(problem.student_ids):
+        done = scheduler.completed[sid]
+        result.missing.extend(
+            (i, j) for j, service_id in enumerate(problem.service_ids) if service_id not in done)
+    return result
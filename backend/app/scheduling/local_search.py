@@ -0,0 +1,326 @@
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .kernel import SchedulingProblem, SchedulingResult
+from .occupancy import OccupancyIndex
+
+logger = logging.getLogger(__name__)
+
+# Default wall-clock budget of the improvement phase
+LOCAL_SEARCH_BUDGET_SECONDS = 5.0
+
+# Earlier free places tried per rotation when reordering around them
+RELOCATE_CANDIDATES = 4
+# Rotations of the same service tried as swap partners per rotation
+SWAP_CANDIDATES = 8
+# Passes over the critical students without improvement before giving up
+MAX_IDLE_PASSES = 3
+
+_NO_LIMIT = 1 << 30
+
+
+class _Timeline:
+    """
+    Mutable copy of a kernel result with the occupancy of every service.
+
+    Moves are journaled so that a trial (several moves) can be rolled back when
+    it does not improve the objective.
+    """
+
+    def __init__(self, problem: SchedulingProblem, result: SchedulingResult):
+        self.problem = problem
+        self.rest = problem.rest_days
+        self.students: List[int] = [r[0] for r in result.rotations]
+        self.services: List[int] = [r[1] for r in result.rotations]
+        self.starts: List[int] = [r[2] for r in result.rotations]
+        self.by_student: Dict[int, List[int]] = {}
+        for k, student in enumerate(self.students):
+            self.by_student.setdefault(student, []).append(k)
+
+        self.occupancy = OccupancyIndex(problem.origin)
+        for service_id, capacity in zip(problem.service_ids, problem.capacities):
+            self.occupancy.add_service(service_id, capacity)
+        for k in range(len(self.starts)):
+            self.occupancy.reserve(self._service_id(k), self.starts[k], self._duration(k))
+
+        self.last_end = {s: max(self.end(k) for k in ks) for s, ks in self.by_student.items()}
+        self.journal: List[Tuple[int, int]] = []
+
+    def _service_id(self, k: int) -> str:
+        return self.problem.service_ids[self.services[k]]
+
+    def _duration(self, k: int) -> int:
+        return self.problem.durations[self.services[k]]
+
+    def end(self, k: int) -> int:
+        return self.starts[k] + self._duration(k) - 1
+
+    # ------------------------------------------------------------------
+    # Objective: makespan, students finishing on the last day, sum of finishes
+    # ------------------------------------------------------------------
+    def objective(self) -> Tuple[int, int, int]:
+        last = max(self.last_end.values(), default=-1)
+        critical = sum(1 for end in self.last_end.values() if end == last)
+        return last + 1, critical, sum(self.last_end.values())
+
+    def _refresh(self, student: int):
+        self.last_end[student] = max(self.end(k) for k in self.by_student[student])
+
+    # ------------------------------------------------------------------
+    # Moves
+    # ------------------------------------------------------------------
+    def lift(self, k: int):
+        """Free the places of a rotation before looking for a new start"""
+        self.occupancy.release(self._service_id(k), self.starts[k], self._duration(k))
+
+    def drop(self, k: int, start: int):
+        """Put a lifted rotation back at ``start``"""
+        self.journal.append((k, self.starts[k]))
+        self.starts[k] = start
+        self.occupancy.reserve(self._service_id(k), start, self._duration(k))
+        self._refresh(self.students[k])
+
+    def rollback(self, mark: int):
+        """Undo the moves journaled after ``mark``"""
+        while len(self.journal) > mark:
+            k, previous = self.journal.pop()
+            self.occupancy.release(self._service_id(k), self.starts[k], self._duration(k))
+            self.starts[k] = previous
+            self.occupancy.reserve(self._service_id(k), previous, self._duration(k))
+            self._refresh(self.students[k])
+
+    def fits_student(self, k: int, start: int, ignore: Set[int] = frozenset()) -> bool:
+        """Whether the student of ``k`` is free (rest days included) for ``k`` at ``start``"""
+        end = start + self._duration(k) - 1
+        for q in self.by_student[self.students[k]]:
+            if q == k or q in ignore:
+                continue
+            if not (start >= self.end(q) + self.rest or self.starts[q] >= end + self.rest):
+                return False
+        return True
+
+    def earliest(self, k: int, limit: int, ignore: Set[int] = frozenset()) -> Optional[int]:
+        """
+        Earliest start <= ``limit`` of the lifted rotation ``k`` that fits both the
+        free places of its service and the gaps of its student's timeline.
+        """
+        duration = self._duration(k)
+        service_id = self._service_id(k)
+        # Starting after the current makespan can never improve the objective
+        limit = min(limit, max(self.last_end.values()) + 1)
+        others = sorted(
+            (self.starts[q], self.end(q)) for q in self.by_student[self.students[k]]
+            if q != k and q not in ignore)
+        lo = 0
+        for other_start, other_end in others + [(_NO_LIMIT, _NO_LIMIT)]:
+            hi = min(other_start - self.rest - duration + 1, limit)
+            if hi >= lo:
+                start = self.occupancy.earliest_start(service_id, lo, duration, hi - lo)
+                if start is not None:
+                    return start
+            lo = max(lo, other_end + self.rest)
+            if lo > limit:
+                break
+        return None
+
+    def free_starts(self, k: int, limit: int, count: int) -> List[int]:
+        """Up to ``count`` starts <= ``limit`` with a free place, ignoring the student"""
+        self.lift(k)
+        try:
+            starts = []
+            lo = 0
+            while len(starts) < count and lo <= limit:
+                start = self.occupancy.earliest_start(
+                    self._service_id(k), lo, self._duration(k), limit - lo)
+                if start is None:
+                    break
+                starts.append(start)
+                lo = start + self._duration(k)
+            return starts
+        finally:
+            self.occupancy.reserve(self._service_id(k), self.starts[k], self._duration(k))
+
+    def shift_left(self, k: int) -> bool:
+        """Move a rotation to its earliest feasible start before the current one"""
+        self.lift(k)
+        start = self.earliest(k, self.starts[k] - 1)
+        if start is None:
+            self.occupancy.reserve(self._service_id(k), self.starts[k], self._duration(k))
+            return False
+        self.drop(k, start)
+        return True
+
+    def to_result(self, result: SchedulingResult) -> SchedulingResult:
+        rotations = sorted(
+            ((self.students[k], self.services[k], self.starts[k], self.end(k))
+             for k in range(len(self.starts))),
+            key=lambda r: (r[2], r[0], r[1]))
+        return SchedulingResult(
+            rotations=rotations, missing=list(result.missing),
+            backtracks=result.backtracks, deferrals=result.deferrals, truncated=result.truncated)
+
+
+def improve(
+    problem: SchedulingProblem,
+    result: SchedulingResult,
+    time_budget: float = LOCAL_SEARCH_BUDGET_SECONDS,
+    seed: int = 0,
+    lower_bound: int = 0,
+) -> SchedulingResult:
+    """
+    Compress a planning with local moves until ``time_budget`` seconds are spent.
+
+    * shift: move a rotation to the earliest start with a free place and a free
+      gap in its student's timeline, possibly before another of its rotations;
+    * reorder: lift a critical rotation and another one of the same student,
+      place the critical one as early as possible, then the other one;
+    * swap: give a rotation an earlier place held by another student in the
+      same service, then place that student's rotation again.
+
+    Moves only target students finishing on the last day and are kept when they
+    lower (makespan, students finishing on the last day, sum of finish days).
+    Capacity and rest days are checked incrementally, so the planning stays
+    valid after every accepted move.
+    """
+    if not result.rotations:
+        return result
+    deadline = time.monotonic() + time_budget
+    rng = random.Random(seed)
+    timeline = _Timeline(problem, result)
+    initial = timeline.objective()
+
+    def compact(rotations: List[int]):
+        moved = True
+        while moved and time.monotonic() < deadline:
+            moved = False
+            for k in sorted(rotations, key=lambda k: timeline.starts[k]):
+                moved |= timeline.shift_left(k)
+
+    compact(list(range(len(timeline.starts))))
+
+    idle_passes = 0
+    while idle_passes < MAX_IDLE_PASSES and time.monotonic() < deadline:
+        makespan = timeline.objective()[0]
+        if makespan <= lower_bound:
+            break
+        critical = [s for s, end in timeline.last_end.items() if end == makespan - 1]
+        rng.shuffle(critical)
+        idle_passes += 1
+        for student in critical:
+            if time.monotonic() >= deadline:
+                break
+            if _try_student(timeline, student, rng, compact):
+                idle_passes = 0
+
+    final = timeline.objective()
+    if final >= initial:
+        return result
+    logger.info(
+        f"🧭 Local search: makespan {initial[0]} → {final[0]} days, "
+        f"finish days {initial[2]} → {final[2]}")
+    return timeline.to_result(result)
+
+
+def _try_student(timeline: _Timeline, student: int, rng: random.Random, compact) -> bool:
+    """Try the moves on one student finishing on the last day; True if one was kept"""
+    before = timeline.objective()
+    rotations = sorted(timeline.by_student[student], key=lambda k: timeline.starts[k])
+    last = rotations[-1]
+
+    # Shift (and implicit reorder into an earlier gap)
+    mark = len(timeline.journal)
+    if timeline.shift_left(last):
+        compact(rotations)
+        if timeline.objective() < before:
+            return True
+        timeline.rollback(mark)
+
+    # Reorder: the last rotation goes first, another one takes what is left
+    for other in reversed(rotations[:-1]):
+        mark = len(timeline.journal)
+        timeline.lift(last)
+        timeline.lift(other)
+        start = timeline.earliest(last, timeline.starts[last] - 1, ignore={other})
+        if start is not None:
+            timeline.drop(last, start)
+            other_start = timeline.earliest(other, _NO_LIMIT)
+            if other_start is not None:
+                timeline.drop(other, other_start)
+                compact(rotations)
+                if timeline.objective() < before:
+                    return True
+            else:
+                timeline.occupancy.reserve(
+                    timeline._service_id(other), timeline.starts[other], timeline._duration(other))
+            timeline.rollback(mark)
+            continue
+        timeline.occupancy.reserve(
+            timeline._service_id(last), timeline.starts[last], timeline._duration(last))
+        timeline.occupancy.reserve(
+            timeline._service_id(other), timeline.starts[other], timeline._duration(other))
+
+    # Reorder around a free place: the rotation takes an earlier free place of
+    # its service and the student's rotations clashing with it are placed again
+    for rotation in reversed(rotations):
+        for start in timeline.free_starts(rotation, timeline.starts[rotation] - 1, RELOCATE_CANDIDATES):
+            mark = len(timeline.journal)
+            end = start + timeline._duration(rotation) - 1
+            clashing = [k for k in rotations if k != rotation and not (
+                start >= timeline.end(k) + timeline.rest or timeline.starts[k] >= end + timeline.rest)]
+            timeline.lift(rotation)
+            for k in clashing:
+                timeline.lift(k)
+            timeline.drop(rotation, start)
+            placed = True
+            waiting = set(clashing)
+            for k in sorted(clashing, key=lambda k: timeline.starts[k]):
+                waiting.discard(k)
+                new_start = timeline.earliest(k, _NO_LIMIT, ignore=waiting)
+                if new_start is None:
+                    placed = False
+                    break
+                timeline.drop(k, new_start)
+            if placed:
+                compact(rotations)
+                if timeline.objective() < before:
+                    return True
+            # Rotations left lifted are put back before the journal is undone
+            for k in clashing:
+                if not any(moved == k for moved, _ in timeline.journal[mark:]):
+                    timeline.occupancy.reserve(
+                        timeline._service_id(k), timeline.starts[k], timeline._duration(k))
+            timeline.rollback(mark)
+
+    # Swap: take an earlier place held by another student, who is placed again
+    for rotation in reversed(rotations):
+        service = timeline.services[rotation]
+        candidates = [k for k in range(len(timeline.starts))
+                      if timeline.services[k] == service and timeline.students[k] != student
+                      and timeline.starts[k] < timeline.starts[rotation]]
+        rng.shuffle(candidates)
+        for other in candidates[:SWAP_CANDIDATES]:
+            mark = len(timeline.journal)
+            timeline.lift(rotation)
+            timeline.lift(other)
+            start = timeline.earliest(rotation, timeline.starts[rotation] - 1)
+            if start is None:
+                timeline.occupancy.reserve(
+                    timeline._service_id(rotation), timeline.starts[rotation], timeline._duration(rotation))
+                timeline.occupancy.reserve(
+                    timeline._service_id(other), timeline.starts[other], timeline._duration(other))
+                continue
+            timeline.drop(rotation, start)
+            other_start = timeline.earliest(other, _NO_LIMIT)
+            if other_start is None:
+                timeline.occupancy.reserve(
+                    timeline._service_id(other), timeline.starts[other], timeline._duration(other))
+                timeline.rollback(mark)
+                continue
+            timeline.drop(other, other_start)
+            compact(timeline.by_student[timeline.students[other]] + rotations)
+            if timeline.objective() < before:
+                return True
+            timeline.rollback(mark)
+    return False
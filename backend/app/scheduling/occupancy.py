@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class OccupancyIndex:
+    """
+    Daily occupancy of each service, indexed by day offset from the planning start.
+
+    Occupancy is kept in a services x days integer matrix where cell ``[row, d]``
+    holds the number of students present in the service on ``origin + d days``.
+    Windows are checked with range-max and cumulative-sum queries instead of
+    formatting one date string per day, and the earliest feasible start of many
+    services can be computed in a single batched call.
+    """
+
+    def __init__(self, origin: datetime, horizon_days: int = 366):
+        self.origin = origin
+        self._counts = np.zeros((0, max(1, horizon_days)), dtype=np.int32)
+        self._capacity = np.zeros(0, dtype=np.int32)
+        self._rows: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Services and dates
+    # ------------------------------------------------------------------
+    def add_service(self, service_id: str, capacity: int):
+        """Register a service with its effective concurrent capacity"""
+        row = self._rows.get(service_id)
+        if row is None:
+            row = len(self._rows)
+            self._rows[service_id] = row
+            self._counts = np.vstack(
+                [self._counts, np.zeros((1, self._counts.shape[1]), dtype=np.int32)])
+            self._capacity = np.append(self._capacity, np.int32(0))
+        self._capacity[row] = capacity
+
+    def capacity(self, service_id: str) -> int:
+        return int(self._capacity[self._rows[service_id]])
+
+    def day_offset(self, date: datetime) -> int:
+        """Convert a date to its day offset from the planning start"""
+        return (date - self.origin).days
+
+    def to_date(self, day: int) -> datetime:
+        """Convert a day offset back to a date"""
+        return self.origin + timedelta(days=int(day))
+
+    def _ensure(self, end: int):
+        """Grow the matrix so that column ``end`` is addressable"""
+        width = self._counts.shape[1]
+        if end >= width:
+            new_width = max(end + 1, 2 * width)
+            grown = np.zeros((self._counts.shape[0], new_width), dtype=np.int32)
+            grown[:, :width] = self._counts
+            self._counts = grown
+
+    def _window(self, rows: np.ndarray, start: int, width: int) -> np.ndarray:
+        """Occupancy of ``rows`` over ``width`` days from ``start``, zero-padded"""
+        window = np.zeros((len(rows), width), dtype=np.int32)
+        lo = max(start, 0)
+        hi = min(start + width, self._counts.shape[1])
+        if lo < hi:
+            window[:, lo - start:hi - start] = self._counts[rows, lo:hi]
+        return window
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def occupation(self, service_id: str, day: int) -> int:
+        """Number of students in the service on a given day"""
+        if 0 <= day < self._counts.shape[1]:
+            return int(self._counts[self._rows[service_id], day])
+        return 0
+
+    def range_max(self, service_id: str, start: int, duration: int) -> int:
+        """Highest occupancy over ``duration`` days starting at ``start``"""
+        lo = max(start, 0)
+        hi = min(start + duration, self._counts.shape[1])
+        if lo >= hi:
+            return 0
+        return int(self._counts[self._rows[service_id], lo:hi].max())
+
+    def is_available(self, service_id: str, start: int, duration: int) -> bool:
+        """Check if the service has a free place for the entire window"""
+        return self.range_max(service_id, start, duration) < self.capacity(service_id)
+
+    def mean_free(self, service_id: str, start: int, duration: int) -> float:
+        """Average number of free places per day over the window"""
+        return float(self.mean_free_many([service_id], [start], [duration])[0])
+
+    def mean_free_many(
+        self, service_ids: Sequence[str], starts: Sequence[int], durations: Sequence[int]
+    ) -> np.ndarray:
+        """Average number of free places per day for several (service, window) pairs"""
+        rows = np.fromiter((self._rows[s] for s in service_ids),
+                           dtype=np.intp, count=len(service_ids))
+        starts = np.asarray(starts, dtype=np.int64)
+        durations = np.asarray(durations, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros(0)
+        lo = int(starts.min())
+        width = int((starts + durations).max()) - lo
+        window = self._window(rows, lo, width)
+        cumulative = np.zeros((len(rows), width + 1), dtype=np.int64)
+        np.cumsum(window, axis=1, out=cumulative[:, 1:])
+        index = np.arange(len(rows))
+        occupied = cumulative[index, starts - lo + durations] - \
+            cumulative[index, starts - lo]
+        return self._capacity[rows] - occupied / durations
+
+    def earliest_start(
+        self, service_id: str, from_day: int, duration: int, max_delay: int
+    ) -> Optional[int]:
+        """Earliest start in ``[from_day, from_day + max_delay]`` with a free place, or None"""
+        start = int(self.earliest_starts(
+            [service_id], from_day, [duration], max_delay)[0])
+        return start if start >= 0 else None
+
+    def earliest_starts(
+        self, service_ids: Sequence[str], from_day: int, durations: Sequence[int], max_delay: int
+    ) -> np.ndarray:
+        """
+        Earliest feasible start of every service in ``[from_day, from_day + max_delay]``,
+        computed in one batched call; -1 marks services with no slot in the window.
+
+        Days where a service is full are flagged and prefix-summed along the day
+        axis, so a window starting at ``s`` is free exactly when the number of
+        full days in ``[s, s + duration)`` is zero.
+        """
+        rows = np.fromiter((self._rows[s] for s in service_ids),
+                           dtype=np.intp, count=len(service_ids))
+        durations = np.asarray(durations, dtype=np.intp)
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        width = max_delay + 1 + int(durations.max())
+        full = self._window(rows, from_day, width) >= \
+            self._capacity[rows][:, None]
+        full_before = np.zeros((len(rows), width + 1), dtype=np.int32)
+        np.cumsum(full, axis=1, out=full_before[:, 1:])
+
+        offsets = np.arange(max_delay + 1)
+        window_ends = np.take_along_axis(
+            full_before, offsets[None, :] + durations[:, None], axis=1)
+        feasible = (window_ends - full_before[:, :max_delay + 1]) == 0
+        feasible &= (self._capacity[rows] > 0)[:, None]
+
+        first = feasible.argmax(axis=1)
+        return np.where(feasible.any(axis=1), from_day + first, -1)
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+    def reserve(self, service_id: str, start: int, duration: int):
+        """Occupy one place in the service for the window"""
+        self._ensure(start + duration - 1)
+        self._counts[self._rows[service_id], start:start + duration] += 1
+
+    def release(self, service_id: str, start: int, duration: int):
+        """Free one place in the service for the window"""
+        lo = max(start, 0)
+        hi = min(start + duration, self._counts.shape[1])
+        if lo < hi:
+            window = self._counts[self._rows[service_id], lo:hi]
+            window -= (window > 0).astype(np.int32)
+
+    def peak(self, service_id: str) -> int:
+        """Highest daily occupancy recorded for the service"""
+        return int(self._counts[self._rows[service_id]].max())
+
+    def service_ids(self) -> List[str]:
+        return list(self._rows)
@@ -0,0 +1,140 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import replace
+from typing import List, Optional, Sequence
+
+from .bounds import problem_bounds
+from .exact import EXACT_TIME_LIMIT_SECONDS, solve_exact
+from .engine import ProgressCallback
+from .kernel import EXACT_SOLVER, GREEDY_SOLVER, SchedulingProblem, SchedulingResult, schedule
+
+logger = logging.getLogger(__name__)
+
+# Default wall-clock budget of a multi-start run
+MULTISTART_BUDGET_SECONDS = 10.0
+
+# Pools are created from request threads and job worker threads: a forked child
+# of such a multithreaded process copies the locks other threads hold at that
+# moment and can wait on one forever, so workers come from a clean process
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+
+def solve(
+    problem: SchedulingProblem, solver: str = GREEDY_SOLVER, lower_bound: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> SchedulingResult:
+    """
+    Run the greedy kernel, then the exact makespan MILP when requested; both
+    share the problem's ``time_limit``
+    """
+    started = time.monotonic()
+    result = schedule(problem, progress)
+    time_limit = EXACT_TIME_LIMIT_SECONDS
+    if problem.time_limit is not None:
+        time_limit = min(time_limit, problem.time_limit - (time.monotonic() - started))
+    return refine(problem, result, solver, lower_bound, time_limit)
+
+
+def refine(
+    problem: SchedulingProblem, result: SchedulingResult, solver: str = GREEDY_SOLVER,
+    lower_bound: Optional[int] = None, time_limit: float = EXACT_TIME_LIMIT_SECONDS,
+) -> SchedulingResult:
+    """Improve a greedy result with the exact solver when requested"""
+    if solver != EXACT_SOLVER:
+        return result
+    if result.truncated or time_limit <= 0:
+        logger.info("⏱️  No time left for the exact solver")
+        return result
+
+    if lower_bound is None:
+        lower_bound = problem_bounds(problem).lower_bound
+    if result.complete and result.makespan <= lower_bound:
+        logger.info("🎯 Greedy planning already reaches the makespan lower bound")
+        return result
+    exact = solve_exact(problem, result, time_limit=time_limit, lower_bound=lower_bound)
+    if exact is not None and exact.makespan < result.makespan:
+        logger.info(
+            f"🎯 Exact solver shortened the planning: {result.makespan} → {exact.makespan} days")
+        return exact
+    logger.info("🎯 Exact solver kept the greedy planning")
+    return result
+
+
+def _solve_packed(args) -> SchedulingResult:
+    return solve(*args)
+
+
+def solve_many(
+    problems: Sequence[SchedulingProblem],
+    solver: str = GREEDY_SOLVER,
+    max_workers: Optional[int] = None,
+) -> List[SchedulingResult]:
+    """
+    Solve independent problems (e.g. the years of a promotion) in a process pool.
+
+    Results come back in the order of ``problems``. A single problem, or a single
+    available CPU, is solved in-process to avoid the pool start-up cost.
+    """
+    workers = min(len(problems), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [solve(problem, solver) for problem in problems]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT) as pool:
+        return list(pool.map(_solve_packed, [(problem, solver) for problem in problems]))
+
+
+def _schedule_until(problem: SchedulingProblem, wall_deadline: float) -> SchedulingResult:
+    """Kernel run in a worker, limited to the time left before ``wall_deadline``"""
+    return schedule(replace(problem, time_limit=max(0.0, wall_deadline - time.time())))
+
+
+def multistart(
+    problem: SchedulingProblem,
+    starts: int,
+    time_budget: float = MULTISTART_BUDGET_SECONDS,
+    max_workers: Optional[int] = None,
+    lower_bound: Optional[int] = None,
+) -> List[SchedulingResult]:
+    """
+    Run the deterministic kernel plus ``starts - 1`` seeded variants in parallel.
+
+    The deterministic run is done in-process first so that at least one result
+    is always returned; seeded runs still going when ``time_budget`` seconds
+    have elapsed are abandoned (they stop by themselves through their
+    ``time_limit``), and none are started when the deterministic run already
+    reaches ``lower_bound``. Results are returned in completion order.
+    """
+    deadline = time.monotonic() + time_budget
+    results = [schedule(problem)]
+    if lower_bound is not None and results[0].complete and results[0].makespan <= lower_bound:
+        logger.info("🎯 Greedy planning already reaches the makespan lower bound")
+        return results
+    seeds = list(range(1, starts))
+    workers = min(len(seeds), max_workers or os.cpu_count() or 1)
+    if not seeds or workers <= 0 or time.monotonic() >= deadline:
+        return results
+
+    # Running workers cannot be cancelled: each seeded run stops by itself at
+    # the end of the budget (wall clock, shared with the worker processes)
+    wall_deadline = time.time() + (deadline - time.monotonic())
+    if problem.time_limit is not None:
+        wall_deadline = min(wall_deadline, time.time() + problem.time_limit)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_MP_CONTEXT)
+    try:
+        pending = {pool.submit(_schedule_until, replace(problem, seed=seed), wall_deadline)
+                   for seed in seeds}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            results.extend(future.result() for future in done)
+        if pending:
+            logger.info(
+                f"⏱️  Multi-start budget spent: {len(results)}/{starts} runs finished")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
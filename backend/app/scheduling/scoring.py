@@ -0,0 +1,99 @@
+from typing import Dict, Optional, Sequence
+
+# Weights of the greedy assignment score
+AVAILABILITY_WEIGHT = 0.3
+URGENCY_WEIGHT = 0.4
+DEMAND_WEIGHT = 0.2
+DELAY_WEIGHT = 0.1
+
+
+class ScoringState:
+    """
+    Incremental state behind the assignment scores.
+
+    Keeps one assignment counter per service so that the demand score is O(1)
+    instead of a scan over every student's completed services. Callers record an
+    assignment when it is made and unrecord it when it is backtracked.
+    """
+
+    def __init__(
+        self,
+        service_ids: Sequence[str],
+        nb_students: int,
+        capacities: Optional[Sequence[int]] = None,
+        durations: Optional[Sequence[int]] = None,
+    ):
+        self.nb_students = nb_students
+        self.nb_services = len(service_ids)
+        self.target_assignments = nb_students
+        self.assignments: Dict[str, int] = {sid: 0 for sid in service_ids}
+        self.max_capacity = max(capacities or [1])
+        self.max_duration = max(durations or [1])
+
+    def record(self, service_id: str):
+        """Count a new assignment to the service"""
+        self.assignments[service_id] = self.assignments.get(service_id, 0) + 1
+
+    def unrecord(self, service_id: str):
+        """Forget an assignment removed by backtracking"""
+        if self.assignments.get(service_id, 0) > 0:
+            self.assignments[service_id] -= 1
+
+    def demand_score(self, service_id: str) -> float:
+        """Prefer services with fewer total assignments"""
+        target = self.target_assignments
+        assigned = self.assignments.get(service_id, 0)
+        if assigned < target:
+            return (target - assigned) / target
+        return 0.1  # Small score for overloaded services
+
+    def urgency_score(self, completed_count: int) -> float:
+        """Students with fewer completed services get priority"""
+        return (self.nb_services - completed_count) / self.nb_services
+
+    @staticmethod
+    def delay_penalty(days_delay: int, horizon: float = 30.0) -> float:
+        """Reduce score for delays approaching ``horizon`` days"""
+        return max(0, 1 - (days_delay / horizon))
+
+    def score(
+        self, service_id: str, availability_score: float, completed_count: int, days_delay: int
+    ) -> float:
+        """Combined score of a candidate (service, start) for a student"""
+        return (availability_score * AVAILABILITY_WEIGHT +
+                self.urgency_score(completed_count) * URGENCY_WEIGHT +
+                self.demand_score(service_id) * DEMAND_WEIGHT +
+                self.delay_penalty(days_delay) * DELAY_WEIGHT)
+
+    def load_score(
+        self, capacity: int, duration: int, current_occupation: int, days_delay: int
+    ) -> float:
+        """
+        Load-balancing score used by the advanced algorithm: favours free,
+        large-capacity and long services as well as bottlenecks and early dates.
+        """
+        max_capacity = self.max_capacity
+
+        # 1. Availability score (higher for less occupied services)
+        availability_score = (capacity - current_occupation) / capacity
+
+        # 2. Capacity score (favor services with more total capacity)
+        capacity_score = capacity / max_capacity
+
+        # 3. Urgency score (favor bottleneck services)
+        urgency_score = (max_capacity - capacity + 1) / max_capacity
+
+        # 4. Duration score (favor longer internships)
+        duration_score = duration / self.max_duration
+
+        # 5. Date penalty (prefer earlier dates)
+        date_penalty = self.delay_penalty(days_delay)
+
+        # Weighted final score
+        return (
+            availability_score * 0.35 +
+            capacity_score * 0.20 +
+            urgency_score * 0.20 +
+            duration_score * 0.10 +
+            date_penalty * 0.15
+        )
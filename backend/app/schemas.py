@@ -219,17 +219,144 @@ class MessageResponse(BaseModel):
     message: str
 
 
+class RotationUpdateResult(MessageResponse):
+    warnings: List[str] = []
+
+
 class IdResponse(BaseModel):
     id: str
     message: str
 
 
+class PlanningOptimality(BaseModel):
+    """Makespan of a planning (or of one year of it) against its lower bound"""
+    planning_id: str
+    promotion_year_id: Optional[str] = None
+    makespan_jours: int
+    borne_inferieure_jours: int
+    ecart_jours: int
+    ecart_relatif: float
+    service_goulot: Optional[str] = None
+
+
+class PlanningFeasibilityIssue(BaseModel):
+    """One reason why mandatory completion is impossible"""
+    code: str
+    message: str
+    service_id: Optional[str] = None
+    jours_requis: Optional[int] = None
+    nb_etudiants_bloques: int = 0
+
+
+class PlanningFeasibilityDiagnosis(BaseModel):
+    """Pre-flight feasibility analysis of a planning generation"""
+    is_feasible: bool
+    borne_inferieure_jours: int
+    horizon_jours: Optional[int] = None
+    problemes: List[PlanningFeasibilityIssue]
+    etudiants_bloques: List[str]
+    duree_analyse_ms: float
+
+
+class PlanningRepairResult(BaseModel):
+    """Diff applied by an incremental repair of a planning"""
+    planning_id: str
+    date_reference: str
+    etudiants_replanifies: List[str]
+    etudiants_incomplets: List[str]
+    rotations_figees: int
+    rotations_conservees: int
+    rotations_supprimees: int
+    rotations_ajoutees: int
+    duree_ms: float
+
+
+class UnscheduledPair(BaseModel):
+    """A service a student still has to do after the generation"""
+    etudiant_id: str
+    service_id: str
+    promotion_year_id: Optional[str] = None
+
+
 class PlanningResponse(BaseModel):
     message: str
     planning: Optional[Planning] = None
     plannings: Optional[List[Planning]] = None
     number_of_services: int
     number_of_students: int
+    optimalite: Optional[PlanningOptimality] = None
+    optimalites: Optional[List[PlanningOptimality]] = None
+    # True when some students miss services, e.g. once time_budget_ms ran out
+    partiel: bool = False
+    paires_non_planifiees: List[UnscheduledPair] = []
+
+
+class PlanningJob(BaseModel):
+    """Background planning generation, polled until it is done"""
+    id: str
+    type: str
+    statut: str  # en_attente, en_cours, termine, echoue
+    progression: float  # Percent of the rotation target reached
+    rotations_planifiees: int
+    rotations_cible: int
+    retours_arriere: int = 0  # Backtracks seen so far
+    duree_ms: Optional[float] = None
+    date_creation: datetime
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+    resultat: Optional[PlanningResponse] = None
+    erreur: Optional[Any] = None
+    code_erreur: Optional[int] = None
+
+
+class PlanningScenario(BaseModel):
+    """What-if overrides; unset values keep the current settings and places"""
+    nom: str
+    max_concurrent_students: Optional[int] = None
+    break_days_between_rotations: Optional[int] = None
+    places_disponibles: Dict[str, int] = {}  # service_id -> places
+    date_debut: Optional[str] = None
+
+
+class PlanningSimulationRequest(BaseModel):
+    promo_id: str
+    promotion_year_id: Optional[str] = None  # Defaults to the active year
+    date_debut: Optional[str] = None
+    scenarios: List[PlanningScenario]
+
+
+class ServiceSimulationStats(BaseModel):
+    service_id: str
+    service_nom: str
+    capacite: int
+    pic_occupation: int
+    taux_occupation: float
+
+
+class PlanningScenarioResult(BaseModel):
+    nom: str
+    is_feasible: bool
+    erreur: Optional[str] = None
+    makespan_jours: Optional[int] = None
+    date_debut: Optional[str] = None
+    date_fin: Optional[str] = None
+    borne_inferieure_jours: int = 0
+    ecart_jours: Optional[int] = None
+    nb_rotations: int = 0
+    taux_completion: float = 0.0
+    etudiants_complets: int = 0
+    etudiants_incomplets: List[str] = []
+    occupation_services: List[ServiceSimulationStats] = []
+
+
+class PlanningSimulationResponse(BaseModel):
+    """Dry-run results: nothing is persisted"""
+    promo_id: str
+    promotion_year_id: str
+    nb_etudiants: int
+    nb_services: int
+    scenarios: List[PlanningScenarioResult]
+    duree_ms: float
 
 
 class StudentPlanningResponse(BaseModel):
@@ -258,9 +385,21 @@ class PlanningEfficiencyAnalysis(BaseModel):
     occupation_services: Dict[str, ServiceOccupationStats]
 
 
+class CapacityViolation(BaseModel):
+    """Days on which a service hosts more students than its places"""
+    service_id: str
+    service_nom: str
+    date_debut: str
+    date_fin: str
+    occupation_max: int
+    capacite: int
+
+
 class PlanningValidationResult(BaseModel):
     is_valid: bool
     erreurs: List[str]
+    warnings: List[str] = []
+    depassements_capacite: List[CapacityViolation] = []
 
 
 class AdvancedPlanningResponse(BaseModel):
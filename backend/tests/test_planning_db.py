@@ -0,0 +1,348 @@
+import os
+from datetime import date, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models as M
+from app.crud import planning
+
+
+# PostgreSQL database the SQL-only tests may drop and recreate the schema of
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+def _session(url):
+    """Session on a fresh full schema, dropped after the test"""
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def db():
+    """SQLite session with the full schema"""
+    yield from _session("sqlite://")
+
+
+@pytest.fixture
+def pg_db():
+    """PostgreSQL session with the full schema, skipped without TEST_DATABASE_URL"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    yield from _session(TEST_DATABASE_URL)
+
+
+def make_promotion(db, students_per_year=6, years=1, services_per_year=3, places=2):
+    """Promotion with one level per year, its own services and its own students"""
+    speciality = M.Speciality(nom="Soins", duree_annees=3)
+    db.add(speciality)
+    db.add(M.PlanningSettings(
+        academic_year_start="2025-01-01", total_duration_months=6,
+        max_concurrent_students=places, break_days_between_rotations=2, is_active=True))
+    db.flush()
+    promotion = M.Promotion(id="promo", nom="P1", annee=2025, speciality_id=speciality.id)
+    db.add(promotion)
+    for y in range(years):
+        services = [
+            M.Service(id=f"srv-{y}-{i}", nom=f"Service {y}.{i}", places_disponibles=places,
+                      duree_stage_jours=7 * (i + 1), speciality_id=speciality.id)
+            for i in range(services_per_year)]
+        db.add_all(services)
+        year = M.PromotionYear(
+            id=f"year-{y}", promotion_id=promotion.id, annee_niveau=y + 1,
+            annee_calendaire=2025 + y, is_active=(y == 0), date_debut=f"{2025 + y}-01-01")
+        year.services = services
+        db.add(year)
+        for k in range(students_per_year):
+            db.add(M.Etudiant(id=f"etu-{y}-{k}", nom=f"Nom{y}{k}", prenom="Prenom",
+                              promotion_id=promotion.id, annee_courante=y + 1))
+    db.commit()
+    return promotion
+
+
+def test_repair_keeps_other_year_students_out(db):
+    """Test that repairing one year's planning only re-plans that year's students"""
+    make_promotion(db, students_per_year=4, years=2)
+    plannings, _, _ = planning.generate_planning(
+        db, promo_id="promo", date_debut="2025-01-01", all_years_mode=True)
+    first_year = next(p for p in plannings if p.promotion_year_id == "year-0")
+
+    # A first-year student comes back without rotations
+    db.query(M.Rotation).filter(M.Rotation.etudiant_id == "etu-0-1").delete()
+    db.commit()
+
+    report = planning.repair_planning(db, db_planning=first_year, date_reference="2024-12-31")
+    assert report["etudiants_replanifies"] == ["etu-0-1"]
+    students = {r.etudiant_id for r in db.query(M.Rotation).filter(
+        M.Rotation.planning_id == first_year.id)}
+    assert students == {f"etu-0-{k}" for k in range(4)}
+
+
+def test_toggle_student_repairs_only_the_student_year(db):
+    """Test that a toggle with re-planning touches the plannings of the student's year only"""
+    from app.api.endpoints.promotions import toggle_student_status
+
+    make_promotion(db, students_per_year=4, years=2)
+    plannings, _, _ = planning.generate_planning(
+        db, promo_id="promo", date_debut="2025-01-01", all_years_mode=True)
+    versions = {p.promotion_year_id: p.version for p in plannings}
+
+    response = toggle_student_status("promo", "etu-1-0", replanifier=True, db=db)
+    assert response["message"].endswith("(1 planning(s) réparé(s))")
+    # Every planning of the promotion is bumped by the toggle, the repaired one again
+    bumps = {p.promotion_year_id: db.get(M.Planning, p.id).version - versions[p.promotion_year_id]
+             for p in plannings}
+    assert bumps == {"year-0": 1, "year-1": 2}
+    assert db.get(M.Etudiant, "etu-1-0").is_active is False
+
+
+def test_toggle_student_invalidates_cached_validations(db):
+    """Test that toggling a student changes the version of the promotion's plannings"""
+    from app.api.endpoints.promotions import toggle_student_status
+
+    make_promotion(db, students_per_year=4)
+    db_planning, _, _ = planning.generate_planning(db, promo_id="promo", date_debut="2025-01-01")
+    version = db_planning.version
+
+    toggle_student_status("promo", "etu-0-0", db=db)
+    db.refresh(db_planning)
+    assert db_planning.version == version + 1
+
+
+def test_combined_planning_honours_the_time_budget(db):
+    """Test that the combined all-years planning stops at its time budget and lists what is left"""
+    make_promotion(db, students_per_year=4, years=2)
+    years = db.query(M.PromotionYear).all()
+
+    db_planning, _, _ = planning.generate_planning_for_all_years(
+        db, promo_id="promo", date_debut="2025-01-01", promotion_years=years)
+    assert db_planning.paires_non_planifiees == []
+    complete = db.query(M.Rotation).filter(M.Rotation.planning_id == db_planning.id).count()
+
+    db_planning, _, _ = planning.generate_planning_for_all_years(
+        db, promo_id="promo", date_debut="2025-01-01", promotion_years=years,
+        time_budget_ms=1e-3)
+    assert db_planning.paires_non_planifiees
+    assert db.query(M.Rotation).filter(M.Rotation.planning_id == db_planning.id).count() \
+        + len(db_planning.paires_non_planifiees) == complete
+
+
+def test_simulation_changes_the_result_without_writing(db):
+    """Test that what-if scenarios change the planning computed but write nothing"""
+    from app.api.endpoints.plannings import simulate_planning
+    from app.schemas import PlanningScenario, PlanningSimulationRequest
+
+    make_promotion(db, students_per_year=8, places=1)
+    writes = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: writes.append(statement)
+                 if not statement.lstrip().upper().startswith("SELECT") else None)
+
+    response = simulate_planning(PlanningSimulationRequest(
+        promo_id="promo",
+        scenarios=[
+            PlanningScenario(nom="actuel"),
+            PlanningScenario(nom="plus de places", max_concurrent_students=3,
+                             places_disponibles={"srv-0-0": 3, "srv-0-1": 3, "srv-0-2": 3}),
+        ]), db=db)
+
+    current, more_places = response["scenarios"]
+    assert current["is_feasible"] and more_places["is_feasible"]
+    assert more_places["makespan_jours"] < current["makespan_jours"]
+    assert writes == []
+    assert db.query(M.Planning).count() == 0 and db.query(M.Rotation).count() == 0
+    assert db.get(M.Service, "srv-0-0").places_disponibles == 1
+
+
+def test_years_generated_in_parallel_match_sequential_generation(db, monkeypatch):
+    """Test that all-years generation gives the same rotations with and without the process pool"""
+    import sys
+    from app.scheduling import solve_many
+
+    make_promotion(db, students_per_year=5, years=3)
+    planning_module = sys.modules["app.crud.planning"]
+
+    def generated(max_workers):
+        monkeypatch.setattr(planning_module, "solve_many",
+                            lambda problems, solver: solve_many(problems, solver, max_workers=max_workers))
+        planning.generate_planning(
+            db, promo_id="promo", date_debut="2025-01-01", all_years_mode=True, use_cache=False)
+        return sorted(
+            (r.promotion_year_id, r.etudiant_id, r.service_id, r.date_debut, r.date_fin)
+            for r in db.query(M.Rotation))
+
+    sequential = generated(1)
+    assert len(sequential) == 3 * 5 * 3
+    assert generated(3) == sequential
+
+
+def test_bulk_inserted_planning_reads_back(db):
+    """Test that bulk-inserted rotations and schedules of a generated planning read back intact"""
+    from app.crud.bulk import bulk_insert_objects
+    from app.crud.student_schedule import student_schedule
+
+    make_promotion(db, students_per_year=5)
+    db_planning, _, _ = planning.generate_planning(db, promo_id="promo", date_debut="2025-01-01")
+    generated = db.query(M.Rotation).filter(M.Rotation.planning_id == db_planning.id).all()
+    assert len(generated) == 5 * 3
+    assert {(r.etudiant_id, r.service_id) for r in generated} == {
+        (f"etu-0-{k}", f"srv-0-{i}") for k in range(5) for i in range(3)}
+
+    # Copies in a second planning, in batches smaller than the row count
+    copy = M.Planning(promo_id="promo", promotion_year_id="year-0", annee_niveau=1)
+    db.add(copy)
+    db.flush()
+    columns = ("etudiant_id", "service_id", "date_debut", "date_fin", "ordre", "promotion_year_id")
+    transient = [M.Rotation(planning_id=copy.id, **{c: getattr(r, c) for c in columns})
+                 for r in generated]
+    assert bulk_insert_objects(db, transient, batch_size=4) == len(generated)
+    assert not any(r in db for r in transient)
+    db.commit()
+
+    copied = db.query(M.Rotation).filter(M.Rotation.planning_id == copy.id).all()
+    assert sorted(tuple(getattr(r, c) for c in columns) for r in copied) \
+        == sorted(tuple(getattr(r, c) for c in columns) for r in generated)
+    assert all(r.id for r in copied)
+
+    rotations_by_student = {}
+    for r in sorted(copied, key=lambda r: r.ordre):
+        rotations_by_student.setdefault(r.etudiant_id, []).append({
+            'id': r.id, 'service_id': r.service_id, 'service_nom': r.service_id,
+            'ordre': r.ordre, 'date_debut': r.date_debut, 'date_fin': r.date_fin})
+    created = student_schedule.create_many_from_planning(
+        db, planning_id=copy.id, rotations_by_student=rotations_by_student,
+        date_debut_planning="2025-01-01", date_fin_planning="2025-06-30")
+    assert created == 5
+
+    schedules = db.query(M.StudentSchedule).filter(M.StudentSchedule.planning_id == copy.id).all()
+    assert {s.etudiant_id for s in schedules} == set(rotations_by_student)
+    assert all(s.nb_services_total == 3 for s in schedules)
+    details = db.query(M.StudentScheduleDetail).all()
+    assert {d.rotation_id for d in details} == {r.id for r in copied}
+
+
+def test_database_validation_is_rejected_on_sqlite(db):
+    """Test that the SQL validation refuses SQLite instead of running PostgreSQL-only queries"""
+    from app.api.endpoints.plannings import validate_planning
+    from app.crud.rotation import rotation
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    make_promotion(db, students_per_year=3)
+    db_planning, _, _ = planning.generate_planning(db, promo_id="promo", date_debut="2025-01-01")
+
+    with pytest.raises(HTTPException) as error:
+        rotation.validate_all_assignments_in_database(db, planning_id=db_planning.id)
+    assert error.value.status_code == 400
+
+    request = Request({"type": "http", "headers": []})
+    with pytest.raises(HTTPException) as error:
+        validate_planning(db_planning.id, request, Response(), mode="sql", db=db)
+    assert error.value.status_code == 400
+    assert db.get(M.Planning, db_planning.id).validation_version is None
+
+    # A stored python result is neither served nor revalidated for the sql mode
+    response = Response()
+    assert validate_planning(db_planning.id, request, response, db=db)["is_valid"]
+    request = Request({"type": "http", "headers": [(b"if-none-match", response.headers["etag"].encode())]})
+    assert validate_planning(db_planning.id, request, Response(), db=db).status_code == 304
+    with pytest.raises(HTTPException) as error:
+        validate_planning(db_planning.id, request, Response(), mode="sql", db=db)
+    assert error.value.status_code == 400
+
+
+def test_database_validation_matches_interval_analysis(pg_db):
+    """Test that the SQL validation reports the same violations as the in-memory analysis"""
+    from app.crud.rotation import rotation
+
+    db = pg_db
+    make_promotion(db, students_per_year=4)
+    db_planning, _, _ = planning.generate_planning(db, promo_id="promo", date_debut="2025-01-01")
+    rotations = db.query(M.Rotation).filter(M.Rotation.planning_id == db_planning.id)
+    first = rotations.filter(M.Rotation.etudiant_id == "etu-0-0").order_by(M.Rotation.ordre).first()
+    last = rotations.filter(M.Rotation.etudiant_id == "etu-0-1").order_by(M.Rotation.ordre.desc()).first()
+
+    def shifted(day, days):
+        return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+    db.add_all([
+        # Overlap with the student's first rotation
+        M.Rotation(etudiant_id="etu-0-0", service_id="srv-0-2", planning_id=db_planning.id,
+                   promotion_year_id="year-0", date_debut=first.date_debut,
+                   date_fin=first.date_fin, ordre=99),
+        # Gap of a month after the student's last rotation
+        M.Rotation(etudiant_id="etu-0-1", service_id=last.service_id, planning_id=db_planning.id,
+                   promotion_year_id="year-0", date_debut=shifted(last.date_fin, 30),
+                   date_fin=shifted(last.date_fin, 36), ordre=99),
+    ])
+    # Overload: the generated planning fills two places
+    db.get(M.Service, "srv-0-0").places_disponibles = 1
+    db.commit()
+
+    in_memory = rotation.validate_all_assignments(db, planning_id=db_planning.id)
+    in_database = rotation.validate_all_assignments_in_database(db, planning_id=db_planning.id)
+
+    assert in_memory["erreurs"] and in_memory["warnings"] and in_memory["depassements_capacite"]
+    assert sorted(in_database["erreurs"]) == sorted(in_memory["erreurs"])
+    assert sorted(in_database["warnings"]) == sorted(in_memory["warnings"])
+    key = lambda v: (v["service_id"], v["date_debut"])  # noqa: E731
+    assert sorted(in_database["depassements_capacite"], key=key) \
+        == sorted(in_memory["depassements_capacite"], key=key)
+    for total in ("total_rotations", "total_students", "total_services"):
+        assert in_database[total] == in_memory[total]
+
+
+def test_all_years_without_plannable_year_keeps_previous_plannings(db):
+    """Test that all-years generation fails before deleting anything when no year can be planned"""
+    make_promotion(db, students_per_year=3, years=2)
+    planning.generate_planning(db, promo_id="promo", date_debut="2025-01-01", all_years_mode=True)
+    rotations = db.query(M.Rotation).count()
+
+    # Every student moves to a level the promotion has no year for
+    db.query(M.Etudiant).update({M.Etudiant.annee_courante: 9})
+    db.commit()
+    with pytest.raises(HTTPException) as error:
+        planning.generate_planning(
+            db, promo_id="promo", date_debut="2025-01-01", all_years_mode=True)
+    assert error.value.status_code == 400
+    assert db.query(M.Planning).count() == 2
+    assert db.query(M.Rotation).count() == rotations == 2 * 3 * 3
+
+
+def test_repair_moves_only_the_students_the_capacity_requires(db):
+    """Test that a student re-planned for capacity frees the places that flagged another one"""
+    make_promotion(db, students_per_year=3, services_per_year=2, places=1)
+    db_planning = M.Planning(id="plan", promo_id="promo", promotion_year_id="year-0", annee_niveau=1)
+    db.add(db_planning)
+
+    def on(day):
+        return (date(2025, 1, 1) + timedelta(days=day)).isoformat()
+
+    # srv-0-0 and srv-0-1 hold one student at a time
+    for ordre, (etudiant_id, service_id, start, end) in enumerate([
+            ("etu-0-0", "srv-0-0", 10, 20),
+            ("etu-0-1", "srv-0-0", 15, 21),  # Overlaps etu-0-0, which has to move anyway
+            ("etu-0-2", "srv-0-1", 22, 28),
+            ("etu-0-0", "srv-0-1", 22, 28),  # Overlaps etu-0-2, kept first
+            ("etu-0-2", "srv-0-0", 30, 36),
+            ("etu-0-1", "srv-0-1", 40, 46)]):
+        db.add(M.Rotation(etudiant_id=etudiant_id, service_id=service_id, planning_id="plan",
+                          promotion_year_id="year-0", date_debut=on(start), date_fin=on(end),
+                          ordre=ordre))
+    db.commit()
+
+    report = planning.repair_planning(db, db_planning=db_planning, date_reference="2025-01-05")
+    assert report["etudiants_replanifies"] == ["etu-0-0"]
+    assert report["rotations_supprimees"] == 2
+    assert db.query(M.Rotation).filter(M.Rotation.etudiant_id == "etu-0-1").count() == 2
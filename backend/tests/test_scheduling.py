@@ -0,0 +1,535 @@
+import pickle
+import time
+from dataclasses import replace
+from datetime import datetime
+
+from app.scheduling import (
+    LOAD_STRATEGY,
+    analyze,
+    makespan_bounds,
+    multistart,
+    EventScheduler,
+    IntervalIndex,
+    OccupancyIndex,
+    OverloadRange,
+    SchedulingProblem,
+    ScoringState,
+    diagnose,
+    improve,
+    overload_ranges,
+    peak_occupancy,
+    repair,
+    schedule,
+    schedule_shared,
+    solve_exact,
+    solve_many,
+)
+
+
+def test_occupancy_reserve_and_release():
+    """Test that reservations are counted per day offset and can be undone"""
+    occupancy = OccupancyIndex(datetime(2025, 1, 1), horizon_days=10)
+    occupancy.add_service("s1", 2)
+
+    occupancy.reserve("s1", 3, 5)
+    occupancy.reserve("s1", 5, 10)  # Grows past the initial horizon
+    assert occupancy.occupation("s1", 2) == 0
+    assert occupancy.occupation("s1", 5) == 2
+    assert occupancy.occupation("s1", 14) == 1
+    assert occupancy.range_max("s1", 0, 20) == 2
+    assert not occupancy.is_available("s1", 4, 3)
+
+    occupancy.release("s1", 5, 10)
+    assert occupancy.range_max("s1", 0, 20) == 1
+    assert occupancy.is_available("s1", 4, 3)
+
+
+def test_occupancy_earliest_start_skips_full_days():
+    """Test that the earliest start jumps past saturated days"""
+    occupancy = OccupancyIndex(datetime(2025, 1, 1))
+    occupancy.add_service("s1", 1)
+    occupancy.reserve("s1", 2, 3)   # Days 2-4 full
+    occupancy.reserve("s1", 7, 2)   # Days 7-8 full
+
+    assert occupancy.earliest_start("s1", 0, 2, max_delay=30) == 0
+    assert occupancy.earliest_start("s1", 1, 2, max_delay=30) == 5
+    assert occupancy.earliest_start("s1", 1, 3, max_delay=30) == 9
+    assert occupancy.earliest_start("s1", 1, 3, max_delay=5) is None
+    assert occupancy.to_date(9) == datetime(2025, 1, 10)
+
+
+def test_occupancy_earliest_starts_batched():
+    """Test the batched earliest-start search across several services"""
+    occupancy = OccupancyIndex(datetime(2025, 1, 1))
+    occupancy.add_service("a", 1)
+    occupancy.add_service("b", 2)
+    occupancy.add_service("c", 0)
+    occupancy.reserve("a", 0, 4)
+    occupancy.reserve("b", 1, 3)
+    occupancy.reserve("b", 2, 3)
+
+    starts = occupancy.earliest_starts(["a", "b", "c"], 0, [2, 3, 1], max_delay=10)
+    assert starts.tolist() == [4, 4, -1]
+    for service_id, duration, start in zip(["a", "b"], [2, 3], starts):
+        assert occupancy.earliest_start(service_id, 0, duration, 10) == start
+
+    free = occupancy.mean_free_many(["a", "b"], [0, 1], [2, 4])
+    assert free.tolist() == [0.0, 0.5]
+
+
+def test_scoring_state_demand_counters():
+    """Test that demand scores follow recorded and backtracked assignments"""
+    scoring = ScoringState(["a", "b"], nb_students=4)
+    assert scoring.demand_score("a") == 1.0
+
+    for _ in range(3):
+        scoring.record("a")
+    assert scoring.demand_score("a") == 0.25
+    scoring.record("a")
+    assert scoring.demand_score("a") == 0.1  # Overloaded service
+    scoring.unrecord("a")
+    assert scoring.demand_score("a") == 0.25
+    assert scoring.score("b", 1.0, 0, 0) > scoring.score("a", 1.0, 0, 0)
+
+
+def test_event_scheduler_completes_every_student():
+    """Test that the heap-driven scheduler respects capacity and student overlaps"""
+    occupancy = OccupancyIndex(datetime(2025, 1, 1))
+    service_ids, durations, capacities = ["a", "b", "c"], [7, 14, 5], [1, 2, 1]
+    for service_id, capacity in zip(service_ids, capacities):
+        occupancy.add_service(service_id, capacity)
+    students = [f"e{i}" for i in range(6)]
+
+    scheduler = EventScheduler(
+        occupancy, students, service_ids, durations, rest_days=2, max_delay=10,
+        scoring=ScoringState(service_ids, len(students)))
+    assignments = scheduler.run()
+
+    assert len(assignments) == len(students) * len(service_ids)
+    for service_id, capacity in zip(service_ids, capacities):
+        assert occupancy.peak(service_id) <= capacity
+    for student in students:
+        windows = sorted((a.start_day, a.end_day)
+                         for a in assignments if a.student_id == student)
+        assert all(prev[1] + 2 <= nxt[0] for prev, nxt in zip(windows, windows[1:]))
+
+
+def test_kernel_schedules_plain_problem():
+    """Test that the kernel runs on plain data and round-trips through pickle"""
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(5)),
+        service_ids=("a", "b"),
+        durations=(10, 5),
+        capacities=(2, 1),
+        start_date="2025-01-01",
+        rest_days=1,
+        strategy=LOAD_STRATEGY,
+    )
+    assert pickle.loads(pickle.dumps(problem)) == problem
+
+    result = schedule(problem)
+    assert result.complete
+    assert len(result.rotations) == 10
+    assert result.makespan == max(end for *_, end in result.rotations) + 1
+    assert problem.to_date(0) == datetime(2025, 1, 1)
+
+
+def test_kernel_never_starts_a_rotation_on_the_previous_end_day():
+    """Test that zero break days still separate a student's rotations by a day"""
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(30)),
+        service_ids=tuple("abcde"),
+        durations=(7, 14, 7, 21, 7),
+        capacities=(6, 6, 6, 6, 6),
+        start_date="2025-01-01",
+        rest_days=0,
+    )
+    assert problem.rest_days == 1
+    result = schedule(problem)
+    assert result.complete
+    analysis = analyze([(f"e{s}", f"s{j}", start, end) for s, j, start, end in result.rotations])
+    assert analysis.overlaps == []
+    assert makespan_bounds(1, ["a", "b"], [7, 7], [1, 1], rest_days=0).workload_bound == 14
+
+
+def test_solve_many_matches_sequential_solving():
+    """Test that years solved in a process pool give the rotations of sequential runs"""
+    problems = [
+        SchedulingProblem(
+            student_ids=tuple(f"y{year}e{i}" for i in range(6)),
+            service_ids=("a", "b", "c"),
+            durations=(7, 14, 7 * year),
+            capacities=(2, 1, 2),
+            start_date="2025-01-01",
+            rest_days=2,
+        )
+        for year in (1, 2, 3)
+    ]
+    parallel = solve_many(problems, max_workers=3)
+    assert [r.rotations for r in parallel] == [schedule(p).rotations for p in problems]
+    assert [r.rotations for r in solve_many(problems, max_workers=1)] == [r.rotations for r in parallel]
+
+
+def test_solve_many_workers_are_not_forked_from_threads():
+    """Test that pool workers started from a thread come from a clean process"""
+    import threading
+    from app.scheduling.parallel import _MP_CONTEXT
+
+    assert _MP_CONTEXT.get_start_method() in ("forkserver", "spawn")
+    problems = [
+        SchedulingProblem(
+            student_ids=tuple(f"y{year}e{i}" for i in range(4)),
+            service_ids=("a", "b"),
+            durations=(7, 7 * year),
+            capacities=(2, 2),
+            start_date="2025-01-01",
+            rest_days=1,
+        )
+        for year in (1, 2)
+    ]
+    results = []
+    solver = threading.Thread(
+        target=lambda: results.extend(solve_many(problems, max_workers=2)), daemon=True)
+    solver.start()
+    solver.join(timeout=60)
+    assert not solver.is_alive()
+    assert [r.rotations for r in results] == [schedule(p).rotations for p in problems]
+
+
+def test_event_scheduler_backtracks_in_memory():
+    """Test that backtracking keeps the per-student stacks in sync with the history"""
+    occupancy = OccupancyIndex(datetime(2025, 1, 1))
+    service_ids, durations = ["a", "b"], [5, 5]
+    for service_id in service_ids:
+        occupancy.add_service(service_id, 1)
+    students = [f"e{i}" for i in range(6)]
+
+    scheduler = EventScheduler(
+        occupancy, students, service_ids, durations, rest_days=1, max_delay=3,
+        scoring=ScoringState(service_ids, len(students)), max_backtracks=3)
+    assignments = scheduler.run()
+
+    assert scheduler.backtracks > 0
+    assert len(assignments) == len(students) * len(service_ids)
+    for student in students:
+        assert scheduler.stacks[student] == [
+            a for a in assignments if a.student_id == student]
+    for service_id in service_ids:
+        assert occupancy.peak(service_id) == 1
+
+
+def test_exact_solver_shortens_greedy_makespan():
+    """Test that the MILP finds a shorter feasible planning than the greedy kernel"""
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(4)),
+        service_ids=("a", "b", "c"),
+        durations=(5, 3, 7),
+        capacities=(1, 2, 2),
+        start_date="2025-01-01",
+        rest_days=2,
+    )
+    greedy = schedule(problem)
+    exact = solve_exact(problem, greedy, time_limit=10)
+
+    assert exact is not None and exact.complete
+    assert exact.makespan < greedy.makespan
+    assert len(exact.rotations) == 12
+    for student in range(4):
+        windows = sorted((start, end) for s, _, start, end in exact.rotations if s == student)
+        assert len(windows) == 3
+        assert all(prev[1] + 2 <= nxt[0] for prev, nxt in zip(windows, windows[1:]))
+    for service, capacity in enumerate(problem.capacities):
+        for day in range(exact.makespan):
+            present = sum(1 for _, j, start, end in exact.rotations
+                          if j == service and start <= day <= end)
+            assert present <= capacity
+
+
+def test_makespan_bounds_and_gap():
+    """Test the capacity and workload lower bounds and the optimality gap"""
+    bounds = makespan_bounds(10, ["a", "b"], [14, 7], [3, 10], rest_days=2)
+    assert bounds.capacity_bounds == {"a": 56, "b": 7}  # ceil(10 / 3) runs of 14 days
+    assert bounds.workload_bound == 22  # 14 + 1 rest day + 7
+    assert bounds.lower_bound == 56
+    assert bounds.bottleneck == "a"
+    assert bounds.gap(60) == 4
+    assert bounds.gap_ratio(56) == 0.0
+
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(10)),
+        service_ids=("a", "b"),
+        durations=(14, 7),
+        capacities=(3, 10),
+        start_date="2025-01-01",
+        rest_days=2,
+    )
+    assert schedule(problem).makespan >= bounds.lower_bound
+
+
+def test_feasibility_diagnosis():
+    """Test that the pre-check explains impossible plannings without scheduling"""
+    problem = SchedulingProblem(
+        student_ids=("e1", "e2", "e3"),
+        service_ids=("a", "b"),
+        durations=(10, 5),
+        capacities=(1, 0),
+        start_date="2025-01-01",
+        rest_days=1,
+    )
+    report = diagnose(problem, service_names=["A", "B"])
+    assert not report.feasible
+    assert [issue.code for issue in report.issues] == ["no_capacity"]
+    assert report.issues[0].service_id == "b"
+    assert report.blocked_students == ["e1", "e2", "e3"]
+
+    problem = SchedulingProblem(
+        student_ids=("e1", "e2", "e3"),
+        service_ids=("a", "b"),
+        durations=(10, 5),
+        capacities=(1, 3),
+        start_date="2025-01-01",
+        rest_days=1,
+    )
+    assert diagnose(problem).feasible
+    report = diagnose(problem, horizon_days=20)
+    assert [issue.code for issue in report.issues] == ["service_exceeds_horizon"]
+    assert report.issues[0].required_days == 30
+    assert report.issues[0].blocked_students == 1
+
+
+def test_schedule_shared_respects_capacity_across_cohorts():
+    """Test that cohorts scheduled together never overbook a common service"""
+    cohorts = [
+        SchedulingProblem(
+            student_ids=tuple(f"{name}{i}" for i in range(4)),
+            service_ids=("a", "b"),
+            durations=(7, 5),
+            capacities=(2, 2),
+            start_date=start,
+            rest_days=1,
+        )
+        for name, start in (("p", "2025-01-01"), ("q", "2025-01-04"))
+    ]
+    results = schedule_shared(cohorts)
+
+    presence = {}
+    for problem, result in zip(cohorts, results):
+        assert result.complete
+        offset = (problem.origin - cohorts[0].origin).days
+        assert min(start for _, _, start, _ in result.rotations) >= 0
+        for _, service, start, end in result.rotations:
+            for day in range(start + offset, end + offset + 1):
+                key = (problem.service_ids[service], day)
+                presence[key] = presence.get(key, 0) + 1
+    assert max(presence.values()) == 2
+
+
+def test_repair_schedules_missing_services_around_kept_rotations():
+    """Test that a repair only places missing services, after the ready day and in free places"""
+    problem = SchedulingProblem(
+        student_ids=("e1",),
+        service_ids=("a", "b"),
+        durations=(5, 5),
+        capacities=(1, 1),
+        start_date="2025-01-01",
+        rest_days=1,
+    )
+    # e1 already did "a"; another student holds "b" on days 10-14
+    kept = [("a", 0, 4), ("b", 10, 14)]
+    result = repair(problem, kept, completed={"e1": {"a"}}, ready_days={"e1": 8})
+
+    assert result.complete
+    assert result.rotations == [(0, 1, 15, 19)]
+
+
+def test_job_manager_reports_progress_and_result():
+    """Test that a background job exposes its progress, then its result"""
+    from app.jobs import JobManager
+
+    manager = JobManager(max_workers=1)
+
+    def work(db, progress):
+        progress(3, 4)
+        return {"ok": True}
+
+    job = manager.submit("test", work)
+    manager._executor.shutdown(wait=True)
+    state = manager.get(job["id"])
+    assert state["statut"] == "termine"
+    assert state["rotations_planifiees"] == 3 and state["rotations_cible"] == 4
+    assert state["resultat"] == {"ok": True}
+    assert manager.get("missing") is None
+    assert [event for event, _ in manager.events(job["id"])] == ["termine"]
+
+
+def test_seeded_runs_are_reproducible_and_multistart_keeps_the_baseline():
+    """Test that a seed makes a randomized run repeatable and that multistart includes the plain run"""
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(6)),
+        service_ids=("a", "b", "c"),
+        durations=(7, 14, 7),
+        capacities=(2, 2, 1),
+        start_date="2025-01-01",
+        rest_days=2,
+    )
+    seeded = replace(problem, seed=7)
+    assert schedule(seeded).rotations == schedule(seeded).rotations
+
+    results = multistart(problem, 3, time_budget=30, max_workers=1)
+    assert results[0].rotations == schedule(problem).rotations
+    assert all(result.complete for result in results)
+
+    # Seeded runs carry the end of the budget and stop by themselves
+    from app.scheduling.parallel import _schedule_until
+    assert _schedule_until(seeded, time.time() - 1).truncated
+    assert _schedule_until(seeded, time.time() + 30).complete
+
+
+def test_local_search_compresses_greedy_planning():
+    """Test that local search shortens the greedy planning and keeps it valid"""
+    problem = SchedulingProblem(
+        student_ids=tuple(f"e{i}" for i in range(4)),
+        service_ids=("a", "b", "c"),
+        durations=(5, 3, 7),
+        capacities=(1, 2, 2),
+        start_date="2025-01-01",
+        rest_days=2,
+    )
+    greedy = schedule(problem)
+    improved = improve(problem, greedy, time_budget=5)
+
+    assert improved.makespan < greedy.makespan
+    assert len(improved.rotations) == 12
+    for student in range(4):
+        windows = sorted((start, end) for s, _, start, end in improved.rotations if s == student)
+        assert all(prev[1] + 2 <= nxt[0] for prev, nxt in zip(windows, windows[1:]))
+    for service, capacity in enumerate(problem.capacities):
+        for day in range(improved.makespan):
+            present = sum(1 for _, j, start, end in improved.rotations
+                          if j == service and start <= day <= end)
+            assert present <= capacity
+
+
+def test_planning_cache_fingerprint_and_stored_output():
+    """Test that the cache key follows the generation inputs and that outputs round-trip"""
+    from types import SimpleNamespace
+    from app.crud.planning_cache import planning_cache
+    from app.models import PlanningCache
+
+    problem = SchedulingProblem(
+        student_ids=("e1", "e2"),
+        service_ids=("a", "b"),
+        durations=(7, 14),
+        capacities=(1, 2),
+        start_date="2025-01-01",
+        rest_days=2,
+    )
+    services = [SimpleNamespace(places_disponibles=1), SimpleNamespace(places_disponibles=3)]
+    settings = SimpleNamespace(max_concurrent_students=2, break_days_between_rotations=2)
+    key = planning_cache.fingerprint(problem, services, settings, solver="greedy")
+    assert key == planning_cache.fingerprint(problem, services, settings, solver="greedy")
+    services[1].places_disponibles = 4
+    assert key != planning_cache.fingerprint(problem, services, settings, solver="greedy")
+    assert key != planning_cache.fingerprint(
+        replace(problem, start_date="2025-02-01"), services, settings, solver="greedy")
+
+    result = schedule(problem)
+    entry = PlanningCache(resultat='{"rotations": %s, "missing": [], "backtracks": 0, "deferrals": 0}'
+                          % [list(r) for r in result.rotations])
+    assert planning_cache.to_result(entry).rotations == result.rotations
+
+
+def test_time_limit_returns_partial_result():
+    """Test that a spent time limit stops the kernel with the unplaced pairs listed"""
+    problem = SchedulingProblem(
+        student_ids=("e1", "e2"),
+        service_ids=("a", "b"),
+        durations=(7, 7),
+        capacities=(1, 1),
+        start_date="2025-01-01",
+        rest_days=2,
+        time_limit=0,
+    )
+    result = schedule(problem)
+    assert result.truncated and not result.rotations
+    assert sorted(result.missing) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    result = schedule(replace(problem, time_limit=None))
+    assert result.complete and not result.truncated
+
+
+def test_overload_ranges_sweep():
+    """Test that the sweep reports the exact overbooked days and their peak"""
+    intervals = [(1, 10), (5, 12), (8, 9), (20, 25), (20, 21)]
+    assert peak_occupancy(intervals) == 3
+    assert overload_ranges(intervals, 2) == [OverloadRange(8, 9, 3)]
+    assert overload_ranges(intervals, 1) == [
+        OverloadRange(5, 10, 3), OverloadRange(20, 21, 2)]
+    assert overload_ranges([], 1) == []
+
+
+def test_planning_analysis_overlaps_gaps_and_loads():
+    """Test that one interval pass finds overlaps, gaps, peaks and balance"""
+    rotations = [
+        ("e1", "a", 0, 29),   # Long rotation covering the next two
+        ("e1", "b", 5, 9),
+        ("e1", "c", 20, 24),
+        ("e2", "a", 0, 6),
+        ("e2", "b", 8, 14),   # Start = end + 2 rest days: no gap
+        ("e2", "c", 30, 36),  # Gap after day 14
+    ]
+    analysis = analyze(rotations, capacities={"a": 1, "b": 2, "c": 1}, rest_days=2)
+    assert analysis.overlaps == [(0, 1), (0, 2)]
+    assert analysis.gaps == [(4, 5)]
+    assert analysis.makespan == 37
+    load = analysis.services["a"]
+    assert (load.peak, load.busy_days, load.place_days) == (2, 30, 37)
+    assert load.overloads == [OverloadRange(0, 6, 2)]
+    assert analysis.services["b"].overloads == []
+    assert analysis.load_balance(["a", "b", "c", "d"]) == 2 / 1.5
+
+
+def test_interval_index_checks_single_edits():
+    """Test that an edit is checked against its student and its service window only"""
+    index = IntervalIndex([
+        ("r1", "e1", "a", 0, 6),
+        ("r2", "e1", "b", 8, 14),
+        ("r3", "e2", "a", 0, 6),
+        ("r4", "e3", "a", 10, 16),
+    ])
+    # Same student, shared days
+    check = index.check("r2", "e1", "b", 5, 11, capacity=2)
+    assert check.overlaps == ["r1"] and not check.ok
+
+    # Service "a" is full on days 0-6 only: the overload is reported within the new days
+    check = index.check("r2", "e1", "a", 4, 12, capacity=2, rest_days=2)
+    assert check.overlaps == ["r1"]
+    assert check.overloads == [OverloadRange(4, 6, 3)]
+    check = index.check("r4", "e3", "a", 5, 11, capacity=2)
+    assert check.overloads == [OverloadRange(5, 6, 3)]
+
+    # Moving r2 later leaves a gap after r1, which is only a warning
+    check = index.check("r2", "e1", "b", 20, 26, capacity=1, rest_days=2)
+    assert check.ok and check.gaps == [(6, 20)]
+
+    index.move("r4", "e3", "a", 5, 11)
+    assert len(index) == 4 and index.rotations["r4"] == ("e3", "a", 5, 11)
+    assert index.check("r3", "e2", "a", 0, 6, capacity=2).overloads == [OverloadRange(5, 6, 3)]
+
+
+def test_planning_validation_cached_for_its_version_only():
+    """Test that a stored validation is served for its own planning version only"""
+    from app.crud.planning_validation import planning_validation
+    from app.models import Planning
+
+    db_planning = Planning(id="p1", version=3, validation_version=3,
+                           validation_resultat='{"python": {"is_valid": true, "erreurs": []}}')
+    assert planning_validation.etag(db_planning, "python") == 'W/"p1-3-python"'
+    assert planning_validation.cached(db_planning, "python") == {"is_valid": True, "erreurs": []}
+    # Each mode has its own result and ETag
+    assert planning_validation.etag(db_planning, "sql") == 'W/"p1-3-sql"'
+    assert planning_validation.cached(db_planning, "sql") is None
+
+    db_planning.version = 4
+    assert planning_validation.etag(db_planning, "python") == 'W/"p1-4-python"'
+    assert planning_validation.cached(db_planning, "python") is None